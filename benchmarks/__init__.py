@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+
+# the store benchmarks write to a scratch SQLite database unless
+# another one is configured
+os.environ.setdefault(
+    'MLMONITOR_DATABASE_URI',
+    'sqlite:///{}'.format(os.path.join(tempfile.mkdtemp(), 'benchmarks.db')),
+)
@@ -0,0 +1,64 @@
+"""Command line of the benchmark suite.
+
+Run every benchmark and save the results::
+
+    python -m benchmarks run --output results.json
+
+Compare the results of two commits::
+
+    python -m benchmarks compare baseline.json results.json
+"""
+import importlib
+import json
+import pkgutil
+import sys
+import click
+import benchmarks
+from benchmarks import harness
+
+
+def _load():
+    for module in pkgutil.iter_modules(benchmarks.__path__):
+        if module.name.startswith('bench_'):
+            importlib.import_module('benchmarks.{}'.format(module.name))
+
+
+@click.group()
+def main():
+    pass
+
+
+@main.command('run')
+@click.option('--filter', '-k', 'pattern', default=None,
+              help="Only run benchmarks whose name contains this string.")
+@click.option('--quick', is_flag=True,
+              help="Only run the first value of each parameter.")
+@click.option('--output', '-o', default=None,
+              help="File where the JSON results are written.")
+def run_command(pattern, quick, output):
+    _load()
+    results = harness.run(pattern, quick, log=click.echo)
+    if output:
+        with open(output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+@main.command('compare')
+@click.argument('baseline')
+@click.argument('contender')
+@click.option('--threshold', default=1.1,
+              help="Slowdown ratio reported as a regression (default: 1.1).")
+def compare_command(baseline, contender, threshold):
+    with open(baseline) as baseline_file, open(contender) as contender_file:
+        rows = harness.compare(
+            json.load(baseline_file), json.load(contender_file), threshold)
+
+    for row in rows:
+        click.echo('{:<45} {:<50} {:>7.2f}x{}'.format(
+            row['name'], json.dumps(row['params']), row['ratio'],
+            '  REGRESSION' if row['regression'] else ''))
+    sys.exit(1 if any(row['regression'] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
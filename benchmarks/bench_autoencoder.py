@@ -0,0 +1,30 @@
+import os
+import tempfile
+import numpy as np
+from benchmarks.harness import benchmark
+from mlmonitoring.monitor.model_drift.feature import latent_drift
+from mlmonitoring.monitor.utils.autoencoder import MLPRegressorAutoEncoder
+
+
+@benchmark(params={'rows': [10_000, 100_000], 'features': [10, 100]})
+def autoencoder_encode(rows, features):
+    rng = np.random.default_rng(0)
+    encoder = MLPRegressorAutoEncoder(max_iter=1).fit(
+        rng.normal(size=(1_000, features)))
+    X = rng.normal(size=(rows, features))
+    return lambda: encoder.encode(X)
+
+
+@benchmark(params={'features': [100, 2_000], 'cached': [False, True]},
+           repeat=3)
+def latent_drift_mmd(features, cached):
+    rng = np.random.default_rng(0)
+    X_train = rng.normal(size=(5_000, features))
+    X_test = rng.normal(size=(5_000, features))
+    # without a cache every run fits the autoencoder on the reference
+    cache_path = None
+    if cached:
+        cache_path = os.path.join(tempfile.mkdtemp(), 'encoder.joblib')
+        latent_drift(X_train, X_test, cache_path=cache_path, max_iter=5)
+    return lambda: latent_drift(
+        X_train, X_test, cache_path=cache_path, max_iter=5)
@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+from benchmarks.harness import benchmark
+from mlmonitoring import Check
+
+
+@benchmark(params={'rows': [1_000, 100_000, 1_000_000]})
+def check_greater_than(rows):
+    samples = pd.Series(np.random.default_rng(0).random(rows))
+    check = Check.gt(0.5)
+    return lambda: check(samples)
+
+
+@benchmark(params={'rows': [1_000, 100_000, 1_000_000]})
+def check_in_range(rows):
+    samples = pd.Series(np.random.default_rng(0).random(rows))
+    check = Check.in_range(0.1, 0.9)
+    return lambda: check(samples)
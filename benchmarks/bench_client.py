@@ -0,0 +1,67 @@
+import socket
+import threading
+import time
+import numpy as np
+import pandas as pd
+import uvicorn
+from benchmarks.harness import benchmark
+from mlmonitoring.client import Client
+from mlmonitoring.server.main import app
+
+
+_server = {}
+
+
+def server_url():
+    """Start the FastAPI app once on a free local port."""
+    if 'url' not in _server:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(
+            app, host='127.0.0.1', port=port, log_level='warning'))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.01)
+        _server['url'] = 'http://127.0.0.1:{}'.format(port)
+    return _server['url']
+
+
+def generate_dataframe(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2021-01-01', periods=rows, freq='min'),
+        'psi': rng.random(rows),
+    }).set_index('timestamp')
+
+
+@benchmark(params={'rows': [100, 10_000, 100_000]}, repeat=3)
+def client_insert_round_trip(rows):
+    client = Client()
+    client.set_connection(server_url())
+    dataframe = generate_dataframe(rows)
+    return lambda: client.insert(dataframe, 'client', 'insert_{}'.format(rows))
+
+
+@benchmark(params={'rows': [100, 10_000, 100_000]}, repeat=3)
+def client_view_round_trip(rows):
+    client = Client()
+    client.set_connection(server_url())
+    client.insert(generate_dataframe(rows), 'client', 'view_{}'.format(rows))
+    return lambda: client.view('client', 'view_{}'.format(rows))
+
+
+@benchmark(params={'tables': [1, 10, 40], 'batch': [False, True]}, repeat=3)
+def client_run_upload(tables, batch):
+    client = Client()
+    client.set_connection(server_url())
+    dataframes = {
+        'run_{}_{}'.format(batch, table): generate_dataframe(100)
+        for table in range(tables)
+    }
+    if batch:
+        return lambda: client.insert_many(dataframes, 'client')
+    return lambda: [
+        client.insert(dataframe, 'client', table_name)
+        for table_name, dataframe in dataframes.items()
+    ]
@@ -0,0 +1,39 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+from benchmarks.harness import benchmark
+from mlmonitoring.server.codec import decode_insert, loads
+
+
+def generate_body(rows):
+    rng = np.random.default_rng(0)
+    dataframe = pd.DataFrame({
+        'timestamp': pd.date_range('2021-01-01', periods=rows, freq='min'),
+        'feature': rng.integers(0, 100, rows),
+        'psi': rng.random(rows),
+    }).set_index('timestamp')
+    return json.dumps({
+        'table_name': 'codec',
+        'dataframe': json.loads(dataframe.to_json(orient='table')),
+    }).encode()
+
+
+def decode_read_json(body):
+    # the previous path: validate, dump the dataframe again and parse it
+    data = json.loads(body)
+    return pd.read_json(
+        io.StringIO(json.dumps(data['dataframe'])), orient='table')
+
+
+def decode_codec(body):
+    return decode_insert(loads(body))[1]
+
+
+@benchmark(
+    params={'rows': [100, 10_000, 100_000], 'codec': ['read_json', 'codec']},
+    repeat=3)
+def codec_decode_insert(rows, codec):
+    body = generate_body(rows)
+    decode = decode_codec if codec == 'codec' else decode_read_json
+    return lambda: decode(body)
@@ -0,0 +1,54 @@
+import json
+import requests
+from benchmarks.bench_client import generate_dataframe, server_url
+from benchmarks.harness import benchmark
+from mlmonitoring.client import Client
+from mlmonitoring.compression import available_encodings, compress, decompress
+
+
+ENCODINGS = ['identity'] + available_encodings()
+
+
+@benchmark(params={'rows': [1_000, 10_000, 100_000], 'encoding': ENCODINGS},
+           repeat=3)
+def compressed_insert(rows, encoding):
+    client = Client()
+    client.set_connection(server_url())
+    if encoding != 'identity':
+        client.set_compression(encoding, threshold=0)
+    dataframe = generate_dataframe(rows)
+    table_name = 'insert_{}_{}'.format(encoding, rows)
+
+    def insert():
+        client.insert(dataframe, 'compression', table_name)
+
+    body = json.dumps(client.insert_payload(
+        dataframe, 'compression', table_name)).encode()
+    insert.metrics = {
+        'bytes': len(body) if encoding == 'identity'
+        else len(compress(body, encoding)),
+    }
+    return insert
+
+
+@benchmark(params={'rows': [1_000, 10_000, 100_000], 'encoding': ENCODINGS},
+           repeat=3)
+def compressed_view(rows, encoding):
+    client = Client()
+    client.set_connection(server_url())
+    table_name = 'view_{}_{}'.format(encoding, rows)
+    client.insert(generate_dataframe(rows), 'compression', table_name)
+    route = '{}/view/compression_{}'.format(server_url(), table_name)
+    headers = {'Accept-Encoding': encoding}
+
+    def view():
+        # the bytes on the wire are decoded here, requests cannot decode zstd
+        response = requests.get(route, headers=headers, stream=True)
+        body = response.raw.read(decode_content=False)
+        if response.headers.get('content-encoding') in available_encodings():
+            body = decompress(body, response.headers['content-encoding'])
+        view.metrics = {'bytes': int(response.headers['content-length'])}
+        return json.loads(body)
+
+    view()
+    return view
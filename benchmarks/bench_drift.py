@@ -0,0 +1,107 @@
+import numpy as np
+from benchmarks.harness import benchmark
+from mlmonitoring.monitor.utils import _calculate_psi
+from mlmonitoring.monitor.model_drift.feature import (
+    classifier_drift,
+    drift_suite,
+    psi_drift,
+)
+
+
+SIZES = {
+    'rows': [10_000, 100_000, 1_000_000],
+    'features': [10, 100],
+    'buckets': [10, 100],
+}
+
+
+def generate_data(rows, features):
+    rng = np.random.default_rng(0)
+    X_train = rng.normal(0, 1, (rows, features))
+    X_test = rng.normal(0.1, 1.1, (rows, features))
+    return X_train, X_test
+
+
+@benchmark(params=SIZES, repeat=3)
+def calculate_psi(rows, features, buckets):
+    X_train, X_test = generate_data(rows, features)
+
+    # one call per feature, as psi_drift used to do
+    def calculate():
+        for i in range(features):
+            _calculate_psi(X_train[:, i], X_test[:, i], buckets=buckets)
+    return calculate
+
+
+@benchmark(params=SIZES, repeat=3)
+def psi_drift_numeric(rows, features, buckets):
+    X_train, X_test = generate_data(rows, features)
+    names, importances = list(range(features)), [1] * features
+    return lambda: psi_drift(X_train, X_test, names, importances, buckets=buckets)
+
+
+@benchmark(params=SIZES, repeat=3)
+def drift_suite_numeric(rows, features, buckets):
+    X_train, X_test = generate_data(rows, features)
+    names, importances = list(range(features)), [1] * features
+    return lambda: drift_suite(
+        X_train, X_test, names, importances, buckets=buckets)
+
+
+BOOTSTRAP = {'features': [10, 100], 'n_bootstrap': [200, 1000]}
+
+
+@benchmark(params=BOOTSTRAP, repeat=3)
+def psi_bootstrap_loop(features, n_bootstrap):
+    X_train, X_test = generate_data(10_000, features)
+    X_test = X_test[:1000]
+    rng = np.random.default_rng(0)
+
+    # resampling the rows and calling _calculate_psi per replicate
+    def bootstrap():
+        for _ in range(n_bootstrap):
+            train = X_train[rng.integers(0, len(X_train), len(X_train))]
+            test = X_test[rng.integers(0, len(X_test), len(X_test))]
+            for i in range(features):
+                _calculate_psi(train[:, i], test[:, i])
+    return bootstrap
+
+
+@benchmark(params=BOOTSTRAP, repeat=3)
+def psi_drift_bootstrap(features, n_bootstrap):
+    X_train, X_test = generate_data(10_000, features)
+    X_test = X_test[:1000]
+    names, importances = list(range(features)), [1] * features
+    return lambda: psi_drift(X_train, X_test, names, importances,
+                             ci='bootstrap', n_bootstrap=n_bootstrap)
+
+
+@benchmark(params={'rows': [100_000, 500_000]}, repeat=1)
+def classifier_drift_full(rows):
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.model_selection import cross_val_score
+    X_train, X_test = generate_data(rows, 20)
+    X = np.concatenate([X_train, X_test])
+    y = np.repeat([0, 1], rows)
+
+    # the domain classifier by hand, every row and fold on one core
+    def run():
+        auc = cross_val_score(HistGradientBoostingClassifier(), X, y,
+                              cv=5, scoring='roc_auc').mean()
+        run.metrics = {'auc': float(auc)}
+    return run
+
+
+@benchmark(params={'rows': [100_000, 500_000]}, repeat=1)
+def classifier_drift_budget(rows):
+    X_train, X_test = generate_data(rows, 20)
+    names, importances = list(range(20)), [1] * 20
+
+    def run():
+        result = classifier_drift(X_train, X_test, names, importances,
+                                  n_jobs=-1, random_state=0)
+        run.metrics = {
+            'auc': float(result['auc'].iloc[0]),
+            'n_folds': int(result['n_folds'].iloc[0]),
+        }
+    return run
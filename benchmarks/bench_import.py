@@ -0,0 +1,18 @@
+import subprocess
+import sys
+from benchmarks.harness import benchmark
+
+
+MODULES = [
+    'mlmonitoring',
+    'mlmonitoring.monitor.model_drift.feature',
+    'mlmonitoring.monitor.model_drift.prediction',
+    'mlmonitoring.server.main',
+]
+
+
+@benchmark(params={'module': MODULES}, repeat=3)
+def import_module(module):
+    # a fresh interpreter per call, imports are cached in sys.modules
+    command = [sys.executable, '-c', 'import {}'.format(module)]
+    return lambda: subprocess.run(command, check=True)
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import numpy as np
+from benchmarks.harness import benchmark
+from mlmonitoring.monitor.model_drift.feature import knn_outlier_detection
+
+
+SIZES = {'rows': [50_000, 200_000], 'features': [10]}
+
+
+def generate_data(rows, features):
+    rng = np.random.default_rng(0)
+    X_train = rng.normal(0, 1, (rows, features))
+    X_test = rng.normal(0, 1.2, (10_000, features))
+    return X_train, X_test
+
+
+@benchmark(params=SIZES, repeat=3)
+def pyod_knn_refit(rows, features):
+    from pyod.models.knn import KNN
+    X_train, X_test = generate_data(rows, features)
+
+    # pyod fits the detector on the reference data on every call
+    def run():
+        KNN(n_neighbors=10).fit(X_train).predict_proba(X_test)
+    return run
+
+
+@benchmark(params=SIZES, repeat=3)
+def knn_outlier_detection_index(rows, features):
+    X_train, X_test = generate_data(rows, features)
+    index_path = os.path.join(tempfile.mkdtemp(), 'index.joblib')
+    knn_outlier_detection(X_train, X_test, index_path=index_path)
+    return lambda: knn_outlier_detection(
+        None, X_test, index_path=index_path, n_jobs=-1)
@@ -0,0 +1,54 @@
+import numpy as np
+from benchmarks.harness import benchmark
+from mlmonitoring.monitor.model_drift.prediction import (
+    SortedDistribution,
+    QuantileSketch,
+    ks_drift,
+    wasserstein_drift,
+    psi_score_drift,
+)
+
+
+# every method should stay within seconds at 10M rows
+PARAMS = {
+    'rows': [1_000_000, 10_000_000],
+    'method': ['ks', 'wasserstein', 'psi'],
+    'approximate': [False, True],
+}
+
+METHODS = {
+    'ks': ks_drift,
+    'wasserstein': wasserstein_drift,
+    'psi': psi_score_drift,
+}
+
+
+def generate_scores(rows):
+    rng = np.random.default_rng(0)
+    return rng.beta(2, 5, rows), rng.beta(2.2, 5, rows)
+
+
+@benchmark(params={'rows': PARAMS['rows']}, repeat=3)
+def sort_reference(rows):
+    y_train, _ = generate_scores(rows)
+    return lambda: SortedDistribution(y_train)
+
+
+@benchmark(params={'rows': PARAMS['rows']}, repeat=3)
+def sketch_stream(rows):
+    _, y_test = generate_scores(rows)
+    chunks = np.array_split(y_test, 100)
+
+    def update():
+        sketch = QuantileSketch()
+        for chunk in chunks:
+            sketch.update(chunk)
+    return update
+
+
+@benchmark(params=PARAMS, repeat=3)
+def prediction_drift(rows, method, approximate):
+    y_train, y_test = generate_scores(rows)
+    reference = SortedDistribution(y_train)
+    production = QuantileSketch().update(y_test) if approximate else y_test
+    return lambda: METHODS[method](reference, production)
@@ -0,0 +1,34 @@
+import numpy as np
+from benchmarks.harness import benchmark
+from mlmonitoring.monitor.model_drift.feature import psi_drift
+
+
+ROWS, FEATURES = 1_000_000, 20
+
+
+def generate_data():
+    rng = np.random.default_rng(0)
+    X_train = rng.normal(0, 1, (ROWS, FEATURES))
+    X_test = rng.normal(np.linspace(0, 0.5, FEATURES), 1, (ROWS, FEATURES))
+    return X_train, X_test
+
+
+@benchmark(params={'rate': [1.0, 0.1, 0.01, 0.001]}, repeat=3)
+def psi_drift_sample_rate(rate):
+    X_train, X_test = generate_data()
+    names, importances = list(range(FEATURES)), [1] * FEATURES
+    exact = psi_drift(X_train, X_test, names, importances,
+                      buckettype='quantiles')['psi']
+
+    def run():
+        sample = None if rate == 1.0 else rate
+        result = psi_drift(X_train, X_test, names, importances,
+                           buckettype='quantiles', sample=sample,
+                           random_state=0, ci='analytic')
+        # the error of the sampled PSI and the width of its interval
+        run.metrics = {
+            'max_abs_error': float((result['psi'] - exact).abs().max()),
+            'mean_ci_width': float(
+                (result['psi_ci_high'] - result['psi_ci_low']).mean()),
+        }
+    return run
@@ -0,0 +1,42 @@
+import json
+import numpy as np
+import pandas as pd
+from benchmarks.harness import benchmark
+from mlmonitoring.server.codec import decode_insert, loads
+from mlmonitoring.server.store import insert_dataframe, view_table, filter_table
+
+
+ROWS = {'rows': [100, 10_000, 100_000]}
+
+
+def generate_dataframe(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2021-01-01', periods=rows, freq='min'),
+        'feature': rng.integers(0, 100, rows),
+        'psi': rng.random(rows),
+    }).set_index('timestamp')
+
+
+@benchmark(params=ROWS, repeat=3)
+def store_insert_table(rows):
+    # the body of an /insert request, decoded and written as the server does
+    body = json.dumps({
+        'table_name': 'bench_insert_{}'.format(rows),
+        'dataframe': json.loads(generate_dataframe(rows).to_json(orient='table')),
+    }).encode()
+    return lambda: insert_dataframe(*decode_insert(loads(body)))
+
+
+@benchmark(params=ROWS, repeat=3)
+def store_view_table(rows):
+    table_name = 'bench_view_{}'.format(rows)
+    insert_dataframe(table_name, generate_dataframe(rows))
+    return lambda: view_table(table_name)
+
+
+@benchmark(params=ROWS, repeat=3)
+def store_filter_table(rows):
+    table_name = 'bench_filter_{}'.format(rows)
+    insert_dataframe(table_name, generate_dataframe(rows))
+    return lambda: filter_table(table_name, 'psi__gt__0.5')
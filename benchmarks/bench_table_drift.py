@@ -0,0 +1,66 @@
+import tracemalloc
+import numpy as np
+import pandas as pd
+from benchmarks.harness import benchmark
+from benchmarks.bench_backends import create
+from mlmonitoring.monitor.model_drift.feature import psi_drift
+from mlmonitoring.server.drift import table_drift
+
+
+SIZES = {'rows': [1_000_000, 4_000_000], 'backend': ['parquet', 'duckdb']}
+FEATURES = ['f{}'.format(i) for i in range(10)]
+
+_stores = {}
+
+
+def stored_features(rows, backend):
+    """A table of production rows, one every few seconds over a month."""
+    key = (rows, backend)
+    if key not in _stores:
+        store = create(backend)
+        rng = np.random.default_rng(0)
+        index = pd.date_range('2021-01-01', '2021-02-01', periods=rows,
+                              name='timestamp')
+        for start in range(0, rows, 1_000_000):
+            chunk = index[start:start + 1_000_000]
+            store.insert('features', pd.DataFrame(
+                rng.normal(size=(len(chunk), len(FEATURES))),
+                columns=FEATURES, index=chunk))
+        _stores[key] = store
+    return _stores[key]
+
+
+def _peak_bytes(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@benchmark(params=SIZES, repeat=1)
+def table_drift_in_memory(rows, backend):
+    store = stored_features(rows, backend)
+
+    # the whole table is read, then every day is compared in memory
+    def run():
+        data = store.read('features')
+        data = data.set_index('timestamp').sort_index()
+        reference = data.loc[:'2021-01-07']
+        for _, day in data.loc['2021-01-08':].groupby(
+                data.loc['2021-01-08':].index.floor('D')):
+            psi_drift(reference, day, FEATURES, [1] * len(FEATURES))
+    run.metrics = {'peak_bytes': _peak_bytes(run)}
+    return run
+
+
+@benchmark(params=SIZES, repeat=1)
+def table_drift_chunked(rows, backend):
+    store = stored_features(rows, backend)
+
+    def run():
+        table_drift(store, 'features', '2021-01-01', '2021-01-08',
+                    start='2021-01-08', columns=FEATURES, results_table='')
+    run.metrics = {'peak_bytes': _peak_bytes(run)}
+    return run
@@ -0,0 +1,146 @@
+"""A small benchmark harness with parameterized cases and JSON results.
+
+Benchmarks are registered with the ``benchmark`` decorator. A benchmark
+is called once per combination of its parameters to set the case up and
+returns the callable that is timed. A ``metrics`` dict set on the
+callable, e.g. bytes sent, is saved with the times.
+"""
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+
+BENCHMARKS = []
+
+
+def benchmark(params=None, repeat=5, number=1):
+    """Register a benchmark.
+
+    Args:
+        params (dict, optional): Values of each parameter. Every
+        combination is a case. Defaults to None.
+        repeat (int, optional): Number of timed repetitions. Defaults to 5.
+        number (int, optional): Calls of the timed callable in each
+        repetition. Defaults to 1.
+    """
+
+    def decorator(setup):
+        BENCHMARKS.append({
+            'name': '{}.{}'.format(
+                setup.__module__.split('.')[-1], setup.__name__),
+            'setup': setup,
+            'params': params or {},
+            'repeat': repeat,
+            'number': number,
+        })
+        return setup
+    return decorator
+
+
+def _cases(params, quick=False):
+    names = list(params)
+    values = [params[name][:1] if quick else params[name] for name in names]
+    for combination in itertools.product(*values):
+        yield dict(zip(names, combination))
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(pattern=None, quick=False, log=print):
+    """Run the registered benchmarks.
+
+    Args:
+        pattern (str, optional): Only run benchmarks whose name contains
+        it. Defaults to None.
+        quick (bool, optional): Only run the first value of each
+        parameter. Defaults to False.
+        log (Callable, optional): Progress logger. Defaults to print.
+
+    Returns:
+        dict: Machine-readable results of every case.
+    """
+
+    results = []
+    for bench in BENCHMARKS:
+        if pattern and pattern not in bench['name']:
+            continue
+        for case in _cases(bench['params'], quick):
+            fn = bench['setup'](**case)
+            times = []
+            for _ in range(bench['repeat']):
+                start = time.perf_counter()
+                for _ in range(bench['number']):
+                    fn()
+                times.append((time.perf_counter() - start) / bench['number'])
+            teardown = getattr(fn, 'teardown', None)
+            if teardown is not None:
+                teardown()
+
+            result = {
+                'name': bench['name'],
+                'params': case,
+                'times': times,
+                'min': min(times),
+                'median': statistics.median(times),
+            }
+            metrics = getattr(fn, 'metrics', None)
+            if metrics:
+                result['metrics'] = metrics
+            results.append(result)
+            log('{:<45} {:<50} {:>10.4f}s{}'.format(
+                result['name'], json.dumps(case), result['median'],
+                '  {}'.format(json.dumps(metrics)) if metrics else ''))
+
+    return {
+        'commit': _commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def _key(result):
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare(baseline, contender, threshold=1.1):
+    """Compare the medians of two result files.
+
+    Args:
+        baseline (dict): Results of the reference commit.
+        contender (dict): Results of the new commit.
+        threshold (float, optional): Ratio above which a case is reported
+        as a regression. Defaults to 1.1.
+
+    Returns:
+        List[dict]: The ratio of every case present in both results.
+    """
+
+    baseline = {_key(result): result for result in baseline['results']}
+    rows = []
+    for result in contender['results']:
+        reference = baseline.get(_key(result))
+        if reference is None:
+            continue
+        ratio = result['median'] / reference['median']
+        rows.append({
+            'name': result['name'],
+            'params': result['params'],
+            'baseline': reference['median'],
+            'contender': result['median'],
+            'ratio': ratio,
+            'regression': ratio > threshold,
+        })
+    return rows
@@ -1,2 +1,25 @@
-from mlmonitoring.monitor.checks import Check
-from mlmonitoring.monitor.schemas import MLmonitoring
+import importlib
+
+
+# public names are imported on first access so that importing the
+# package, e.g. from the server CLI, does not load the client and pandas
+_LAZY_ATTRIBUTES = {
+    'Check': 'mlmonitoring.monitor.checks',
+    'MLmonitoring': 'mlmonitoring.monitor.schemas',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1 +1,2 @@
 from .client import Client
+from .outbox import Outbox, OutboxFullError
@@ -1,7 +1,10 @@
 import json
 import requests
 import pandas as pd
-from typing import Union
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlencode
+from mlmonitoring.compression import available_encodings, compress
+from mlmonitoring.client.outbox import Outbox
 
 
 DataFrame = Union[pd.DataFrame, pd.Series]
@@ -14,6 +17,9 @@ class Client:
 
     def __init__(self):
         self._api_url = 'http://127.0.0.1:8000'
+        self._compression = None
+        self._compression_threshold = 1024
+        self._outbox = None
 
     def set_connection(self, api_url: str):
         """Define the connection to the server.
@@ -24,6 +30,60 @@ class Client:
 
         self._api_url = api_url
 
+    def set_compression(
+        self,
+        encoding: Optional[str] = 'gzip',
+        threshold: int = 1024
+    ):
+        """Compress the bodies of insert requests.
+
+        Responses are decompressed in any case, the server compresses
+        them when the client accepts it.
+
+        Args:
+            encoding (str, optional): 'gzip', 'zstd' (requires the
+            zstandard package) or None to disable it. Defaults to 'gzip'.
+            threshold (int, optional): Bodies smaller than this number of
+            bytes are sent uncompressed. Defaults to 1024.
+        """
+
+        if encoding is not None and encoding not in available_encodings():
+            raise ValueError(
+                'Unsupported content encoding: {}'.format(encoding))
+        self._compression = encoding
+        self._compression_threshold = threshold
+
+    def set_outbox(self, path: Optional[str], **kwargs):
+        """Queue inserts in a local outbox flushed in the background.
+
+        Inserts return immediately once the payload is written to the
+        outbox file, and are sent at least once even if the server is
+        down or the process restarts.
+
+        Args:
+            path (str): The SQLite file of the outbox, None to send
+            inserts directly again.
+            **kwargs: Options of Outbox.
+        """
+
+        if self._outbox is not None:
+            self._outbox.close()
+        self._outbox = Outbox(self._post_insert, path, **kwargs) \
+            if path is not None else None
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the inserts queued in the outbox are sent.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait. Defaults to
+            None, waiting as long as needed.
+
+        Returns:
+            bool: Whether every queued insert was sent.
+        """
+
+        return self._outbox is None or self._outbox.flush(timeout)
+
     def insert(self, dataframe: DataFrame, project_name: str, table_name: str):
         """Inserts a Pandas DataFrame/Series to the project database table.
 
@@ -33,28 +93,126 @@ class Client:
             table_name (str): The name of the table.
 
         Returns:
-            requests.Response: The response of the request.
+            requests.Response: The response of the request, None when the
+            payload is queued in the outbox.
+        """
+
+        data = self.insert_payload(dataframe, project_name, table_name)
+        return self.post_insert(data)
+
+    def insert_many(self, dataframes: Dict[str, DataFrame], project_name: str):
+        """Inserts several Pandas DataFrames/Series to the project database
+        tables in a single request and transaction.
+
+        Args:
+            dataframes (Dict[str, DataFrame]): The DataFrame/Series to
+            insert to each table.
+            project_name (str): The name of the project.
+
+        Returns:
+            requests.Response: The response of the request, None when the
+            payloads are queued in the outbox.
+        """
+
+        data = [
+            self.insert_payload(dataframe, project_name, table_name)
+            for table_name, dataframe in dataframes.items()
+        ]
+        return self.post_insert_many(data)
+
+    def insert_payload(
+        self,
+        dataframe: DataFrame,
+        project_name: str,
+        table_name: str
+    ) -> dict:
+        """Serializes a Pandas DataFrame/Series to an insert payload.
+
+        Args:
+            dataframe (DataFrame): A DataFrame/Series to insert.
+            project_name (str): The name of the project.
+            table_name (str): The name of the table.
+
+        Returns:
+            dict: The payload of the insert request.
         """
 
-        data = {
+        return {
             "table_name": '{}_{}'.format(project_name, table_name),
             "dataframe": json.loads(dataframe.to_json(orient='table'))
         }
 
+    def post_insert(self, data: dict):
+        """Sends an insert payload to the server.
+
+        Args:
+            data (dict): A payload built by insert_payload.
+
+        Returns:
+            requests.Response: The response of the request, None when the
+            payload is queued in the outbox.
+        """
+
+        if self._outbox is not None:
+            self._outbox.put(data)
+            return None
+        return self._post_insert(data)
+
+    def post_insert_many(self, data: List[dict]):
+        """Sends several insert payloads to the server at once.
+
+        Payloads queued in the outbox are sent separately, each one is
+        still delivered at least once.
+
+        Args:
+            data (List[dict]): Payloads built by insert_payload.
+
+        Returns:
+            requests.Response: The response of the request, None when the
+            payloads are queued in the outbox.
+        """
+
+        if self._outbox is not None:
+            for payload in data:
+                self._outbox.put(payload)
+            return None
+        return self._post('insert_many', {'tables': data})
+
+    def _post_insert(self, data: dict):
+        return self._post('insert', data)
+
+    def _post(self, route: str, data: dict):
         with requests.Session() as session:
             adapter = requests.adapters.HTTPAdapter()
             session.mount(self._api_url, adapter)
 
-            route = '{}/insert'.format(self._api_url)
-            req = session.post(route, json=data)
-            return req
+            route = '{}/{}'.format(self._api_url, route)
+            if self._compression is None:
+                return session.post(route, json=data)
 
-    def view(self, project_name: str, table_name: str):
+            body = json.dumps(data).encode()
+            headers = {'Content-Type': 'application/json'}
+            if len(body) >= self._compression_threshold:
+                body = compress(body, self._compression)
+                headers['Content-Encoding'] = self._compression
+            return session.post(route, data=body, headers=headers)
+
+    def view(
+        self,
+        project_name: str,
+        table_name: str,
+        consistent: bool = False,
+        columns: Optional[List[str]] = None
+    ):
         """Returns the table as a DataFrame.
 
         Args:
             project_name (str): The name of the project.
             table_name (str): The name of the table.
+            consistent (bool, optional): Read from the primary database
+            to see the latest writes. Defaults to False.
+            columns (List[str], optional): Only read these columns.
+            Defaults to None.
 
         Returns:
             requests.Response: The response of the request.
@@ -69,10 +227,17 @@ class Client:
                 project_name,
                 table_name
             )
-            req = session.get(route)
+            req = session.get(_read_route(route, consistent, columns))
             return req
 
-    def filter(self, project_name: str, table_name: str, query_string: str):
+    def filter(
+        self,
+        project_name: str,
+        table_name: str,
+        query_string: str,
+        consistent: bool = False,
+        columns: Optional[List[str]] = None
+    ):
         with requests.Session() as session:
             adapter = requests.adapters.HTTPAdapter()
             session.mount(self._api_url, adapter)
@@ -83,5 +248,19 @@ class Client:
                 table_name,
                 query_string
             )
-            req = session.get(route)
+            req = session.get(_read_route(route, consistent, columns))
             return req
+
+
+def _read_route(
+    route: str,
+    consistent: bool,
+    columns: Optional[List[str]]
+) -> str:
+    # reads go to a replica unless the request asks for its own writes
+    params = {}
+    if consistent:
+        params['consistent'] = 'true'
+    if columns:
+        params['columns'] = ','.join(columns)
+    return '{}?{}'.format(route, urlencode(params)) if params else route
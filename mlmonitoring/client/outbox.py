@@ -0,0 +1,329 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+_logger = logging.getLogger(__name__)
+
+
+class OutboxFullError(Exception):
+    """Raised when a payload does not fit in the outbox."""
+
+
+class _Retry(Exception):
+    """The server could not take the batch now, it is sent again later."""
+
+
+class Outbox:
+    """A durable queue of insert payloads flushed in the background.
+
+    Payloads are appended to a SQLite file and a background thread sends
+    them to the server. Payloads of the same table and schema are
+    coalesced into a single insert. A batch is only removed from the file
+    once the server accepted it, so every payload is delivered at least
+    once, also across restarts of the process.
+
+    A batch rejected by the server, or still failing on the server after
+    ``max_attempts`` answers, is moved to the ``dead_letter`` table of the
+    file so that it does not block the next ones. Connection errors are
+    retried without limit.
+
+    Args:
+        send (Callable[[dict], requests.Response]): Sends an insert payload.
+        path (str): The SQLite file of the outbox.
+        max_bytes (int, optional): Maximum size of the pending payloads.
+        Defaults to 256 MiB.
+        batch_bytes (int, optional): Maximum size of a coalesced insert.
+        Defaults to 4 MiB.
+        flush_interval (float, optional): Seconds between flushes when
+        the outbox is idle. Defaults to 1.0.
+        max_backoff (float, optional): Maximum seconds between retries.
+        Defaults to 60.0.
+        on_full (str, optional): 'drop_oldest' to discard the oldest
+        payloads when the outbox is full, or 'raise' to raise
+        OutboxFullError. Defaults to 'drop_oldest'.
+        max_attempts (int, optional): Server errors of a batch before it
+        is moved to the dead letters. Defaults to 10.
+    """
+
+    def __init__(
+        self,
+        send: Callable,
+        path: str,
+        max_bytes: int = 256 * 2 ** 20,
+        batch_bytes: int = 4 * 2 ** 20,
+        flush_interval: float = 1.0,
+        max_backoff: float = 60.0,
+        on_full: str = 'drop_oldest',
+        max_attempts: int = 10
+    ) -> None:
+        if on_full not in ('drop_oldest', 'raise'):
+            raise ValueError("on_full must be 'drop_oldest' or 'raise'")
+
+        self._send = send
+        self._max_bytes = max_bytes
+        self._batch_bytes = batch_bytes
+        self._flush_interval = flush_interval
+        self._max_backoff = max_backoff
+        self._on_full = on_full
+        self._max_attempts = max_attempts
+        # the first payload of the failing batch and its server errors
+        self._attempts = (None, 0)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+        # WAL keeps appends cheap while the flusher reads
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'table_name TEXT NOT NULL, '
+            'schema TEXT NOT NULL, '
+            'data TEXT NOT NULL, '
+            'size INTEGER NOT NULL)'
+        )
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS dead_letter ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'table_name TEXT NOT NULL, '
+            'schema TEXT NOT NULL, '
+            'data TEXT NOT NULL, '
+            'size INTEGER NOT NULL, '
+            'error TEXT NOT NULL)'
+        )
+        self._size = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM outbox').fetchone()[0]
+
+        self._wake = threading.Event()
+        self._closing = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='mlmonitoring-outbox', daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        """Bytes of the pending payloads."""
+        return self._size
+
+    @property
+    def dead_letters(self) -> int:
+        """Number of payloads moved to the dead letters."""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM dead_letter').fetchone()[0]
+
+    def requeue_dead_letters(self) -> int:
+        """Moves the dead letters back to the outbox, e.g. once the
+        server or the table is fixed.
+
+        Returns:
+            int: Number of payloads requeued.
+        """
+
+        with self._lock:
+            self._connection.execute('BEGIN')
+            count = self._connection.execute(
+                'INSERT INTO outbox (table_name, schema, data, size) '
+                'SELECT table_name, schema, data, size FROM dead_letter '
+                'ORDER BY id').rowcount
+            self._connection.execute('DELETE FROM dead_letter')
+            self._connection.execute('COMMIT')
+            self._size = self._connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM outbox').fetchone()[0]
+        self._wake.set()
+        return count
+
+    def put(self, data: dict) -> None:
+        """Appends an insert payload to the outbox.
+
+        Args:
+            data (dict): A payload built by Client.insert_payload.
+
+        Raises:
+            OutboxFullError: If the payload does not fit in the outbox.
+        """
+
+        dataframe = data['dataframe']
+        schema = json.dumps(dataframe.get('schema', {}), sort_keys=True)
+        rows = json.dumps(dataframe.get('data', []))
+        size = len(schema) + len(rows)
+
+        with self._lock:
+            self._make_room(size)
+            self._connection.execute(
+                'INSERT INTO outbox (table_name, schema, data, size) '
+                'VALUES (?, ?, ?, ?)',
+                (data['table_name'], schema, rows, size)
+            )
+            self._size += size
+        if self._size >= self._batch_bytes:
+            self._wake.set()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every pending payload is sent.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait. Defaults to
+            None, waiting as long as needed.
+
+        Returns:
+            bool: Whether the outbox is empty.
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._wake.set()
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Sends the pending payloads and stops the background thread.
+
+        Payloads that could not be sent before the timeout stay in the
+        file and are sent by the next outbox opened on it.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait. Defaults to
+            None, waiting as long as needed.
+        """
+
+        self._closing.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._connection.close()
+
+    def _make_room(self, size: int) -> None:
+        if size > self._max_bytes:
+            raise OutboxFullError('The payload is larger than the outbox')
+        if self._size + size <= self._max_bytes:
+            return
+        if self._on_full == 'raise':
+            raise OutboxFullError('The outbox is full')
+
+        dropped = 0
+        while self._size + size > self._max_bytes:
+            rows = self._connection.execute(
+                'SELECT id, size FROM outbox ORDER BY id LIMIT 100').fetchall()
+            if not rows:
+                self._size = 0
+                break
+            self._delete(rows)
+            dropped += len(rows)
+        _logger.warning(
+            'Outbox full, dropped the {} oldest payloads'.format(dropped))
+
+    def _delete(self, rows: List[Tuple[int, int]]) -> None:
+        ids = [row[0] for row in rows]
+        placeholders = ','.join('?' * len(ids))
+        deleted = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM outbox '
+            'WHERE id IN ({})'.format(placeholders), ids).fetchone()[0]
+        self._connection.execute(
+            'DELETE FROM outbox WHERE id IN ({})'.format(placeholders), ids)
+        self._size -= deleted
+
+    def _bury(self, rows: List[Tuple[int, int]], error: str) -> None:
+        """Moves payloads to the dead letters."""
+        ids = [row[0] for row in rows]
+        self._connection.execute('BEGIN')
+        self._connection.execute(
+            'INSERT INTO dead_letter (table_name, schema, data, size, error) '
+            'SELECT table_name, schema, data, size, ? FROM outbox '
+            'WHERE id IN ({}) ORDER BY id'.format(','.join('?' * len(ids))),
+            [error] + ids)
+        self._delete(rows)
+        self._connection.execute('COMMIT')
+
+    def _next_batch(self) -> Optional[Tuple[dict, List[Tuple[int, int]]]]:
+        """Coalesces the oldest payloads of the oldest table and schema."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id, table_name, schema, data, size FROM outbox '
+                'ORDER BY id LIMIT 1000').fetchall()
+        if not rows:
+            return None
+
+        table_name, schema = rows[0][1], rows[0][2]
+        batch, data, size = [], [], 0
+        for row_id, row_table, row_schema, row_data, row_size in rows:
+            if (row_table, row_schema) != (table_name, schema):
+                continue
+            if batch and size + row_size > self._batch_bytes:
+                break
+            batch.append((row_id, row_size))
+            data.extend(json.loads(row_data))
+            size += row_size
+
+        payload = {
+            'table_name': table_name,
+            'dataframe': {'schema': json.loads(schema), 'data': data},
+        }
+        return payload, batch
+
+    def _flush_batch(self) -> bool:
+        """Sends one batch.
+
+        Returns:
+            bool: Whether a batch was pending.
+        """
+
+        batch = self._next_batch()
+        if batch is None:
+            return False
+        payload, rows = batch
+
+        response = self._send(payload)
+        status = response.status_code
+        if status >= 500 or status in (408, 429):
+            attempts = self._attempts[1] + 1 \
+                if self._attempts[0] == rows[0][0] else 1
+            self._attempts = (rows[0][0], attempts)
+            if attempts < self._max_attempts:
+                raise _Retry('The server answered {}'.format(status))
+
+        with self._lock:
+            if status >= 400:
+                # retrying would block the outbox, the batch is set aside
+                error = '{} {}'.format(status, response.text)
+                _logger.error('Moved {} payloads of {} to the dead letters: '
+                              '{}'.format(len(rows), payload['table_name'], error))
+                self._bury(rows, error)
+            else:
+                self._delete(rows)
+        return True
+
+    def _run(self) -> None:
+        backoff = 0.0
+        while True:
+            try:
+                pending = self._flush_batch()
+            except Exception as e:
+                if self._closing.is_set():
+                    return
+                backoff = min(self._max_backoff,
+                              backoff * 2 or self._flush_interval)
+                _logger.warning('Outbox flush failed, retry in {:.1f}s: {}'.format(
+                    backoff, e))
+                # new payloads do not shorten the backoff, closing does
+                self._closing.wait(backoff)
+                continue
+
+            backoff = 0.0
+            if not pending:
+                if self._closing.is_set():
+                    return
+                self._wake.wait(self._flush_interval)
+                self._wake.clear()
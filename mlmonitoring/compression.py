@@ -0,0 +1,158 @@
+import gzip
+import zlib
+from typing import List, Optional
+
+
+def _zstandard():
+    # zstd is optional, gzip is always available
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def available_encodings() -> List[str]:
+    """Returns the supported content encodings, preferred first.
+
+    Returns:
+        List[str]: 'zstd' when the zstandard package is installed, and
+        'gzip'.
+    """
+
+    return (['zstd'] if _zstandard() is not None else []) + ['gzip']
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compresses a body.
+
+    Args:
+        data (bytes): The body.
+        encoding (str): 'gzip' or 'zstd'.
+
+    Returns:
+        bytes: The compressed body.
+    """
+
+    if encoding == 'gzip':
+        # a lower level than the default 9 is much faster on JSON
+        # and compresses it almost as well
+        return gzip.compress(data, compresslevel=6)
+    if encoding == 'zstd' and _zstandard() is not None:
+        return _zstandard().ZstdCompressor(level=3).compress(data)
+    raise ValueError('Unsupported content encoding: {}'.format(encoding))
+
+
+class BodyTooLarge(ValueError):
+    """Raised when a decompressed body exceeds the maximum size."""
+
+
+# output read at once from a zstd stream
+_CHUNK_SIZE = 2 ** 16
+
+
+def _inflate_gzip(data: bytes, max_size: Optional[int]) -> bytes:
+    chunks, size = [], 0
+    # a body can hold several gzip members, as gzip.decompress accepts
+    while data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        while not decompressor.eof:
+            # at most one byte above the cap is inflated to detect it
+            limit = 0 if max_size is None else max_size - size + 1
+            chunk = decompressor.decompress(data, limit)
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise BodyTooLarge(
+                    'Decompressed body above {} bytes'.format(max_size))
+            chunks.append(chunk)
+            data = decompressor.unconsumed_tail
+            if not data and not chunk and not decompressor.eof:
+                raise ValueError('Invalid gzip body: truncated stream')
+        data = decompressor.unused_data
+    return b''.join(chunks)
+
+
+def _inflate_zstd(data: bytes, max_size: Optional[int]) -> bytes:
+    chunks, size = [], 0
+    # frames written in streaming mode do not store their size, and a
+    # body can hold several frames
+    reader = _zstandard().ZstdDecompressor().stream_reader(
+        data, read_across_frames=True)
+    with reader:
+        while True:
+            chunk = reader.read(_CHUNK_SIZE)
+            if not chunk:
+                return b''.join(chunks)
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise BodyTooLarge(
+                    'Decompressed body above {} bytes'.format(max_size))
+            chunks.append(chunk)
+
+
+def decompress(data: bytes, encoding: str,
+               max_size: Optional[int] = None) -> bytes:
+    """Decompresses a body.
+
+    The body is decompressed incrementally, so that a small body
+    expanding to a huge one is rejected once it exceeds ``max_size``
+    rather than after being held in memory.
+
+    Args:
+        data (bytes): The compressed body.
+        encoding (str): 'gzip' or 'zstd'.
+        max_size (int, optional): Maximum size of the decompressed body
+        in bytes. Defaults to None, unbounded.
+
+    Raises:
+        BodyTooLarge: If the decompressed body exceeds max_size.
+        ValueError: If the encoding is not supported or the body is
+        corrupted.
+
+    Returns:
+        bytes: The body.
+    """
+
+    if encoding not in available_encodings():
+        raise ValueError('Unsupported content encoding: {}'.format(encoding))
+    if encoding == 'gzip':
+        try:
+            return _inflate_gzip(data, max_size)
+        except zlib.error as e:
+            raise ValueError('Invalid gzip body: {}'.format(e))
+
+    try:
+        return _inflate_zstd(data, max_size)
+    except _zstandard().ZstdError as e:
+        raise ValueError('Invalid zstd body: {}'.format(e))
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Chooses the response encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The Accept-Encoding header.
+
+    Returns:
+        Optional[str]: The supported encoding with the highest quality,
+        None when the client accepts none of them.
+    """
+
+    qualities = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
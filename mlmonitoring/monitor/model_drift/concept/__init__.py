@@ -4,3 +4,6 @@
 # riskier, and there is a higher standard to be eligible 
 # for a loan. In this case, an income level that was earlier 
 # considered creditworthy is no longer creditworthy.
+
+from .detectors import ADWIN, DDM, PageHinkley
+from .methods import *
@@ -0,0 +1,404 @@
+import math
+import numpy as np
+
+
+class _DetectorBase:
+    """Online drift detector base class.
+
+    Detectors consume a stream of per-prediction values (e.g. 0/1 errors
+    or losses) without storing it. ``update`` takes a whole batch and
+    processes it with vectorized operations, and the detector state can be
+    serialized with ``get_state`` and restored with ``from_state`` between
+    monitoring runs.
+    """
+
+    name = None
+    _params = ()
+
+    def __init__(self):
+        self.n_detections = 0
+        self.drift_detected = False
+
+    def update(self, values):
+        """Update the detector with a batch of values.
+
+        Args:
+            values (array-like): Batch of values in stream order.
+
+        Returns:
+            np.ndarray: Positions in the batch where a drift was detected.
+        """
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+
+        drifts = []
+        start = 0
+        while start < len(values):
+            # each call consumes values until the first drift, after
+            # which the detector is reset and the remainder is processed
+            position = self._update(values[start:])
+            if position is None:
+                break
+            drifts.append(start + position)
+            start += position + 1
+            self.n_detections += 1
+            self._on_drift()
+
+        self.drift_detected = len(drifts) > 0
+        return np.asarray(drifts, dtype=np.int64)
+
+    def _update(self, values):
+        raise NotImplementedError
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _on_drift(self):
+        self._reset()
+
+    def _get_state(self):
+        raise NotImplementedError
+
+    def _set_state(self, state):
+        raise NotImplementedError
+
+    def get_state(self):
+        """Serialize the detector to a JSON compatible dictionary.
+
+        Returns:
+            dict: The detector parameters and state.
+        """
+
+        return {
+            'detector': self.name,
+            'params': {param: getattr(self, param) for param in self._params},
+            'n_detections': self.n_detections,
+            'state': self._get_state(),
+        }
+
+    @staticmethod
+    def from_state(state):
+        """Restore a detector serialized with ``get_state``.
+
+        Args:
+            state (dict): The serialized detector.
+
+        Returns:
+            _DetectorBase: The restored detector.
+        """
+
+        detector = DETECTORS[state['detector']](**state['params'])
+        detector.n_detections = state['n_detections']
+        detector._set_state(state['state'])
+        return detector
+
+
+class PageHinkley(_DetectorBase):
+    """Page-Hinkley test for an increase in the mean of the stream.
+
+    Args:
+        min_instances (int, optional): Minimum number of values before
+        detecting. Defaults to 30.
+        delta (float, optional): Magnitude of changes that are tolerated.
+        Defaults to 0.005.
+        threshold (float, optional): Detection threshold. Defaults to 50.
+        alpha (float, optional): Forgetting factor of the cumulative sum.
+        Defaults to 1 - 0.0001.
+    """
+
+    name = 'page_hinkley'
+    _params = ('min_instances', 'delta', 'threshold', 'alpha')
+
+    # the cumulative sum is scanned in blocks of at most this size
+    _block_size = 4096
+
+    def __init__(self, min_instances=30, delta=0.005, threshold=50,
+                 alpha=1 - 0.0001):
+        super().__init__()
+        self.min_instances = min_instances
+        self.delta = delta
+        self.threshold = threshold
+        self.alpha = alpha
+        self._reset()
+
+    def _reset(self):
+        self._n = 0
+        self._mean = 0.0
+        self._sum = 0.0
+        self._min = math.inf
+
+    def _update(self, values):
+        # the powers of a block stay above exp(-600), so neither they
+        # nor the deviations divided by them leave the float64 range
+        block = self._block_size
+        if self.alpha < 1:
+            block = max(1, min(block, int(-600 / math.log(self.alpha))))
+        for start in range(0, len(values), block):
+            position = self._update_block(values[start:start + block])
+            if position is not None:
+                return start + position
+        return None
+
+    def _update_block(self, values):
+        steps = np.arange(1, len(values) + 1)
+        count = self._n + steps
+        mean = (self._mean * self._n + np.cumsum(values)) / count
+        deviation = values - mean - self.delta
+
+        # s_t = alpha * s_{t-1} + deviation_t
+        powers = self.alpha ** steps
+        cumsum = powers * (self._sum + np.cumsum(deviation / powers))
+        minimum = np.minimum.accumulate(np.minimum(cumsum, self._min))
+
+        detected = (count >= self.min_instances) & \
+            (cumsum - minimum > self.threshold)
+        if detected.any():
+            return int(np.argmax(detected))
+
+        self._n = int(count[-1])
+        self._mean = float(mean[-1])
+        self._sum = float(cumsum[-1])
+        self._min = float(minimum[-1])
+        return None
+
+    def _get_state(self):
+        return {
+            'n': self._n, 'mean': self._mean,
+            'sum': self._sum, 'min': self._min,
+        }
+
+    def _set_state(self, state):
+        self._n = state['n']
+        self._mean = state['mean']
+        self._sum = state['sum']
+        self._min = state['min']
+
+
+class DDM(_DetectorBase):
+    """Drift Detection Method for a stream of binary errors.
+
+    Args:
+        min_instances (int, optional): Minimum number of values before
+        detecting. Defaults to 30.
+        warning_level (float, optional): Standard deviations above the
+        minimum error rate to signal a warning. Defaults to 2.0.
+        drift_level (float, optional): Standard deviations above the
+        minimum error rate to signal a drift. Defaults to 3.0.
+    """
+
+    name = 'ddm'
+    _params = ('min_instances', 'warning_level', 'drift_level')
+
+    def __init__(self, min_instances=30, warning_level=2.0, drift_level=3.0):
+        super().__init__()
+        self.min_instances = min_instances
+        self.warning_level = warning_level
+        self.drift_level = drift_level
+        self.warning_detected = False
+        self._reset()
+
+    def _reset(self):
+        self._n = 0
+        self._errors = 0.0
+        self._p_min = math.inf
+        self._s_min = math.inf
+        self._ps_min = math.inf
+
+    def _update(self, values):
+        positions = np.arange(len(values))
+        count = self._n + positions + 1
+        p = (self._errors + np.cumsum(values)) / count
+        s = np.sqrt(p * (1 - p) / count)
+        ps = np.where(count >= self.min_instances, p + s, math.inf)
+
+        # running minimum of p + s and the p and s where it was reached
+        previous = np.minimum.accumulate(
+            np.concatenate(([self._ps_min], ps)))[:-1]
+        last_min = np.maximum.accumulate(
+            np.where(ps < previous, positions, -1))
+        p_min = np.where(last_min >= 0, p[last_min], self._p_min)
+        s_min = np.where(last_min >= 0, s[last_min], self._s_min)
+
+        detected = ps > p_min + self.drift_level * s_min
+        if detected.any():
+            self.warning_detected = False
+            return int(np.argmax(detected))
+
+        self.warning_detected = bool(
+            ps[-1] > p_min[-1] + self.warning_level * s_min[-1])
+        self._n = int(count[-1])
+        self._errors = float(p[-1] * count[-1])
+        if last_min[-1] >= 0:
+            self._p_min = float(p_min[-1])
+            self._s_min = float(s_min[-1])
+            self._ps_min = float(ps[last_min[-1]])
+        return None
+
+    def _get_state(self):
+        return {
+            'n': self._n, 'errors': self._errors, 'p_min': self._p_min,
+            's_min': self._s_min, 'ps_min': self._ps_min,
+        }
+
+    def _set_state(self, state):
+        self._n = state['n']
+        self._errors = state['errors']
+        self._p_min = state['p_min']
+        self._s_min = state['s_min']
+        self._ps_min = state['ps_min']
+
+
+class ADWIN(_DetectorBase):
+    """ADaptive WINdowing drift detector.
+
+    The window is kept as an exponential histogram of bucket totals and
+    variances, so memory is logarithmic in the window width. A batch is
+    inserted ``clock`` values at a time and the window is checked for a
+    cut after each insertion.
+
+    Args:
+        delta (float, optional): Confidence value. Defaults to 0.002.
+        clock (int, optional): How often the window is checked for a cut.
+        Defaults to 32.
+        max_buckets (int, optional): Maximum number of buckets of each
+        size. Defaults to 5.
+        min_window_length (int, optional): Minimum length of each
+        sub-window. Defaults to 5.
+        grace_period (int, optional): Number of values before detecting.
+        Defaults to 10.
+    """
+
+    name = 'adwin'
+    _params = (
+        'delta', 'clock', 'max_buckets', 'min_window_length', 'grace_period')
+
+    def __init__(self, delta=0.002, clock=32, max_buckets=5,
+                 min_window_length=5, grace_period=10):
+        super().__init__()
+        self.delta = delta
+        self.clock = clock
+        self.max_buckets = max_buckets
+        self.min_window_length = min_window_length
+        self.grace_period = grace_period
+        self._reset()
+
+    def _reset(self):
+        # bucket totals and variances for each level, oldest first, where
+        # a bucket of level i summarizes 2 ** i values
+        self._totals = []
+        self._variances = []
+
+    @property
+    def width(self):
+        """Number of values in the current window."""
+        return sum(
+            len(totals) << level for level, totals in enumerate(self._totals))
+
+    @property
+    def estimation(self):
+        """Mean of the values in the current window."""
+        totals, _, sizes = self._flatten()
+        return float(totals.sum() / sizes.sum()) if len(sizes) else 0.0
+
+    def _update(self, values):
+        for start in range(0, len(values), self.clock):
+            chunk = values[start:start + self.clock]
+            self._insert(chunk)
+            if self.width >= self.grace_period and self._detect_cut():
+                return start + len(chunk) - 1
+        return None
+
+    def _insert(self, values):
+        totals, variances = values, np.zeros(len(values))
+        level = 0
+        while len(totals):
+            if level == len(self._totals):
+                self._totals.append(np.empty(0))
+                self._variances.append(np.empty(0))
+            totals = np.concatenate((self._totals[level], totals))
+            variances = np.concatenate((self._variances[level], variances))
+
+            # merge the oldest pairs of buckets into the next level
+            n_merged = max(0, -(-(len(totals) - self.max_buckets) // 2))
+            merged = 2 * n_merged
+            self._totals[level] = totals[merged:]
+            self._variances[level] = variances[merged:]
+            size = 1 << level
+            totals, variances = (
+                totals[0:merged:2] + totals[1:merged:2],
+                variances[0:merged:2] + variances[1:merged:2] +
+                (totals[0:merged:2] - totals[1:merged:2]) ** 2 / (2 * size),
+            )
+            level += 1
+
+    def _flatten(self):
+        """Buckets of every level from the oldest to the newest."""
+        levels = range(len(self._totals) - 1, -1, -1)
+        totals = np.concatenate([self._totals[i] for i in levels] or [[]])
+        variances = np.concatenate([self._variances[i] for i in levels] or [[]])
+        sizes = np.concatenate(
+            [np.full(len(self._totals[i]), 1 << i) for i in levels] or [[]])
+        return totals, variances, sizes
+
+    def _detect_cut(self):
+        detected = False
+        while self._has_cut():
+            detected = True
+            self._drop_oldest()
+        return detected
+
+    def _has_cut(self):
+        totals, variances, sizes = self._flatten()
+        width = sizes.sum()
+        if len(sizes) < 2:
+            return False
+        mean = totals.sum() / width
+        variance = (
+            variances.sum() + np.sum(sizes * (totals / sizes - mean) ** 2)
+        ) / width
+
+        # every split between buckets: older sub-window (0), newer (1)
+        n0 = np.cumsum(sizes)[:-1]
+        n1 = width - n0
+        s0 = np.cumsum(totals)[:-1]
+        s1 = totals.sum() - s0
+        valid = (n0 >= self.min_window_length) & (n1 >= self.min_window_length)
+        if not valid.any():
+            return False
+        n0, n1, s0, s1 = n0[valid], n1[valid], s0[valid], s1[valid]
+
+        delta_prime = math.log(2 * math.log(width) / self.delta)
+        m_recip = 1 / (n0 - self.min_window_length + 1) + \
+            1 / (n1 - self.min_window_length + 1)
+        epsilon = np.sqrt(2 * m_recip * variance * delta_prime) + \
+            2 / 3 * delta_prime * m_recip
+        return bool(np.any(np.abs(s0 / n0 - s1 / n1) > epsilon))
+
+    def _drop_oldest(self):
+        level = len(self._totals) - 1
+        self._totals[level] = self._totals[level][1:]
+        self._variances[level] = self._variances[level][1:]
+        while self._totals and not len(self._totals[-1]):
+            self._totals.pop()
+            self._variances.pop()
+
+    def _on_drift(self):
+        # the window was already shrunk to the values after the cut
+        pass
+
+    def _get_state(self):
+        return {
+            'totals': [totals.tolist() for totals in self._totals],
+            'variances': [variances.tolist() for variances in self._variances],
+        }
+
+    def _set_state(self, state):
+        self._totals = [np.asarray(t, dtype=np.float64) for t in state['totals']]
+        self._variances = [
+            np.asarray(v, dtype=np.float64) for v in state['variances']]
+
+
+DETECTORS = {
+    detector.name: detector for detector in (PageHinkley, DDM, ADWIN)
+}
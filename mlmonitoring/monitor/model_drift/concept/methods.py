@@ -0,0 +1,60 @@
+from mlmonitoring.monitor.model_drift.concept.detectors import (
+    _DetectorBase,
+    DETECTORS,
+)
+import os
+import json
+import pandas as pd
+
+
+def concept_drift(errors, detector='adwin', state_path=None, **kwargs):
+    """Feed a batch of per-prediction errors to an online drift detector.
+
+    The detector state is restored from ``state_path`` before the update
+    and written back after it, so consecutive monitoring runs continue
+    the same stream without storing its history.
+
+    Args:
+        errors (array-like): Per-prediction errors (0/1 or losses) in
+        stream order.
+        detector (Union[str, _DetectorBase], optional): A detector
+        instance or one of 'adwin', 'page_hinkley' and 'ddm'.
+        Defaults to 'adwin'.
+        state_path (str, optional): JSON file with the detector state.
+        Defaults to None.
+        **kwargs: Parameters of a new detector.
+
+    Raises:
+        ValueError: If the saved state is of another detector or of
+        other parameters than the ones given.
+
+    Returns:
+        pd.Series: The number of drifts detected in the batch indexed
+        by timestamp.
+    """
+
+    if isinstance(detector, str):
+        if state_path is not None and os.path.exists(state_path):
+            with open(state_path) as state_file:
+                state = json.load(state_file)
+            # the saved stream must continue with the detector asked for
+            changed = {
+                name: value for name, value in kwargs.items()
+                if state['params'].get(name) != value}
+            if state['detector'] != detector or changed:
+                raise ValueError(
+                    'The state in {} is of {} with {}, not of {} with {}'.format(
+                        state_path, state['detector'], state['params'],
+                        detector, kwargs))
+            detector = _DetectorBase.from_state(state)
+        else:
+            detector = DETECTORS[detector](**kwargs)
+
+    drifts = detector.update(errors)
+
+    if state_path is not None:
+        with open(state_path, 'w') as state_file:
+            json.dump(detector.get_state(), state_file)
+
+    index = pd.Index([pd.Timestamp.now()], name='timestamp')
+    return pd.Series([len(drifts)], index=index, name='drift')
@@ -1,36 +1,516 @@
-from pyod.models.auto_encoder import AutoEncoder
-from pyod.models.pca import PCA
-from mlmonitoring.monitor.utils import _calculate_psi
+from mlmonitoring.monitor.utils.histogram import _feature_histograms, _segments
+from mlmonitoring.monitor.utils.divergence import (
+    _divergences,
+    _histogram_psi,
+    _histogram_psi_bootstrap,
+    _histogram_psi_interval,
+)
+from mlmonitoring.monitor.utils.sampling import (
+    _drop_strata,
+    _sample_detector_data,
+    _sample_pair,
+)
+from mlmonitoring.monitor.utils.kernel import _rff_mmd
 import numpy as np
 import pandas as pd
 
 
-def psi_drift(X_train, X_test, feature_names, feature_importances, **kwargs):
-    X_train, X_test = np.array(X_train), np.array(X_test)
-    drift = [_calculate_psi(
-        X_train[:, i], X_test[:, i],
-        **kwargs, axis=1)
-        for i in range(X_train.shape[1])]
-    result = list(map(list, zip(feature_names, feature_importances, np.array(drift))))
-    result = pd.DataFrame(result, columns=['feature', 'importance', 'psi'])
+def _histograms(X_train, X_test, group_by=None, **kwargs):
+    """Feature histograms, optionally of every segment in one pass.
+
+    Returns:
+        Tuple[FeatureHistograms, Optional[pd.Index]]: The histograms and
+        the segment values, None when not grouped.
+    """
+
+    if group_by is None:
+        return _feature_histograms(X_train, X_test, **kwargs), None
+
+    X_train, X_test, train_segments, test_segments, segments = _segments(
+        X_train, X_test, group_by)
+    histograms = _feature_histograms(
+        X_train, X_test,
+        train_segments=train_segments,
+        test_segments=test_segments,
+        n_segments=len(segments),
+        **kwargs)
+    return histograms, segments
+
+
+def _drift_result(feature_names, feature_importances, metrics, segments):
+    """Drift metrics as one row per feature, or per segment and feature."""
+    feature_names = list(feature_names)
+    feature_importances = list(feature_importances)
+
+    if segments is None:
+        result = pd.DataFrame({
+            'feature': feature_names,
+            'importance': feature_importances,
+        })
+        for metric, values in metrics.items():
+            result[metric] = values[0]
+        return result
+
+    n_features = len(feature_names)
+    result = pd.DataFrame({
+        'segment': np.repeat(np.asarray(segments), n_features),
+        'feature': feature_names * len(segments),
+        'importance': feature_importances * len(segments),
+    })
+    for metric, values in metrics.items():
+        result[metric] = values.ravel()
     return result
 
 
-def pca_outlier_detection(X_train, X_test, **kwargs):
-    detector = PCA(**kwargs)
+def _sample_sizes(histograms):
+    """Rows of the reference and production samples of every feature."""
+    n_features = histograms.n_features
+    return {
+        'n_train': np.repeat(
+            histograms.n_expected[:, np.newaxis], n_features, axis=1),
+        'n_test': np.repeat(
+            histograms.n_actual[:, np.newaxis], n_features, axis=1),
+    }
+
+
+def psi_drift(X_train, X_test, feature_names, feature_importances,
+              buckettype='bins', buckets=10, max_categories=1000,
+              hash_buckets=64, group_by=None, sample=None,
+              sampling='uniform', strata=None, random_state=None,
+              ci=None, confidence=0.95, n_bootstrap=1000):
+    """PSI drift of each feature.
+
+    Numeric and categorical columns of a DataFrame are handled in the
+    same call, without converting it to an object array. Categorical
+    columns are dictionary-encoded against the reference vocabulary and
+    rare or unseen categories fall in hashed buckets.
+
+    With ``group_by``, the bucket counts of every segment are computed in
+    the same pass. The buckets are defined on the whole reference data so
+    that the segments are comparable.
+
+    With ``sample``, the PSI is computed on a sample of each dataset and
+    the result has the sample sizes and a confidence interval of the PSI,
+    so that checks can account for the sampling error. Small production
+    batches are noisy as well, ``ci`` adds the interval without sampling.
+    Bootstrap intervals resample the bucket counts of all features at
+    once with multinomial draws, never the rows.
+
+    Args:
+        X_train (array-like): Reference data, or an iterable of chunks
+        with reservoir sampling.
+        X_test (array-like): Production data, or an iterable of chunks
+        with reservoir sampling.
+        feature_names (list): Name of each feature.
+        feature_importances (list): Importance of each feature.
+        buckettype (str, optional): 'bins' for even splits or 'quantiles'
+        for quantile buckets of the reference. Defaults to 'bins'.
+        buckets (int, optional): Number of buckets of numeric features.
+        Defaults to 10.
+        max_categories (int, optional): Maximum number of reference
+        categories with their own bucket. Defaults to 1000.
+        hash_buckets (int, optional): Number of buckets shared by rare and
+        unseen categories. Defaults to 64.
+        group_by (Union[str, Tuple[array-like, array-like]], optional):
+        A column of both DataFrames, excluded from the features, or the
+        segment of each reference and production row. Defaults to None.
+        sample (Union[int, float], optional): Rows of the sample of each
+        dataset, or the fraction of its rows. Defaults to None, every row.
+        sampling (str, optional): 'uniform', 'stratified' or 'reservoir'.
+        Defaults to 'uniform'.
+        strata (Union[str, Tuple[array-like, array-like]], optional): The
+        strata of stratified sampling, as group_by, a column is excluded
+        from the features. Defaults to None, the segments of group_by.
+        random_state (int, optional): The seed of the samples and of the
+        bootstrap replicates. Defaults to None.
+        ci (str, optional): 'analytic' or 'bootstrap' to add the sample
+        sizes and the psi_ci_low and psi_ci_high columns. Defaults to
+        None, 'analytic' when sampling.
+        confidence (float, optional): The confidence level of the
+        interval. Defaults to 0.95.
+        n_bootstrap (int, optional): Number of bootstrap replicates.
+        Defaults to 1000.
+
+    Returns:
+        pd.DataFrame: One row per feature with its importance and PSI, or
+        one row per segment and feature when grouped.
+    """
+
+    if sample is not None:
+        X_train, X_test, group_by = _sample_pair(
+            X_train, X_test, sample, sampling, strata, group_by, random_state)
+        ci = ci or 'analytic'
+    if isinstance(strata, str) and strata != group_by:
+        # the strata column is not a feature, a group_by one is a segment
+        X_train, X_test = _drop_strata(X_train, strata), _drop_strata(X_test, strata)
+    if ci not in (None, 'analytic', 'bootstrap'):
+        raise ValueError('Unknown confidence interval: {}'.format(ci))
+
+    histograms, segments = _histograms(
+        X_train, X_test, group_by,
+        buckettype=buckettype, buckets=buckets,
+        max_categories=max_categories, hash_buckets=hash_buckets)
+    metrics = {'psi': _histogram_psi(histograms)}
+    if ci == 'analytic':
+        interval = _histogram_psi_interval(
+            histograms, metrics['psi'], confidence)
+    elif ci == 'bootstrap':
+        interval = _histogram_psi_bootstrap(
+            histograms, metrics['psi'], n_bootstrap, confidence, random_state)
+    if ci is not None:
+        metrics.update(_sample_sizes(histograms))
+        metrics['psi_ci_low'], metrics['psi_ci_high'] = interval
+    return _drift_result(
+        feature_names, feature_importances, metrics, segments)
+
+
+def drift_suite(X_train, X_test, feature_names, feature_importances,
+                buckettype='bins', buckets=10, max_categories=1000,
+                hash_buckets=64, group_by=None):
+    """PSI, KL, JS, Hellinger and Wasserstein drift of each feature.
+
+    Every feature is histogrammed once and all metrics are derived from
+    the same bucket counts.
+
+    Args:
+        X_train (array-like): Reference data.
+        X_test (array-like): Production data.
+        feature_names (list): Name of each feature.
+        feature_importances (list): Importance of each feature.
+        buckettype (str, optional): 'bins' for even splits or 'quantiles'
+        for quantile buckets of the reference. Defaults to 'bins'.
+        buckets (int, optional): Number of buckets of numeric features.
+        Defaults to 10.
+        max_categories (int, optional): Maximum number of reference
+        categories with their own bucket. Defaults to 1000.
+        hash_buckets (int, optional): Number of buckets shared by rare and
+        unseen categories. Defaults to 64.
+        group_by (Union[str, Tuple[array-like, array-like]], optional):
+        A column of both DataFrames, excluded from the features, or the
+        segment of each reference and production row. Defaults to None.
+
+    Returns:
+        pd.DataFrame: One row per feature with its importance and metrics,
+        or one row per segment and feature when grouped.
+    """
+
+    histograms, segments = _histograms(
+        X_train, X_test, group_by,
+        buckettype=buckettype, buckets=buckets,
+        max_categories=max_categories, hash_buckets=hash_buckets)
+    return _drift_result(
+        feature_names, feature_importances,
+        _divergences(histograms), segments)
+
+
+def latent_drift(X_train, X_test, test='mmd', encoder=None, cache_path=None,
+                 layer_sizes=(64, 32, 10), max_iter=20, n_features=256,
+                 bandwidth=None, random_state=None, **kwargs):
+    """Multivariate drift in the latent space of an autoencoder.
+
+    Per-feature metrics miss shifts of the joint distribution, and
+    multivariate tests on thousands of features are expensive. Both
+    datasets are encoded in the small latent space of a
+    MLPRegressorAutoEncoder fitted on the reference, where a linear time
+    test compares them: the MMD under a Gaussian kernel approximated with
+    random Fourier features, or the PSI of each latent dimension.
+
+    With ``cache_path``, the fitted encoder and the encoded reference are
+    saved on the first run and loaded by the next ones, which only encode
+    their production data.
+
+    Args:
+        X_train (array-like): Reference data, None to use the cache.
+        X_test (array-like): Production data.
+        test (str, optional): 'mmd' or 'psi'. Defaults to 'mmd'.
+        encoder (MLPRegressorAutoEncoder, optional): A fitted encoder.
+        Defaults to None, fitting one.
+        cache_path (str, optional): The file caching the encoder and the
+        encoded reference. Defaults to None.
+        layer_sizes (tuple, optional): Sizes of the encoder layers, the
+        last one is the latent space. Defaults to (64, 32, 10).
+        max_iter (int, optional): Training epochs of the autoencoder.
+        Defaults to 20.
+        n_features (int, optional): Number of random Fourier features.
+        Defaults to 256.
+        bandwidth (float, optional): Bandwidth of the kernel. Defaults to
+        None, the median distance between encoded reference rows.
+        random_state (int, optional): The seed of the autoencoder and of
+        the random features. Defaults to None.
+        **kwargs: Arguments of psi_drift with the 'psi' test.
+
+    Returns:
+        pd.DataFrame: The MMD with the kernel bandwidth and the number of
+        rows of each dataset, indexed by timestamp, or the psi_drift result
+        of the latent dimensions.
+    """
+
+    if test not in ('mmd', 'psi'):
+        raise ValueError('Unknown test: {}'.format(test))
+
+    # scikit-learn is imported on use, PSI-only jobs never load it
+    from mlmonitoring.monitor.utils.autoencoder import _latent_reference
+
+    reference = _latent_reference(
+        X_train, encoder, cache_path, layer_sizes=layer_sizes,
+        max_iter=max_iter, random_state=random_state)
+    Z_train = reference['latent']
+    Z_test = reference['encoder'].encode(X_test)
+
+    if test == 'psi':
+        names = ['latent_{}'.format(i) for i in range(Z_train.shape[1])]
+        importances = [1 / len(names)] * len(names)
+        return psi_drift(Z_train, Z_test, names, importances, **kwargs)
+
+    mmd, bandwidth = _rff_mmd(
+        Z_train, Z_test, n_features, bandwidth, random_state)
+    return pd.DataFrame({
+        'mmd': [mmd],
+        'bandwidth': [bandwidth],
+        'n_train': [len(Z_train)],
+        'n_test': [len(Z_test)],
+    }, index=pd.Index([pd.Timestamp.now()], name='timestamp'))
+
+
+def classifier_drift(X_train, X_test, feature_names, feature_importances,
+                     max_rows=20_000, n_folds=5, n_jobs=None, tolerance=0.01,
+                     confidence=0.95, classifier=None, sampling='uniform',
+                     strata=None, random_state=None):
+    """Multivariate drift with a domain classifier.
+
+    A classifier is trained to tell the production rows from the
+    reference rows, its cross-validated AUC is 0.5 without drift and
+    grows with any shift of the joint distribution. Each dataset is
+    sampled to ``max_rows`` rows, the folds are fitted in parallel and
+    the remaining folds are skipped once the confidence interval of the
+    AUC is tight enough.
+
+    Args:
+        X_train (array-like): Reference data, or an iterable of chunks
+        with reservoir sampling.
+        X_test (array-like): Production data, or an iterable of chunks
+        with reservoir sampling.
+        feature_names (list): Name of each feature.
+        feature_importances (list): Importance of each feature.
+        max_rows (int, optional): Rows of the sample of each dataset, None
+        for every row. Defaults to 20,000.
+        n_folds (int, optional): Number of cross-validation folds.
+        Defaults to 5.
+        n_jobs (int, optional): Number of folds fitted in parallel, as
+        joblib. Defaults to None, one.
+        tolerance (float, optional): Half width of the AUC interval at
+        which to stop, 0 to fit every fold. Defaults to 0.01.
+        confidence (float, optional): The confidence level of the
+        interval. Defaults to 0.95.
+        classifier (sklearn estimator, optional): An unfitted probabilistic
+        classifier. Defaults to None, a HistGradientBoostingClassifier.
+        sampling (str, optional): 'uniform', 'stratified' or 'reservoir'.
+        Defaults to 'uniform'.
+        strata (Union[str, Tuple[array-like, array-like]], optional): The
+        strata of stratified sampling, a column of both DataFrames is
+        excluded from the features. Defaults to None.
+        random_state (int, optional): The seed of the samples, the folds
+        and the classifier. Defaults to None.
+
+    Returns:
+        pd.DataFrame: One row per feature with its importance and its
+        attribution, the share of the separation due to the feature, and
+        the auc with its interval, the sample sizes and the folds fitted.
+    """
+
+    # scikit-learn is imported on use, PSI-only jobs never load it
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from mlmonitoring.monitor.utils.classifier import (
+        _cross_validated_auc,
+        _encode_features,
+    )
+
+    if max_rows is not None:
+        X_train, X_test, _ = _sample_pair(
+            X_train, X_test, max_rows, sampling, strata,
+            random_state=random_state)
+    X_train, X_test = _drop_strata(X_train, strata), _drop_strata(X_test, strata)
+    X_train, X_test = _encode_features(X_train, X_test)
+    if classifier is None:
+        classifier = HistGradientBoostingClassifier(random_state=random_state)
+
+    X = np.concatenate([X_train, X_test])
+    y = np.concatenate([np.zeros(len(X_train), dtype=np.int64),
+                        np.ones(len(X_test), dtype=np.int64)])
+    cv = _cross_validated_auc(
+        classifier, X, y, n_folds, n_jobs, tolerance, confidence, random_state)
+
+    metrics = {'attribution': cv.pop('attribution')[np.newaxis]}
+    metrics.update({
+        name: np.full((1, X.shape[1]), value) for name, value in (
+            ('auc', cv['auc']),
+            ('auc_ci_low', cv['auc_ci_low']),
+            ('auc_ci_high', cv['auc_ci_high']),
+            ('n_train', len(X_train)),
+            ('n_test', len(X_test)),
+            ('n_folds', cv['n_folds']),
+        )
+    })
+    return _drift_result(feature_names, feature_importances, metrics, None)
+
+
+def _outlier_detection(detector, X_train, X_test, sample, test_sample,
+                       sampling, strata, random_state):
+    """Fits a pyod detector on a sample of the reference data and scores
+    a sample of the production data.
+
+    The sample sizes are kept in the ``attrs`` of the returned Series.
+    """
+
+    X_train, X_test = _sample_detector_data(
+        X_train, X_test, sample, test_sample, sampling, strata, random_state)
+
     detector.fit(X_train)
     prob = detector.predict_proba(X_test)[:, -1]
 
     if isinstance(X_test, pd.DataFrame):
-        return pd.Series(prob, name='outlier', index=X_test.index)
-    return pd.Series(prob, name='outlier')
+        result = pd.Series(prob, name='outlier', index=X_test.index)
+    else:
+        result = pd.Series(prob, name='outlier')
+    result.attrs.update({'n_train': len(X_train), 'n_test': len(X_test)})
+    return result
 
 
-def autoencoder_outlier_detection(X_train, X_test, **kwargs):
-    detector = AutoEncoder(**kwargs)
-    detector.fit(X_train)
-    prob = detector.predict_proba(X_test)[:, -1]
+def pca_outlier_detection(X_train, X_test, sample=None, test_sample=None,
+                          sampling='uniform', strata=None, random_state=None,
+                          **kwargs):
+    """Outlier probability of each production row under a PCA detector.
+
+    Args:
+        X_train (array-like): Reference data.
+        X_test (array-like): Production data.
+        sample (Union[int, float], optional): Rows of the reference
+        sample the detector is fitted on, or their fraction. Defaults to
+        None, every row.
+        test_sample (Union[int, float], optional): Rows of the production
+        sample to score, or their fraction. Defaults to None, every row.
+        sampling (str, optional): 'uniform', 'stratified' or 'reservoir'.
+        Defaults to 'uniform'.
+        strata (str, optional): The column of stratified sampling, which
+        is not a feature. Defaults to None.
+        random_state (int, optional): The seed of the samples. Defaults
+        to None.
+        **kwargs: Arguments of pyod's PCA.
+
+    Returns:
+        pd.Series: The outlier probability of each scored row.
+    """
+
+    # pyod is imported on use, PSI-only jobs never load it
+    from pyod.models.pca import PCA
+
+    return _outlier_detection(
+        PCA(**kwargs), X_train, X_test, sample, test_sample,
+        sampling, strata, random_state)
+
+
+def autoencoder_outlier_detection(X_train, X_test, sample=None,
+                                  test_sample=None, sampling='uniform',
+                                  strata=None, random_state=None, **kwargs):
+    """Outlier probability of each production row under an autoencoder.
+
+    Args:
+        X_train (array-like): Reference data.
+        X_test (array-like): Production data.
+        sample (Union[int, float], optional): Rows of the reference
+        sample the detector is fitted on, or their fraction. Defaults to
+        None, every row.
+        test_sample (Union[int, float], optional): Rows of the production
+        sample to score, or their fraction. Defaults to None, every row.
+        sampling (str, optional): 'uniform', 'stratified' or 'reservoir'.
+        Defaults to 'uniform'.
+        strata (str, optional): The column of stratified sampling, which
+        is not a feature. Defaults to None.
+        random_state (int, optional): The seed of the samples. Defaults
+        to None.
+        **kwargs: Arguments of pyod's AutoEncoder.
+
+    Returns:
+        pd.Series: The outlier probability of each scored row.
+    """
+
+    # loads a deep learning backend, imported on use
+    from pyod.models.auto_encoder import AutoEncoder
+
+    return _outlier_detection(
+        AutoEncoder(**kwargs), X_train, X_test, sample, test_sample,
+        sampling, strata, random_state)
+
+
+def knn_outlier_detection(X_train, X_test, method='knn', n_neighbors=10,
+                          algorithm='auto', n_components=20, index_path=None,
+                          chunk_size=10_000, n_jobs=None, sample=None,
+                          test_sample=None, sampling='uniform', strata=None,
+                          random_state=None):
+    """Outlier probability of each production row from its neighbors.
+
+    The scores follow the local density of the reference data: the
+    distance to the k-th nearest reference row, or the local outlier
+    factor. The reference rows are indexed once in a KD-tree, a ball tree
+    or a KD-tree over a random projection for high dimensional data.
+    With ``index_path``, the index is saved on the first run and memory
+    mapped by the next ones. Production rows are queried in parallel
+    chunks.
+
+    Args:
+        X_train (array-like): Reference data, None to use the saved index.
+        X_test (array-like): Production data.
+        method (str, optional): 'knn' or 'lof'. Defaults to 'knn'.
+        n_neighbors (int, optional): Number of neighbors. Defaults to 10.
+        algorithm (str, optional): 'kd_tree', 'ball_tree', 'projection'
+        or 'auto', a projection above twice n_components features and a
+        KD-tree otherwise.
+        Defaults to 'auto'.
+        n_components (int, optional): Dimensions of the random
+        projection. Defaults to 20.
+        index_path (str, optional): The file of the index. Defaults to
+        None.
+        chunk_size (int, optional): Rows of each query. Defaults to 10,000.
+        n_jobs (int, optional): Number of chunks queried in parallel, as
+        joblib. Defaults to None, one.
+        sample (Union[int, float], optional): Rows of the reference
+        sample the index is built on, or their fraction. Defaults to
+        None, every row.
+        test_sample (Union[int, float], optional): Rows of the production
+        sample to score, or their fraction. Defaults to None, every row.
+        sampling (str, optional): 'uniform', 'stratified' or 'reservoir'.
+        Defaults to 'uniform'.
+        strata (str, optional): The column of stratified sampling, which
+        is not a feature. Defaults to None.
+        random_state (int, optional): The seed of the samples and of the
+        projection. Defaults to None.
+
+    Returns:
+        pd.Series: The outlier probability of each scored row.
+    """
+
+    # scikit-learn is imported on use, PSI-only jobs never load it
+    from mlmonitoring.monitor.utils.neighbors import (
+        METHODS,
+        _neighbor_index,
+        _score_chunks,
+    )
+
+    if method not in METHODS:
+        raise ValueError('Unknown method: {}'.format(method))
+
+    X_train, X_test = _sample_detector_data(
+        X_train, X_test, sample, test_sample, sampling, strata, random_state)
+
+    index = _neighbor_index(
+        X_train, index_path, n_neighbors=n_neighbors, algorithm=algorithm,
+        n_components=n_components, random_state=random_state)
+    prob = _score_chunks(index, X_test, method, chunk_size, n_jobs)
 
     if isinstance(X_test, pd.DataFrame):
-        return pd.Series(prob, name='outlier', index=X_test.index)
-    return pd.Series(prob, name='outlier')
+        result = pd.Series(prob, name='outlier', index=X_test.index)
+    else:
+        result = pd.Series(prob, name='outlier')
+    result.attrs.update({'n_train': len(index.k_distance_),
+                         'n_test': len(X_test)})
+    return result
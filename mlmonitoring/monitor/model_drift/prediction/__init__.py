@@ -3,3 +3,5 @@
 # credit-worthy applications when your product was launched in a 
 # more affluent area. Your model still holds, but your business 
 # may be unprepared for this scenario
+
+from .methods import *
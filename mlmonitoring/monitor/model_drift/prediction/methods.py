@@ -0,0 +1,117 @@
+from mlmonitoring.monitor.utils.distribution import (
+    SortedDistribution,
+    QuantileSketch,
+    _ks_statistic,
+    _wasserstein_distance,
+    _score_psi,
+)
+import pandas as pd
+
+
+def _as_distribution(scores, approximate=False, sketch_size=2048):
+    """Convert scores to a sorted distribution.
+
+    Args:
+        scores (Union[array-like, SortedDistribution, QuantileSketch]):
+        Raw scores, an already sorted reference or a sketch of a stream.
+        approximate (bool, optional): Summarize raw scores with a
+        QuantileSketch. Defaults to False.
+        sketch_size (int, optional): Size of the sketch. Defaults to 2048.
+
+    Returns:
+        SortedDistribution: The sorted distribution.
+    """
+
+    if isinstance(scores, SortedDistribution):
+        return scores
+    if isinstance(scores, QuantileSketch):
+        return scores.distribution()
+    if approximate:
+        return QuantileSketch(sketch_size).update(scores).distribution()
+    return SortedDistribution(scores)
+
+
+def _statistic_series(value, name):
+    index = pd.Index([pd.Timestamp.now()], name='timestamp')
+    return pd.Series([value], index=index, name=name)
+
+
+def ks_drift(y_train, y_test, approximate=False, sketch_size=2048):
+    """Two-sample Kolmogorov-Smirnov statistic between score distributions.
+
+    Args:
+        y_train (Union[array-like, SortedDistribution, QuantileSketch]):
+        Reference scores. Pass a SortedDistribution to sort them only once.
+        y_test (Union[array-like, SortedDistribution, QuantileSketch]):
+        Production scores.
+        approximate (bool, optional): Compare QuantileSketch summaries
+        instead of the exact scores. Defaults to False.
+        sketch_size (int, optional): Size of the sketches. Defaults to 2048.
+
+    Returns:
+        pd.Series: The statistic indexed by timestamp.
+    """
+
+    statistic = _ks_statistic(
+        _as_distribution(y_train, approximate, sketch_size),
+        _as_distribution(y_test, approximate, sketch_size),
+    )
+    return _statistic_series(statistic, 'ks')
+
+
+def wasserstein_drift(y_train, y_test, approximate=False, sketch_size=2048):
+    """Wasserstein-1 distance between score distributions.
+
+    Args:
+        y_train (Union[array-like, SortedDistribution, QuantileSketch]):
+        Reference scores. Pass a SortedDistribution to sort them only once.
+        y_test (Union[array-like, SortedDistribution, QuantileSketch]):
+        Production scores.
+        approximate (bool, optional): Compare QuantileSketch summaries
+        instead of the exact scores. Defaults to False.
+        sketch_size (int, optional): Size of the sketches. Defaults to 2048.
+
+    Returns:
+        pd.Series: The distance indexed by timestamp.
+    """
+
+    distance = _wasserstein_distance(
+        _as_distribution(y_train, approximate, sketch_size),
+        _as_distribution(y_test, approximate, sketch_size),
+    )
+    return _statistic_series(distance, 'wasserstein')
+
+
+def psi_score_drift(
+    y_train,
+    y_test,
+    buckettype='bins',
+    buckets=10,
+    approximate=False,
+    sketch_size=2048,
+):
+    """PSI between score distributions.
+
+    Args:
+        y_train (Union[array-like, SortedDistribution, QuantileSketch]):
+        Reference scores. Pass a SortedDistribution to sort them only once.
+        y_test (Union[array-like, SortedDistribution, QuantileSketch]):
+        Production scores.
+        buckettype (str, optional): 'bins' for even splits or 'quantiles'
+        for quantile buckets of the reference. Defaults to 'bins'.
+        buckets (int, optional): Number of buckets. Defaults to 10.
+        approximate (bool, optional): Compare QuantileSketch summaries
+        instead of the exact scores. Defaults to False.
+        sketch_size (int, optional): Size of the sketches. Defaults to 2048.
+
+    Returns:
+        pd.Series: The PSI indexed by timestamp.
+    """
+
+    psi = _score_psi(
+        _as_distribution(y_train, approximate, sketch_size),
+        _as_distribution(y_test, approximate, sketch_size),
+        buckets=buckets,
+        buckettype=buckettype,
+    )
+    return _statistic_series(psi, 'psi')
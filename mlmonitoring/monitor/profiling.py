@@ -0,0 +1,121 @@
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+import time
+import uuid
+import tracemalloc
+import pandas as pd
+
+
+Hook = Callable[[dict], None]
+
+
+def _rows(obj) -> Optional[int]:
+    """Number of rows of a monitoring output, if it has any."""
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+class Profiler:
+    """Records the cost of each phase of a monitoring run.
+
+    Every phase records its wall time, CPU time, row count and, when
+    ``trace_memory`` is set, the peak of memory allocated by Python
+    during the phase. Each record is passed to the hooks as soon as the
+    phase ends.
+
+    Args:
+        hooks (List[Hook], optional): Callables receiving each record.
+        Defaults to None.
+        trace_memory (bool, optional): Trace the peak memory of each phase
+        with tracemalloc, which slows allocations down. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        hooks: Optional[List[Hook]] = None,
+        trace_memory: bool = False
+    ) -> None:
+        self.run_id = uuid.uuid4().hex
+        self.records = []
+        self._hooks = list(hooks or [])
+        self._trace_memory = trace_memory
+
+    @contextmanager
+    def phase(self, monitor: str, phase: str, rows: Optional[int] = None):
+        """Measure a phase of a monitor.
+
+        Args:
+            monitor (str): The table name of the monitor.
+            phase (str): The name of the phase.
+            rows (int, optional): Number of rows handled by the phase.
+            It can also be set on the yielded record. Defaults to None.
+
+        Yields:
+            dict: The record of the phase.
+        """
+
+        record = {
+            'run_id': self.run_id,
+            'timestamp': pd.Timestamp.now(),
+            'monitor': monitor,
+            'phase': phase,
+            'rows': rows,
+        }
+
+        tracing = self._trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if self._trace_memory:
+            _reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_time'] = time.perf_counter() - start_wall
+            record['cpu_time'] = time.process_time() - start_cpu
+            record['peak_memory'] = None
+            if self._trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                record['peak_memory'] = max(0, peak - start_memory)
+            if tracing:
+                tracemalloc.stop()
+
+            self.records.append(record)
+            for hook in self._hooks:
+                hook(record)
+
+    def monitor_records(self, monitor: str) -> List[dict]:
+        """Returns the records of a monitor.
+
+        Args:
+            monitor (str): The table name of the monitor.
+
+        Returns:
+            List[dict]: The records of each phase of the monitor.
+        """
+
+        return [record for record in self.records if record['monitor'] == monitor]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns all records as a DataFrame.
+
+        Returns:
+            pd.DataFrame: One row per phase.
+        """
+
+        return pd.DataFrame(self.records, columns=[
+            'run_id', 'timestamp', 'monitor', 'phase', 'rows',
+            'wall_time', 'cpu_time', 'peak_memory',
+        ])
+
+
+def _reset_peak():
+    # tracemalloc.reset_peak is only available from Python 3.9
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.clear_traces()
@@ -0,0 +1,259 @@
+from typing import Any, Callable, Dict, List, Optional
+import os
+import json
+import datetime
+import time
+import logging
+import threading
+import numpy as np
+import pandas as pd
+
+
+_logger = logging.getLogger(__name__)
+
+# returns the rows at or after the watermark, all of them when it is None
+Source = Callable[[Optional[Any]], pd.DataFrame]
+# configures the monitors of a batch, the state dict persists between runs
+Build = Callable[[pd.DataFrame, dict], Any]
+
+
+def _encode_watermark(value):
+    if isinstance(value, (pd.Timestamp, np.datetime64, datetime.datetime)):
+        return {'timestamp': pd.Timestamp(value).isoformat()}
+    if isinstance(value, datetime.date):
+        return {'date': value.isoformat()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode_watermark(value):
+    if isinstance(value, dict) and 'timestamp' in value:
+        return pd.Timestamp(value['timestamp'])
+    if isinstance(value, dict) and 'date' in value:
+        return datetime.date.fromisoformat(value['date'])
+    return value
+
+
+def _row_keys(batch: pd.DataFrame) -> pd.Series:
+    # the index of a source is not stable between queries, only the
+    # values identify a row
+    return pd.util.hash_pandas_object(batch, index=False).astype(str)
+
+
+class Suite:
+    """A monitoring suite run on the data that arrived since its last run.
+
+    Args:
+        name (str): The name of the suite, also the name of its state file.
+        source (Source): Returns the rows at or after a watermark, or all
+        of them when it is None.
+        build (Build): Returns the MLmonitoring to run on a batch, or None
+        to skip it. It can keep incremental state, e.g. serialized
+        sketches or detectors, in the dict it receives.
+        interval (float, optional): Seconds between runs. Defaults to 3600.
+        watermark (str, optional): The column ordering the rows, the index
+        when None. Defaults to 'timestamp'.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        source: Source,
+        build: Build,
+        interval: float = 3600.0,
+        watermark: Optional[str] = 'timestamp'
+    ) -> None:
+        self.name = name
+        self.source = source
+        self.build = build
+        self.interval = interval
+        self.watermark = watermark
+
+    def _positions(self, batch: pd.DataFrame) -> pd.Index:
+        if self.watermark is None:
+            return batch.index
+        return pd.Index(batch[self.watermark])
+
+
+class Scheduler:
+    """Runs registered suites on an interval, each on its new data only.
+
+    The watermark of each suite, the time of its last run and its
+    incremental state are written to ``<state_dir>/<name>.json`` after
+    every successful run. A failed run leaves them untouched, so its
+    data is processed again by the next one.
+
+    Args:
+        state_dir (str): Directory of the state files.
+    """
+
+    def __init__(self, state_dir: str) -> None:
+        self._state_dir = state_dir
+        self._suites = {}
+        self._attempts = {}
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(state_dir, exist_ok=True)
+
+    def add(
+        self,
+        name: str,
+        source: Source,
+        build: Build,
+        interval: float = 3600.0,
+        watermark: Optional[str] = 'timestamp'
+    ) -> Suite:
+        """Registers a suite. See Suite."""
+        suite = Suite(name, source, build, interval, watermark)
+        self._suites[name] = suite
+        return suite
+
+    def suite(
+        self,
+        name: str,
+        source: Source,
+        interval: float = 3600.0,
+        watermark: Optional[str] = 'timestamp'
+    ):
+        """Registers the decorated function as the build of a suite."""
+
+        def decorator(build):
+            self.add(name, source, build, interval, watermark)
+            return build
+        return decorator
+
+    def _state_path(self, name: str) -> str:
+        return os.path.join(self._state_dir, '{}.json'.format(name))
+
+    def load_state(self, name: str) -> dict:
+        """Returns the persisted state of a suite.
+
+        Args:
+            name (str): The name of the suite.
+
+        Returns:
+            dict: The watermark, the time of the last run, the number of
+            rows processed at the watermark by hash of their values and
+            the incremental state of the suite.
+        """
+
+        path = self._state_path(name)
+        if not os.path.exists(path):
+            return {
+                'watermark': None, 'last_run': None, 'seen': {}, 'state': {}}
+        with open(path) as state_file:
+            state = json.load(state_file)
+        state['watermark'] = _decode_watermark(state['watermark'])
+        return state
+
+    def _save_state(self, name: str, state: dict) -> None:
+        path = self._state_path(name)
+        # a crash while writing must not lose the previous watermark
+        with open(path + '.tmp', 'w') as state_file:
+            json.dump(dict(
+                state, watermark=_encode_watermark(state['watermark'])),
+                state_file)
+        os.replace(path + '.tmp', path)
+
+    def run_suite(self, name: str) -> Optional[List[dict]]:
+        """Runs a suite now on the rows after its watermark.
+
+        Rows at the watermark are also run, unless a previous run
+        processed them, so that rows arriving late with the same position
+        as the last processed ones are not lost.
+
+        Args:
+            name (str): The name of the suite.
+
+        Returns:
+            Optional[List[dict]]: The results of the run, None when there
+            was no new data.
+        """
+
+        suite = self._suites[name]
+        state = self.load_state(name)
+        self._attempts[name] = time.time()
+
+        watermark = state['watermark']
+        seen = state.get('seen', {})
+        batch = suite.source(watermark)
+        keys = _row_keys(batch)
+        if watermark is not None and len(batch):
+            # rows arriving late at the watermark are kept, only the
+            # rows already processed at it are dropped
+            positions = suite._positions(batch)
+            occurrence = keys.groupby(keys).cumcount()
+            processed = (positions == watermark) & \
+                (occurrence < keys.map(seen).fillna(0)).to_numpy()
+            new = (positions >= watermark) & ~processed
+            batch, keys = batch[new], keys[new]
+
+        results = None
+        if len(batch):
+            monitoring = suite.build(batch, state['state'])
+            if monitoring is not None:
+                results = monitoring.run()
+            positions = suite._positions(batch)
+            state['watermark'] = positions.max()
+            if state['watermark'] != watermark:
+                seen = {}
+            for key, count in keys[
+                    positions == state['watermark']].value_counts().items():
+                seen[key] = seen.get(key, 0) + int(count)
+            state['seen'] = seen
+
+        state['last_run'] = self._attempts[name]
+        self._save_state(name, state)
+        return results
+
+    def due(self, name: str, now: Optional[float] = None) -> bool:
+        """Whether the interval of a suite elapsed since its last run."""
+        now = time.time() if now is None else now
+        last_run = max(
+            self.load_state(name)['last_run'] or 0.0,
+            self._attempts.get(name, 0.0))
+        return now - last_run >= self._suites[name].interval
+
+    def run_pending(self) -> Dict[str, Optional[List[dict]]]:
+        """Runs the suites whose interval elapsed.
+
+        Returns:
+            Dict[str, Optional[List[dict]]]: The results of each suite run.
+        """
+
+        results = {}
+        for name in list(self._suites):
+            if not self.due(name):
+                continue
+            try:
+                results[name] = self.run_suite(name)
+            except Exception:
+                _logger.exception('Suite {} failed'.format(name))
+        return results
+
+    def run_forever(self, poll: float = 1.0) -> None:
+        """Runs the pending suites until stop is called.
+
+        Args:
+            poll (float, optional): Seconds between checks. Defaults to 1.0.
+        """
+
+        self._stop.clear()
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(poll)
+
+    def start(self, poll: float = 1.0) -> None:
+        """Runs the pending suites in a background thread."""
+        self._thread = threading.Thread(
+            target=self.run_forever, args=(poll,),
+            name='mlmonitoring-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the background thread after its current run."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -1,7 +1,9 @@
-from typing import Callable, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 from mlmonitoring.client import Client
 from mlmonitoring.monitor.checks import Check
+from mlmonitoring.monitor.profiling import Hook, Profiler, _rows
 import pandas as pd
+import io
 import json
 import logging
 
@@ -9,6 +11,14 @@ import logging
 _logger = logging.getLogger(__name__)
 
 
+def _read_records(text: str) -> pd.DataFrame:
+    """Reads the records of a view or filter response."""
+    # servers before the pre-encoded responses sent a JSON string
+    if text.startswith('"'):
+        text = json.loads(text)
+    return pd.read_json(io.StringIO(text), orient='records')
+
+
 CheckList = Optional[
     Union[Check, List[Check]]
 ]
@@ -57,27 +67,41 @@ class Monitoring:
 
         return self._table_name
 
-    def __call__(self):
+    def __call__(self, profiler: Optional[Profiler] = None):
         """Call function for the monitoring method.
 
+        Args:
+            profiler (Profiler, optional): A profiler recording the
+            method and each check. Defaults to None.
+
         Returns:
             dict: A dictionary with information about the applied
             method.
         """
 
-        results = self._method(*self._param_args, **self._param_kwargs)
+        profiler = profiler or Profiler()
+
+        with profiler.phase(self._table_name, 'method') as record:
+            results = self._method(*self._param_args, **self._param_kwargs)
+            record['rows'] = _rows(results)
 
         # low risk checks
         low_risk_checks = []
         for risk in self._low_risk:
-            warning, cases = risk(results)
+            phase = 'check:low_risk:{}'.format(risk.name)
+            with profiler.phase(self._table_name, phase) as record:
+                warning, cases = risk(results)
+                record['rows'] = _rows(cases)
             if warning:
                 low_risk_checks.append((risk.name, cases))
 
         # high_risk checks
         high_risk_checks = []
         for risk in self._high_risk:
-            warning, cases = risk(results)
+            phase = 'check:high_risk:{}'.format(risk.name)
+            with profiler.phase(self._table_name, phase) as record:
+                warning, cases = risk(results)
+                record['rows'] = _rows(cases)
             if warning:
                 high_risk_checks.append((risk.name, cases))
 
@@ -86,6 +110,7 @@ class Monitoring:
             'results': results,
             'low_risk': low_risk_checks,
             'high_risk': high_risk_checks,
+            'timings': profiler.monitor_records(self._table_name),
         }
 
 
@@ -98,7 +123,11 @@ class MLmonitoring:
         self._monitors = []
         self._client = Client()
         self._project = ''
-        
+        self._profiling_hooks = []
+        self._trace_memory = False
+        self._insert_timings = False
+        self._batch_insert = True
+
     def set_connection(self, api_url):
         """Sets the server connection.
 
@@ -109,6 +138,35 @@ class MLmonitoring:
         self._client.set_connection(api_url)
         return self
     
+    def set_outbox(self, path: Optional[str], **kwargs):
+        """Queues the inserts of the runs in a local outbox.
+
+        Runs do not wait for the server, a background thread sends the
+        results. See Client.set_outbox.
+
+        Args:
+            path (str): The SQLite file of the outbox, None to disable it.
+            **kwargs: Options of Outbox.
+        """
+
+        self._client.set_outbox(path, **kwargs)
+        return self
+
+    def set_batch_insert(self, enabled: bool = True):
+        """Sets whether a run inserts its results in a single request.
+
+        Batched runs are written in a single transaction, all of the
+        results or none of them. Otherwise every monitor inserts its
+        results as soon as it ends.
+
+        Args:
+            enabled (bool, optional): Insert the results of a run at once.
+            Defaults to True.
+        """
+
+        self._batch_insert = enabled
+        return self
+
     def set_project(self, project_name):
         """Sets the project name.
 
@@ -119,6 +177,33 @@ class MLmonitoring:
         self._project = project_name
         return self
 
+    def set_profiling(
+        self,
+        trace_memory: bool = False,
+        insert: bool = False,
+        hooks: Optional[List[Hook]] = None
+    ):
+        """Configures the instrumentation of the runs.
+
+        The wall time, CPU time and rows of each phase (method, checks,
+        serialization and upload) are always recorded in the results. A
+        batched upload is recorded once, under the monitor 'run', and
+        listed in the timings of every monitor of the run.
+
+        Args:
+            trace_memory (bool, optional): Record the peak memory of each
+            phase. Defaults to False.
+            insert (bool, optional): Insert the timings of each run to the
+            <project>_monitoring_runs table. Defaults to False.
+            hooks (List[Hook], optional): Callables receiving the record of
+            each phase as soon as it ends. Defaults to None.
+        """
+
+        self._trace_memory = trace_memory
+        self._insert_timings = insert
+        self._profiling_hooks = list(hooks or [])
+        return self
+
     def append(
         self,
         table_name: str,
@@ -160,29 +245,69 @@ class MLmonitoring:
             monitoring method.
         """
 
+        profiler = Profiler(self._profiling_hooks, self._trace_memory)
+
         all_results = []
+        payloads = []
         for monitor in self._monitors:
-            results = monitor()
+            table_name = monitor.get_table_name()
+            results = monitor(profiler)
+            rows = _rows(results['results'])
+
+            with profiler.phase(table_name, 'serialization', rows):
+                data = self._client.insert_payload(
+                    results['results'],
+                    self._project,
+                    table_name
+                )
+            if self._batch_insert:
+                payloads.append(data)
+            else:
+                with profiler.phase(table_name, 'upload', rows):
+                    self._client.post_insert(data)
+                _logger.info('Inserted data to {}_{}'.format(
+                    self._project,
+                    table_name
+                ))
+
+            results['timings'] = profiler.monitor_records(table_name)
             all_results.append(results)
+
+        if payloads:
+            # the upload of a batch is recorded once, for the whole run
+            rows = sum(len(data['dataframe'].get('data', [])) for data in payloads)
+            with profiler.phase('run', 'upload', rows):
+                self._client.post_insert_many(payloads)
+            # the monitors share the upload of their results
+            for results in all_results:
+                results['timings'] += profiler.monitor_records('run')
+            _logger.info('Inserted data to {} tables of {}'.format(
+                len(payloads),
+                self._project
+            ))
+
+        if self._insert_timings:
             self._client.insert(
-                results['results'],
+                profiler.to_frame().set_index('timestamp'),
                 self._project,
-                monitor.get_table_name()
+                'monitoring_runs'
             )
-            _logger.info('Inserted data to {}_{}'.format(
-                self._project,
-                monitor.get_table_name()
-            ))
         return all_results
 
     def view(
         self,
-        table_name: str
+        table_name: str,
+        consistent: bool = False,
+        columns: Optional[List[str]] = None
     ) -> pd.DataFrame:
         """View a dataframe.
 
         Args:
             table_name (str): The table name.
+            consistent (bool, optional): Read from the primary database
+            to see the latest writes. Defaults to False.
+            columns (List[str], optional): Only read these columns.
+            Defaults to None.
 
         Returns:
             pd.DataFrame: The dataframe in the table.
@@ -191,25 +316,38 @@ class MLmonitoring:
         req = self._client.view(
             self._project,
             table_name,
+            consistent,
+            columns,
         )
-        return pd.read_json(json.loads(req.text), orient='records')
+        return _read_records(req.text)
   
     def filter(
         self,
         table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        consistent: bool = False,
+        columns: Optional[List[str]] = None,
         **kwargs
     ) -> pd.DataFrame:
         """Filter table by query parameters.
 
         Args:
             table_name (str): The name of the table.
+            filters (Dict[str, Any], optional): The conditions, such as
+            ``{'recall__gt': 0.98}``. Defaults to None.
+            consistent (bool, optional): Read from the primary database
+            to see the latest writes. Defaults to False.
+            columns (List[str], optional): Only read these columns.
+            Defaults to None.
+            **kwargs: More conditions, such as ``recall__gt=0.98``.
 
         Returns:
             pd.DataFrame: The dataframe filtered.
         """
 
+        conditions = dict(filters or {}, **kwargs)
         query_string = []
-        for key, value in kwargs.items():
+        for key, value in conditions.items():
             query_string.append(
                 '{}__{}'.format(key, value)
             )
@@ -218,6 +356,8 @@ class MLmonitoring:
         req = self._client.filter(
             self._project,
             table_name,
-            query_string
+            query_string,
+            consistent,
+            columns
         )
-        return pd.read_json(json.loads(req.text), orient='records')
+        return _read_records(req.text)
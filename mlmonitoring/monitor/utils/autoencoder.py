@@ -1,6 +1,17 @@
 from sklearn.neural_network import MLPRegressor
 from sklearn.preprocessing import MinMaxScaler
+import os
 import numpy as np
+from mlmonitoring.monitor.utils.persistence import _dump, _fingerprint
+
+
+# hidden activations of MLPRegressor
+ACTIVATIONS = {
+    'identity': lambda X: X,
+    'logistic': lambda X: 1 / (1 + np.exp(-X)),
+    'tanh': np.tanh,
+    'relu': lambda X: np.maximum(X, 0),
+}
 
 
 # https://i-systems.github.io/teaching/ML/iNotes/15_Autoencoder.html
@@ -14,6 +25,7 @@ class MLPRegressorAutoEncoder:
                  tol=0.0000001,
                  **kwargs):
         self._layer_sizes = layer_sizes
+        self._activation = activation
         hidden_layer_sizes = list(layer_sizes) + list(layer_sizes)[:-1][::-1]
         self._regressor = MLPRegressor(
             hidden_layer_sizes=hidden_layer_sizes,
@@ -25,23 +37,93 @@ class MLPRegressorAutoEncoder:
             **kwargs
         )
         self._scaler = MinMaxScaler()
-    
+
+    @property
+    def n_features(self):
+        """Number of input features of the fitted autoencoder."""
+        return self._scaler.n_features_in_
+
     def fit(self, X):
         X = self._scaler.fit_transform(X)
         self._regressor.fit(X, X)
         return self
-        
+
     def encode(self, X):
-        X = self._scaler.transform(X)
-        encoder = np.asmatrix(X)
+        """Activations of the innermost layer, the latent space."""
+        encoder = self._scaler.transform(X)
+        activation = ACTIVATIONS[self._activation]
         for i in range(len(self._layer_sizes)):
-            encoder = encoder * self._regressor.coefs_[i]
-            + self._regressor.intercepts_[i]
-            encoder = (
-                np.exp(encoder) - np.exp(-encoder)
-            ) / (np.exp(encoder) + np.exp(-encoder))
+            encoder = activation(
+                encoder @ self._regressor.coefs_[i] +
+                self._regressor.intercepts_[i])
         return np.asarray(encoder)
-    
+
     def fit_encode(self, X):
-        self._fit(X)
+        self.fit(X)
         return self.encode(X)
+
+
+# loaded caches of the process, by path and modification time
+_references = {}
+
+
+def _latent_reference(X_train, encoder=None, cache_path=None, **kwargs):
+    """Fits the autoencoder and encodes the reference data, or loads them.
+
+    The encoder and the encoded reference are saved to ``cache_path`` with
+    joblib, so that later runs only encode their production data. The
+    cache keeps a fingerprint of the reference data and of the encoder or
+    its parameters, and is rebuilt when they change. Without ``X_train``
+    the cache is used as is.
+
+    Args:
+        X_train (array-like): Reference data, None to use the cache only.
+        encoder (MLPRegressorAutoEncoder, optional): A fitted encoder.
+        Defaults to None, fitting one.
+        cache_path (str, optional): The file of the cache. Defaults to None.
+        **kwargs: Arguments of MLPRegressorAutoEncoder.
+
+    Raises:
+        ValueError: If there is no reference data and no cache, or a
+        cache of another encoder than the given one.
+
+    Returns:
+        dict: The encoder, the encoded reference and their fingerprints.
+    """
+
+    params = _fingerprint('encoder', encoder) if encoder is not None \
+        else _fingerprint('params', sorted(kwargs.items()))
+    data = None if X_train is None else _fingerprint(X_train)
+    if cache_path is not None and os.path.exists(cache_path):
+        reference = _load_reference(cache_path)
+        if X_train is None and encoder is None:
+            return reference
+        if reference.get('params') == params and \
+                (X_train is None or reference.get('data') == data):
+            return reference
+    if X_train is None:
+        raise ValueError('No reference data for the encoder')
+
+    if encoder is None:
+        encoder = MLPRegressorAutoEncoder(**kwargs).fit(X_train)
+    reference = {
+        'encoder': encoder,
+        'latent': encoder.encode(X_train),
+        'data': data,
+        'params': params,
+    }
+    if cache_path is not None:
+        _dump(reference, cache_path)
+        _references.pop(cache_path, None)
+    return reference
+
+
+def _load_reference(cache_path):
+    import joblib
+
+    modified = os.path.getmtime(cache_path)
+    cached = _references.get(cache_path)
+    if cached is None or cached[0] != modified:
+        cached = (modified, joblib.load(cache_path))
+        _references[cache_path] = cached
+    return cached[1]
@@ -0,0 +1,180 @@
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+
+def _encode_features(X_train, X_test):
+    """Numeric matrices of both datasets for a domain classifier.
+
+    Categorical and object columns are replaced by the codes of their
+    values in both datasets, used as ordinal values so that columns with
+    many categories are not limited by the bins of the classifier.
+    Missing values stay NaN.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The reference and production
+        matrices.
+    """
+
+    if not isinstance(X_train, pd.DataFrame):
+        return np.asarray(X_train, dtype=np.float64), \
+            np.asarray(X_test, dtype=np.float64)
+
+    n = len(X_train)
+    columns = []
+    for name in X_train.columns:
+        column = pd.concat([X_train[name], X_test[name]], ignore_index=True)
+        if pd.api.types.is_numeric_dtype(column):
+            columns.append(column.to_numpy(dtype=np.float64, na_value=np.nan))
+        else:
+            codes = pd.factorize(column)[0].astype(np.float64)
+            codes[codes < 0] = np.nan
+            columns.append(codes)
+    X = np.column_stack(columns)
+    return X[:n], X[n:]
+
+
+def _auc(y, scores):
+    """Area under the ROC curve, with ties counted as half."""
+    ranks = pd.Series(scores).rank().to_numpy()
+    positives = y.sum()
+    negatives = len(y) - positives
+    return (ranks[y == 1].sum() - positives * (positives + 1) / 2) \
+        / (positives * negatives)
+
+
+def _auc_interval(auc, positives, negatives, confidence=0.95):
+    """Confidence interval of an AUC (Hanley and McNeil).
+
+    Args:
+        auc (float): The AUC.
+        positives (int): Number of positive rows.
+        negatives (int): Number of negative rows.
+        confidence (float, optional): The confidence level of the
+        interval. Defaults to 0.95.
+
+    Returns:
+        Tuple[float, float]: The lower and upper bounds.
+    """
+
+    q1 = auc / (2 - auc)
+    q2 = 2 * auc ** 2 / (1 + auc)
+    variance = (
+        auc * (1 - auc) +
+        (positives - 1) * (q1 - auc ** 2) +
+        (negatives - 1) * (q2 - auc ** 2)
+    ) / (positives * negatives)
+    margin = NormalDist().inv_cdf((1 + confidence) / 2) \
+        * np.sqrt(max(variance, 0))
+    return max(auc - margin, 0.0), min(auc + margin, 1.0)
+
+
+def _attribution(model, X, y, rng):
+    """Contribution of each feature to the separation of the datasets.
+
+    The impurity importances or the absolute coefficients of the model
+    when it has them, otherwise the decrease of the AUC when the feature
+    is permuted.
+    """
+
+    if hasattr(model, 'feature_importances_'):
+        return np.asarray(model.feature_importances_, dtype=np.float64)
+    if hasattr(model, 'coef_'):
+        return np.abs(np.asarray(model.coef_, dtype=np.float64)).ravel()
+
+    auc = _auc(y, model.predict_proba(X)[:, 1])
+    decrease = np.empty(X.shape[1])
+    for feature in range(X.shape[1]):
+        permuted = X.copy()
+        permuted[:, feature] = rng.permutation(permuted[:, feature])
+        decrease[feature] = auc - _auc(y, model.predict_proba(permuted)[:, 1])
+    return np.maximum(decrease, 0)
+
+
+def _fit_fold(classifier, X, y, train, validation, seed):
+    """Fits a clone of the classifier on a fold.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The scores of the validation rows
+        and the attribution of the features.
+    """
+
+    from sklearn.base import clone
+
+    model = clone(classifier).fit(X[train], y[train])
+    scores = model.predict_proba(X[validation])[:, 1]
+    attribution = _attribution(
+        model, X[validation], y[validation], np.random.default_rng(seed))
+    return scores, attribution
+
+
+def _cross_validated_auc(classifier, X, y, n_folds=5, n_jobs=None,
+                         tolerance=0.01, confidence=0.95, random_state=None):
+    """Out-of-fold AUC of a classifier, stopped once it is precise enough.
+
+    Folds are fitted in batches of ``n_jobs`` parallel jobs. After each
+    batch, the AUC of the rows scored so far and its confidence interval
+    are computed, and the remaining folds are skipped when the half width
+    of the interval is below ``tolerance``.
+
+    Args:
+        classifier (sklearn estimator): An unfitted probabilistic
+        classifier.
+        X (np.ndarray): The rows of both datasets.
+        y (np.ndarray): 1 for the production rows, 0 for the reference.
+        n_folds (int, optional): Number of folds. Defaults to 5.
+        n_jobs (int, optional): Number of parallel jobs, as joblib.
+        Defaults to None, one.
+        tolerance (float, optional): Half width of the interval at which
+        to stop. Defaults to 0.01, 0 evaluates every fold.
+        confidence (float, optional): The confidence level of the
+        interval. Defaults to 0.95.
+        random_state (int, optional): The seed of the folds and of the
+        permutations. Defaults to None.
+
+    Returns:
+        dict: The auc, auc_ci_low, auc_ci_high, the number of folds
+        fitted and the mean attribution of each feature over the folds.
+    """
+
+    from joblib import Parallel, delayed, effective_n_jobs
+    from sklearn.model_selection import StratifiedKFold
+
+    rng = np.random.default_rng(random_state)
+    folds = list(StratifiedKFold(
+        n_folds, shuffle=True, random_state=int(rng.integers(2 ** 31))
+    ).split(X, y))
+    seeds = rng.integers(2 ** 31, size=n_folds)
+    batch = max(1, effective_n_jobs(n_jobs))
+
+    scored = np.zeros(len(y), dtype=bool)
+    scores = np.empty(len(y))
+    attributions = []
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for start in range(0, n_folds, batch):
+            results = parallel(
+                delayed(_fit_fold)(classifier, X, y, train, validation, seed)
+                for (train, validation), seed in zip(
+                    folds[start:start + batch], seeds[start:start + batch]))
+            for (_, validation), (fold_scores, attribution) in zip(
+                    folds[start:start + batch], results):
+                scores[validation] = fold_scores
+                scored[validation] = True
+                attributions.append(attribution)
+
+            positives = int(y[scored].sum())
+            negatives = int(scored.sum()) - positives
+            auc = _auc(y[scored], scores[scored])
+            low, high = _auc_interval(auc, positives, negatives, confidence)
+            if (high - low) / 2 <= tolerance:
+                break
+
+    attribution = np.mean(attributions, axis=0)
+    total = attribution.sum()
+    return {
+        'auc': auc,
+        'auc_ci_low': low,
+        'auc_ci_high': high,
+        'n_folds': len(attributions),
+        'attribution': attribution / total if total > 0 else attribution,
+    }
@@ -0,0 +1,330 @@
+import numpy as np
+from mlmonitoring.monitor.utils.psi import _scale_range, _sub_psi_array
+
+
+class SortedDistribution:
+    """A weighted empirical distribution kept in sorted order.
+
+    The values are sorted once at construction, so a reference
+    distribution can be built a single time and compared against many
+    production batches with O(n log n) merge-based statistics.
+
+    Args:
+        values (array-like): Sample values.
+        weights (array-like, optional): Weight of each value, zero to
+        only extend the support. Defaults to a weight of one per value.
+        assume_sorted (bool, optional): Skip sorting when the values
+        are already in ascending order. Defaults to False.
+    """
+
+    def __init__(self, values, weights=None, assume_sorted=False):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64).ravel()
+
+        # drop missing values and negative weights, zero weights are kept
+        # as points of the support without mass
+        mask = ~np.isnan(values)
+        if weights is not None:
+            mask &= weights >= 0
+        if not mask.all():
+            values = values[mask]
+            weights = None if weights is None else weights[mask]
+
+        if assume_sorted:
+            pass
+        elif weights is None:
+            values = np.sort(values)
+        else:
+            order = np.argsort(values, kind='stable')
+            values, weights = values[order], weights[order]
+
+        self.values = values
+        self.weights = np.ones(len(values)) if weights is None else weights
+        self._cumweights = np.concatenate(([0.0], np.cumsum(self.weights)))
+
+    @property
+    def total(self):
+        """Total weight of the distribution."""
+        return self._cumweights[-1]
+
+    def __getstate__(self):
+        return {'values': self.values, 'weights': self.weights}
+
+    def __setstate__(self, state):
+        self.__init__(state['values'], state['weights'], assume_sorted=True)
+
+    def __len__(self):
+        return len(self.values)
+
+    def cumulative(self, x, side='right'):
+        """Cumulative weight of the values below (or at) each point.
+
+        Args:
+            x (array-like): Points where the cumulative weight is evaluated.
+            side (str, optional): 'right' includes values equal to x,
+            'left' excludes them. Defaults to 'right'.
+
+        Returns:
+            np.ndarray: Cumulative weight at each point.
+        """
+
+        return self._cumweights[np.searchsorted(self.values, x, side=side)]
+
+    def cdf(self, x):
+        """Empirical cumulative distribution function evaluated at x."""
+        return self.cumulative(x) / self.total
+
+    def quantile(self, q):
+        """Weighted quantiles of the distribution.
+
+        Args:
+            q (array-like): Quantiles in the [0, 1] interval.
+
+        Returns:
+            np.ndarray: Values at the given quantiles.
+        """
+
+        # position of each value at the center of its weight, matching
+        # the linear interpolation of np.percentile for unit weights, and
+        # clipped so that end points without weight are the extremes
+        positions = np.clip(
+            self._cumweights[:-1] + (self.weights - 1) / 2,
+            0, max(self.total - 1, 0))
+        return np.interp(
+            np.asarray(q) * (self.total - 1), positions, self.values)
+
+
+class QuantileSketch:
+    """A mergeable fixed-size sketch of a stream of values.
+
+    The sketch keeps at most ``size`` weighted centroids of equal weight,
+    so it can summarize an unbounded stream in constant memory. Its
+    ``distribution`` can be used in place of the exact sorted values to
+    compute approximate drift statistics.
+
+    Args:
+        size (int, optional): Maximum number of centroids. Defaults to 2048.
+    """
+
+    def __init__(self, size=2048):
+        self.size = size
+        self._values = np.empty(0)
+        self._weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values, weights=None):
+        """Add a batch of values to the sketch.
+
+        Args:
+            values (array-like): Batch of values.
+            weights (array-like, optional): Weight of each value.
+            Defaults to a weight of one per value.
+
+        Returns:
+            QuantileSketch: The updated sketch.
+        """
+
+        values = np.asarray(values, dtype=np.float64).ravel()
+        weights = np.ones(len(values)) if weights is None \
+            else np.asarray(weights, dtype=np.float64).ravel()
+        mask = ~np.isnan(values)
+        values, weights = values[mask], weights[mask]
+        if len(values) == 0:
+            return self
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._compress(
+            np.concatenate((self._values, values)),
+            np.concatenate((self._weights, weights)),
+        )
+        return self
+
+    def merge(self, other):
+        """Merge another sketch into this one.
+
+        Args:
+            other (QuantileSketch): The sketch to merge.
+
+        Returns:
+            QuantileSketch: The merged sketch.
+        """
+
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(
+            np.concatenate((self._values, other._values)),
+            np.concatenate((self._weights, other._weights)),
+        )
+        return self
+
+    def _compress(self, values, weights):
+        order = np.argsort(values, kind='stable')
+        values, weights = values[order], weights[order]
+
+        if len(values) > self.size:
+            # group consecutive values into buckets of equal weight
+            # and keep the weighted mean of each bucket
+            cumweights = np.cumsum(weights) - weights
+            buckets = (cumweights * self.size / weights.sum()).astype(np.int64)
+            buckets = np.minimum(buckets, self.size - 1)
+            total = np.bincount(buckets, weights=weights, minlength=self.size)
+            moment = np.bincount(
+                buckets, weights=weights * values, minlength=self.size)
+            nonzero = total > 0
+            values, weights = moment[nonzero] / total[nonzero], total[nonzero]
+
+        self._values, self._weights = values, weights
+
+    @property
+    def count(self):
+        """Total weight summarized by the sketch."""
+        return self._weights.sum()
+
+    def distribution(self):
+        """Returns the sketch as a weighted sorted distribution.
+
+        The exact minimum and maximum of the stream are added as end
+        points without weight, so the range of the distribution is not
+        narrowed to the means of the outer centroids.
+
+        Returns:
+            SortedDistribution: The approximate distribution.
+        """
+
+        values, weights = self._values, self._weights
+        if len(values):
+            values = np.concatenate(([self.min], values, [self.max]))
+            weights = np.concatenate(([0.0], weights, [0.0]))
+        return SortedDistribution(values, weights, assume_sorted=True)
+
+    def to_dict(self):
+        """Serializes the sketch to a JSON compatible dictionary."""
+        return {
+            'size': self.size,
+            'values': self._values.tolist(),
+            'weights': self._weights.tolist(),
+            'min': float(self.min),
+            'max': float(self.max),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Restores a sketch serialized with ``to_dict``."""
+        sketch = cls(state['size'])
+        sketch._values = np.asarray(state['values'], dtype=np.float64)
+        sketch._weights = np.asarray(state['weights'], dtype=np.float64)
+        sketch.min = state['min']
+        sketch.max = state['max']
+        return sketch
+
+
+def _merged_cdfs(expected, actual):
+    """Evaluate both CDFs at every point of the merged support.
+
+    Both inputs are already sorted, so the merged order is obtained from
+    the rank of each value in the other distribution instead of sorting
+    the concatenated values again.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The merged support and
+        the CDF of each distribution evaluated at it.
+    """
+
+    e_values, a_values = expected.values, actual.values
+
+    # position of each value in the merged order (ties: actual first)
+    e_rank = np.searchsorted(a_values, e_values, side='right')
+    a_rank = np.searchsorted(e_values, a_values, side='left')
+    e_position = np.arange(len(e_values)) + e_rank
+    a_position = np.arange(len(a_values)) + a_rank
+
+    support = np.empty(len(e_values) + len(a_values))
+    support[e_position] = e_values
+    support[a_position] = a_values
+
+    expected_cdf = np.empty(len(support))
+    expected_cdf[e_position] = expected.cumulative(e_values)
+    expected_cdf[a_position] = expected.cumulative(a_values)
+    actual_cdf = np.empty(len(support))
+    actual_cdf[e_position] = actual._cumweights[e_rank]
+    actual_cdf[a_position] = actual.cumulative(a_values)
+
+    return (
+        support,
+        expected_cdf / expected.total,
+        actual_cdf / actual.total,
+    )
+
+
+def _ks_statistic(expected, actual):
+    """Two-sample Kolmogorov-Smirnov statistic.
+
+    Args:
+        expected (SortedDistribution): The reference distribution.
+        actual (SortedDistribution): The production distribution.
+
+    Returns:
+        float: The largest absolute difference between both CDFs.
+    """
+
+    # the supremum is reached at one of the sample values, so both
+    # CDFs are only evaluated at the values of each distribution
+    statistic = 0.0
+    for values in (expected.values, actual.values):
+        difference = expected.cdf(values) - actual.cdf(values)
+        if len(difference):
+            statistic = max(statistic, np.max(np.abs(difference)))
+    return float(statistic)
+
+
+def _wasserstein_distance(expected, actual):
+    """First Wasserstein (earth mover's) distance.
+
+    Args:
+        expected (SortedDistribution): The reference distribution.
+        actual (SortedDistribution): The production distribution.
+
+    Returns:
+        float: The area between both CDFs.
+    """
+
+    support, expected_cdf, actual_cdf = _merged_cdfs(expected, actual)
+    return float(np.sum(
+        np.abs(expected_cdf - actual_cdf)[:-1] * np.diff(support)))
+
+
+def _score_psi(expected, actual, buckets=10, buckettype='bins'):
+    """PSI between two sorted distributions.
+
+    The bucket counts are read from the cumulative weights at the
+    breakpoints, so no histogram pass over the values is needed.
+
+    Args:
+        expected (SortedDistribution): The reference distribution.
+        actual (SortedDistribution): The production distribution.
+        buckets (int, optional): Number of buckets. Defaults to 10.
+        buckettype (str, optional): 'bins' for even splits or 'quantiles'
+        for quantile buckets of the reference. Defaults to 'bins'.
+
+    Returns:
+        float: The PSI value.
+    """
+
+    breakpoints = np.arange(0, buckets + 1) / buckets * 100
+    if buckettype == 'bins':
+        breakpoints = _scale_range(
+            breakpoints, expected.values[0], expected.values[-1])
+    elif buckettype == 'quantiles':
+        breakpoints = expected.quantile(breakpoints / 100)
+
+    percents = []
+    for distribution in (expected, actual):
+        # buckets are closed on the left, the last one on both sides
+        cumulative = distribution.cumulative(breakpoints, side='left')
+        cumulative[-1] = distribution.cumulative(breakpoints[-1])
+        percents.append(np.diff(cumulative) / distribution.total)
+
+    return float(np.sum(_sub_psi_array(*percents)))
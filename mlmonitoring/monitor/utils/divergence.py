@@ -0,0 +1,229 @@
+from statistics import NormalDist
+import numpy as np
+from mlmonitoring.monitor.utils.psi import _sub_psi_array
+
+
+def _segment_sum(values, offsets):
+    """Sum the buckets of each feature."""
+    return np.add.reduceat(values, offsets[:-1], axis=-1)
+
+
+def _segment_broadcast(values, offsets):
+    """Repeat a value per feature for each of its buckets."""
+    return np.repeat(values, np.diff(offsets), axis=-1)
+
+
+def _segment_cumsum(values, offsets):
+    """Cumulative sum restarted at the first bucket of each feature."""
+    cumsum = np.cumsum(values, axis=-1)
+    start = cumsum[..., offsets[:-1]] - values[..., offsets[:-1]]
+    return cumsum - _segment_broadcast(start, offsets)
+
+
+def _normalize(counts, offsets):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return counts / _segment_broadcast(_segment_sum(counts, offsets), offsets)
+
+
+def _rel_entr(x, y):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(x > 0, x * np.log(x / y), 0.0)
+
+
+def _histogram_psi(histograms):
+    """PSI of every feature from its bucket counts.
+
+    Args:
+        histograms (FeatureHistograms): Bucket counts of every feature.
+
+    Returns:
+        np.ndarray: The PSI value of each segment and feature.
+    """
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _segment_sum(_sub_psi_array(
+            histograms.expected / histograms.n_expected[:, np.newaxis],
+            histograms.actual / histograms.n_actual[:, np.newaxis],
+        ), histograms.offsets)
+
+
+def _histogram_psi_interval(histograms, psi=None, confidence=0.95):
+    """Analytic confidence interval of the PSI of every feature.
+
+    The bucket fractions of each sample are multinomial, the variance of
+    the PSI is their delta-method variance plus the variance of its null
+    distribution, ``(1 / n + 1 / m) * chi2(k - 1)`` for ``k`` buckets,
+    where the first order term vanishes.
+
+    Args:
+        histograms (FeatureHistograms): Bucket counts of every feature.
+        psi (np.ndarray, optional): The PSI values, computed when None.
+        Defaults to None.
+        confidence (float, optional): The confidence level of the
+        interval. Defaults to 0.95.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The lower and upper bounds of each
+        segment and feature.
+    """
+
+    offsets = histograms.offsets
+    if psi is None:
+        psi = _histogram_psi(histograms)
+    n = histograms.n_expected[:, np.newaxis].astype(np.float64)
+    m = histograms.n_actual[:, np.newaxis].astype(np.float64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = histograms.expected / n
+        q = histograms.actual / m
+        floored_p = np.where(p == 0, 0.0001, p)
+        floored_q = np.where(q == 0, 0.0001, q)
+        log_ratio = np.log(floored_p / floored_q)
+        gradient_p = log_ratio + 1 - floored_q / floored_p
+        gradient_q = -log_ratio + 1 - floored_p / floored_q
+
+        variance = (
+            _segment_sum(gradient_p ** 2 * p, offsets) -
+            _segment_sum(gradient_p * p, offsets) ** 2
+        ) / n + (
+            _segment_sum(gradient_q ** 2 * q, offsets) -
+            _segment_sum(gradient_q * q, offsets) ** 2
+        ) / m
+
+        buckets = _segment_sum(((p > 0) | (q > 0)).astype(np.float64), offsets)
+        variance += 2 * np.maximum(buckets - 1, 0) * (1 / n + 1 / m) ** 2
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    margin = z * np.sqrt(np.maximum(variance, 0))
+    return np.maximum(psi - margin, 0), psi + margin
+
+
+def _padded(values, offsets):
+    """Lay the buckets of each feature in a row padded with zeros.
+
+    Returns:
+        np.ndarray: Values with shape (..., n_features, max_buckets).
+    """
+
+    sizes = np.diff(offsets)
+    feature = np.repeat(np.arange(len(sizes)), sizes)
+    position = np.arange(offsets[-1]) - np.repeat(offsets[:-1], sizes)
+    padded = np.zeros(values.shape[:-1] + (len(sizes), sizes.max()))
+    padded[..., feature, position] = values
+    return padded
+
+
+def _histogram_psi_bootstrap(histograms, psi=None, n_bootstrap=1000,
+                             confidence=0.95, random_state=None,
+                             max_bytes=64 * 2 ** 20):
+    """Bootstrap confidence interval of the PSI of every feature.
+
+    Instead of resampling the rows, the bucket counts of both samples are
+    drawn from multinomial distributions with the observed fractions, for
+    every segment, feature and replicate at once. Rows outside of the
+    buckets are drawn in an extra bucket, as they count in the fractions.
+
+    The interval is the basic bootstrap interval: the quantiles of the
+    replicates are reflected around the observed PSI, from
+    ``2 * psi - high`` to ``2 * psi - low``, which corrects the upward
+    bias of the replicates that a percentile interval would keep. With
+    few production rows most replicates lie above the observed PSI and
+    the reflected interval can fall below it, so it is widened to
+    contain the observed PSI. The lower bound is clipped at 0.
+
+    Args:
+        histograms (FeatureHistograms): Bucket counts of every feature.
+        psi (np.ndarray, optional): The observed PSI of each segment and
+        feature, the center of the reflection. Defaults to None, computed
+        from the histograms.
+        n_bootstrap (int, optional): Number of replicates. Defaults to 1000.
+        confidence (float, optional): The confidence level of the
+        interval. Defaults to 0.95.
+        random_state (Union[int, np.random.Generator], optional): The
+        seed of the replicates. Defaults to None.
+        max_bytes (int, optional): Memory of the replicates drawn at once.
+        Defaults to 64 MiB.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The lower and upper bounds of each
+        segment and feature.
+    """
+
+    rng = np.random.default_rng(random_state)
+    offsets = histograms.offsets
+    if psi is None:
+        psi = _histogram_psi(histograms)
+
+    fractions = []
+    for counts, totals in (
+        (histograms.expected, histograms.n_expected),
+        (histograms.actual, histograms.n_actual),
+    ):
+        totals = np.asarray(totals, dtype=np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = _padded(counts, offsets) / totals[:, None, None]
+        fraction = np.nan_to_num(fraction)
+        other = np.clip(1 - fraction.sum(axis=-1, keepdims=True), 0, None)
+        fractions.append((totals, np.concatenate([fraction, other], axis=-1)))
+
+    replicates = []
+    shape = fractions[0][1].shape
+    chunk = max(1, int(max_bytes // (16 * np.prod(shape))))
+    for start in range(0, n_bootstrap, chunk):
+        size = (min(chunk, n_bootstrap - start),) + shape[:-1]
+        p, q = (
+            rng.multinomial(totals[:, None], fraction, size=size)[..., :-1] /
+            np.maximum(totals, 1)[:, None, None]
+            for totals, fraction in fractions
+        )
+        replicates.append(_sub_psi_array(p, q).sum(axis=-1))
+    replicates = np.concatenate(replicates)
+
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(replicates, [tail, 1 - tail], axis=0)
+    return np.clip(2 * psi - high, 0, psi), np.maximum(2 * psi - low, psi)
+
+
+def _divergences(histograms):
+    """Divergence metrics of every feature from shared bucket counts.
+
+    PSI uses the fraction of rows in each bucket as ``_psi`` does. The
+    other metrics use the normalized bucket distributions, with the same
+    floor as PSI for empty buckets in the KL divergence.
+
+    Args:
+        histograms (FeatureHistograms): Bucket counts of every feature.
+
+    Returns:
+        dict: Arrays with the psi, kl, js, hellinger and wasserstein
+        values of each segment and feature. Wasserstein is NaN for categorical features.
+    """
+
+    offsets = histograms.offsets
+
+    psi = _histogram_psi(histograms)
+
+    p = _normalize(histograms.expected, offsets)
+    q = _normalize(histograms.actual, offsets)
+
+    kl = _segment_sum(_rel_entr(
+        np.where(p == 0, 0.0001, p), np.where(q == 0, 0.0001, q)), offsets)
+
+    m = (p + q) / 2
+    js = _segment_sum(_rel_entr(p, m) + _rel_entr(q, m), offsets) / 2
+
+    with np.errstate(invalid='ignore'):
+        hellinger = np.sqrt(np.clip(
+            1 - _segment_sum(np.sqrt(p * q), offsets), 0, None))
+
+    wasserstein = _segment_sum(np.abs(
+        _segment_cumsum(p, offsets) - _segment_cumsum(q, offsets)
+    ) * histograms.steps, offsets)
+
+    return {
+        'psi': psi,
+        'kl': kl,
+        'js': js,
+        'hellinger': hellinger,
+        'wasserstein': wasserstein,
+    }
@@ -0,0 +1,476 @@
+import numpy as np
+import pandas as pd
+from mlmonitoring.monitor.utils.psi import _scale_range
+
+
+class FeatureHistograms:
+    """Bucket counts of every feature laid out in flat arrays.
+
+    The buckets of feature ``i`` are ``offsets[i]:offsets[i + 1]`` along
+    the last axis of ``expected`` and ``actual``, so metrics of all
+    features can be computed at once with segmented reductions. The
+    first axis holds one row of counts per segment.
+
+    Args:
+        expected (np.ndarray): Bucket counts of the reference data with
+        shape (n_segments, n_buckets).
+        actual (np.ndarray): Bucket counts of the production data with
+        shape (n_segments, n_buckets).
+        offsets (np.ndarray): Start of the buckets of each feature,
+        followed by the total number of buckets.
+        steps (np.ndarray): Distance from the center of each bucket to the
+        center of the next one of the same feature, zero for the last.
+        n_expected (np.ndarray): Number of reference rows per segment.
+        n_actual (np.ndarray): Number of production rows per segment.
+    """
+
+    def __init__(self, expected, actual, offsets, steps, n_expected, n_actual):
+        self.expected = expected
+        self.actual = actual
+        self.offsets = offsets
+        self.steps = steps
+        self.n_expected = n_expected
+        self.n_actual = n_actual
+
+    @property
+    def n_features(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_segments(self):
+        return self.expected.shape[0]
+
+
+def _columns(X):
+    """Split a matrix or DataFrame in its columns.
+
+    DataFrame columns are kept as Series so that mixed DataFrames are
+    never converted to a single object array.
+    """
+
+    if isinstance(X, pd.DataFrame):
+        return [X.iloc[:, i] for i in range(X.shape[1])]
+    X = np.asarray(X)
+    if X.ndim == 1:
+        X = X[:, np.newaxis]
+    return [X[:, i] for i in range(X.shape[1])]
+
+
+def _segments(X_train, X_test, group_by):
+    """Split the segment of each row from the data.
+
+    Args:
+        X_train (array-like): Reference data.
+        X_test (array-like): Production data.
+        group_by (Union[str, Tuple[array-like, array-like]]): A column of
+        both DataFrames or the segment of each reference and production row.
+
+    Returns:
+        Tuple: The data without the segment column, the segment code of
+        each reference and production row (-1 when missing) and the
+        segment values.
+    """
+
+    if isinstance(group_by, str):
+        train_groups, test_groups = X_train[group_by], X_test[group_by]
+        X_train = X_train.drop(columns=group_by)
+        X_test = X_test.drop(columns=group_by)
+    else:
+        train_groups, test_groups = group_by
+
+    codes, segments = pd.factorize(pd.concat(
+        [pd.Series(train_groups), pd.Series(test_groups)], ignore_index=True))
+    n_train = len(train_groups)
+    return X_train, X_test, codes[:n_train], codes[n_train:], segments
+
+
+def _is_categorical(column):
+    """Whether a column has to be bucketed by category."""
+    dtype = column.dtype
+    if pd.api.types.is_bool_dtype(dtype) or \
+            isinstance(dtype, pd.CategoricalDtype):
+        return True
+    if dtype == object:
+        return pd.api.types.infer_dtype(column, skipna=True) not in (
+            'integer', 'floating', 'mixed-integer-float', 'decimal', 'empty')
+    return not pd.api.types.is_numeric_dtype(dtype)
+
+
+def _numeric_array(column):
+    if isinstance(column, pd.Series):
+        return column.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(column, dtype=np.float64)
+
+
+def _numeric_breakpoints(expected_array, buckets, buckettype='bins'):
+    """Breakpoints of the buckets as computed by ``_psi``."""
+    breakpoints = np.arange(0, buckets + 1) / (buckets) * 100
+
+    if buckettype == 'bins':
+        breakpoints = _scale_range(breakpoints,
+                                   np.nanmin(expected_array),
+                                   np.nanmax(expected_array))
+    elif buckettype == 'quantiles':
+        breakpoints = np.nanpercentile(expected_array, breakpoints)
+    return breakpoints
+
+
+def _numeric_codes(array, breakpoints):
+    """Bucket of each value as assigned by np.histogram, -1 when outside."""
+    n_buckets = len(breakpoints) - 1
+    codes = np.searchsorted(breakpoints, array, side='right') - 1
+
+    # the last bucket is closed on both sides
+    codes[array == breakpoints[-1]] = n_buckets - 1
+    codes[(codes < 0) | (codes >= n_buckets)] = -1
+    return codes
+
+
+def _centers_steps(breakpoints):
+    centers = (breakpoints[:-1] + breakpoints[1:]) / 2
+    return np.append(np.diff(centers), 0.0)
+
+
+def _hash_codes(values, hash_buckets):
+    """Hash bucket of each value, hashing every distinct value once."""
+    codes, uniques = pd.factorize(values)
+    hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))
+    return (hashes % np.uint64(hash_buckets)).astype(np.int64)[codes]
+
+
+def _top_categories(codes, vocabulary, max_categories):
+    """Keep the ``max_categories`` most frequent categories.
+
+    Returns:
+        Tuple[np.ndarray, pd.Index]: The codes in the kept vocabulary,
+        -2 for the other categories and missing values, and the kept
+        vocabulary.
+    """
+
+    vocabulary = pd.Index(vocabulary)
+    if len(vocabulary) > max_categories:
+        frequency = np.bincount(codes[codes >= 0], minlength=len(vocabulary))
+        kept = np.sort(np.argpartition(-frequency, max_categories)[
+            :max_categories])
+        remap = np.full(len(vocabulary), -1)
+        remap[kept] = np.arange(max_categories)
+        codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -2)
+        vocabulary = vocabulary[kept]
+    else:
+        codes = np.where(codes >= 0, codes, -2)
+    return codes, vocabulary
+
+
+def _hashed_codes(column, codes, n_categories, hash_buckets):
+    """Move the values out of the vocabulary to hashed buckets and the
+    missing values to the last bucket."""
+    codes = np.array(codes, dtype=np.int64)
+    missing = np.asarray(pd.isna(column))
+    hashed = (codes < 0) & ~missing
+    if hashed.any():
+        values = np.asarray(column)[hashed]
+        codes[hashed] = n_categories + _hash_codes(values, hash_buckets)
+    codes[missing] = n_categories + hash_buckets
+    return codes
+
+
+def _categorical_codes(train_column, test_column, max_categories=1000,
+                       hash_buckets=64):
+    """Dictionary-encode a column against the reference vocabulary.
+
+    The ``max_categories`` most frequent reference categories get their
+    own bucket. Rare and unseen categories share ``hash_buckets`` hashed
+    buckets and missing values get a last bucket of their own.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, int]: Bucket of each reference and
+        production value and the number of buckets.
+    """
+
+    codes, vocabulary = _top_categories(
+        *pd.factorize(train_column), max_categories)
+    n_categories = len(vocabulary)
+    return (
+        _hashed_codes(train_column, codes, n_categories, hash_buckets),
+        _hashed_codes(test_column, vocabulary.get_indexer(test_column),
+                      n_categories, hash_buckets),
+        n_categories + hash_buckets + 1,
+    )
+
+
+def _bucket_counts(codes, n_buckets, segments=None, n_segments=1):
+    """Count the codes of every segment with a single bincount.
+
+    Returns:
+        np.ndarray: Counts with shape (n_segments, n_buckets).
+    """
+
+    valid = codes >= 0
+    if segments is None:
+        keys = codes[valid]
+    else:
+        valid &= segments >= 0
+        keys = segments[valid] * n_buckets + codes[valid]
+    counts = np.bincount(keys, minlength=n_segments * n_buckets)
+    return counts.reshape(n_segments, n_buckets)
+
+
+def _feature_histograms(X_train, X_test, buckettype='bins', buckets=10,
+                        max_categories=1000, hash_buckets=64,
+                        train_segments=None, test_segments=None,
+                        n_segments=1):
+    """Histogram every feature of the reference and production data once.
+
+    Numeric features are bucketed as ``_psi`` does. Categorical features
+    are dictionary-encoded against the reference vocabulary, with rare
+    and unseen categories in hashed buckets, and counted with bincount on
+    the integer codes.
+
+    Args:
+        X_train (array-like): Reference data.
+        X_test (array-like): Production data.
+        buckettype (str, optional): 'bins' for even splits or 'quantiles'
+        for quantile buckets of the reference. Defaults to 'bins'.
+        buckets (int, optional): Number of buckets. Defaults to 10.
+        max_categories (int, optional): Maximum number of reference
+        categories with their own bucket. Defaults to 1000.
+        hash_buckets (int, optional): Number of buckets shared by rare and
+        unseen categories. Defaults to 64.
+        train_segments (np.ndarray, optional): Segment code of each
+        reference row, -1 to leave it out. Defaults to None.
+        test_segments (np.ndarray, optional): Segment code of each
+        production row, -1 to leave it out. Defaults to None.
+        n_segments (int, optional): Number of segments. Defaults to 1.
+
+    Returns:
+        FeatureHistograms: The bucket counts of every feature and segment.
+    """
+
+    train_columns, test_columns = _columns(X_train), _columns(X_test)
+
+    expected, actual, steps, offsets = [], [], [], [0]
+    for train_column, test_column in zip(train_columns, test_columns):
+        if _is_categorical(train_column):
+            train_codes, test_codes, n_buckets = _categorical_codes(
+                train_column, test_column, max_categories, hash_buckets)
+            # categories have no order to measure distances with
+            steps.append(np.full(n_buckets, np.nan))
+        else:
+            train_column = _numeric_array(train_column)
+            test_column = _numeric_array(test_column)
+            breakpoints = _numeric_breakpoints(
+                train_column, buckets, buckettype)
+            train_codes = _numeric_codes(train_column, breakpoints)
+            test_codes = _numeric_codes(test_column, breakpoints)
+            n_buckets = buckets
+            steps.append(_centers_steps(breakpoints))
+
+        expected.append(_bucket_counts(
+            train_codes, n_buckets, train_segments, n_segments))
+        actual.append(_bucket_counts(
+            test_codes, n_buckets, test_segments, n_segments))
+        offsets.append(offsets[-1] + n_buckets)
+
+    n_expected, n_actual = (
+        np.full(n_segments, len(columns[0])) if segments is None
+        else np.bincount(segments[segments >= 0], minlength=n_segments)
+        for columns, segments in (
+            (train_columns, train_segments), (test_columns, test_segments))
+    )
+
+    return FeatureHistograms(
+        expected=np.concatenate(expected, axis=1).astype(np.float64),
+        actual=np.concatenate(actual, axis=1).astype(np.float64),
+        offsets=np.asarray(offsets),
+        steps=np.concatenate(steps),
+        n_expected=n_expected,
+        n_actual=n_actual,
+    )
+
+
+class HistogramAccumulator:
+    """Bucket counts of every feature accumulated chunk by chunk.
+
+    Memory does not depend on the number of rows. A first pass over the
+    reference chunks (``observe``) keeps the range of the numeric
+    features and a reservoir sample of the rows, which gives the
+    quantile breakpoints and the category vocabularies. The reference
+    and production chunks are then counted (``add_expected`` and
+    ``add_actual``), the production rows by segment, e.g. the period of
+    their timestamp, with segments added as they are seen.
+
+    Args:
+        columns (list): The feature columns of the chunks.
+        buckettype (str, optional): 'bins' for even splits or 'quantiles'
+        for quantile buckets of the reference sample. Defaults to 'bins'.
+        buckets (int, optional): Number of buckets. Defaults to 10.
+        max_categories (int, optional): Maximum number of reference
+        categories with their own bucket. Defaults to 1000.
+        hash_buckets (int, optional): Number of buckets shared by rare and
+        unseen categories. Defaults to 64.
+        sample_size (int, optional): Rows of the reference sample.
+        Defaults to 100,000.
+        random_state (int, optional): The seed of the sample. Defaults to
+        None.
+    """
+
+    def __init__(self, columns, buckettype='bins', buckets=10,
+                 max_categories=1000, hash_buckets=64, sample_size=100_000,
+                 random_state=None):
+        from mlmonitoring.monitor.utils.sampling import Reservoir
+
+        self.columns = list(columns)
+        self.buckettype = buckettype
+        self.buckets = buckets
+        self.max_categories = max_categories
+        self.hash_buckets = hash_buckets
+        self._reservoir = Reservoir(sample_size, random_state)
+        self._categorical = None
+        self._low = np.full(len(self.columns), np.inf)
+        self._high = np.full(len(self.columns), -np.inf)
+        self._encoders = None
+        self.segments = []
+        self._segment_codes = {}
+
+    def observe(self, chunk):
+        """Add a chunk of the reference data to the definition of the
+        buckets.
+
+        Args:
+            chunk (pd.DataFrame): The next reference rows.
+        """
+
+        if self._encoders is not None:
+            raise ValueError('The buckets are already defined')
+        chunk = chunk[self.columns]
+        if not len(chunk):
+            return
+        if self._categorical is None:
+            self._categorical = [
+                _is_categorical(chunk[column]) for column in self.columns]
+        for i, column in enumerate(self.columns):
+            if not self._categorical[i]:
+                values = _numeric_array(chunk[column])
+                if not np.isnan(values).all():
+                    self._low[i] = min(self._low[i], np.nanmin(values))
+                    self._high[i] = max(self._high[i], np.nanmax(values))
+        self._reservoir.update(chunk)
+
+    def _define(self):
+        """The encoder, number of buckets and steps of every feature."""
+        if self._reservoir.sample is None:
+            raise ValueError('No reference rows')
+        sample = self._reservoir.sample
+        self._encoders, n_buckets, steps = [], [], []
+        for i, column in enumerate(self.columns):
+            if self._categorical[i]:
+                _, vocabulary = _top_categories(
+                    *pd.factorize(sample[column]), self.max_categories)
+                self._encoders.append(vocabulary)
+                n_buckets.append(len(vocabulary) + self.hash_buckets + 1)
+                steps.append(np.full(n_buckets[-1], np.nan))
+            else:
+                # the exact range, the sample would miss the extremes
+                values = np.array([self._low[i], self._high[i]]) \
+                    if self.buckettype == 'bins' \
+                    else _numeric_array(sample[column])
+                breakpoints = _numeric_breakpoints(
+                    values, self.buckets, self.buckettype)
+                self._encoders.append(breakpoints)
+                n_buckets.append(self.buckets)
+                steps.append(_centers_steps(breakpoints))
+
+        self._offsets = np.concatenate(([0], np.cumsum(n_buckets)))
+        self._steps = np.concatenate(steps)
+        self._expected = np.zeros(self._offsets[-1], dtype=np.int64)
+        self._n_expected = 0
+        self._actual = np.zeros((0, self._offsets[-1]), dtype=np.int64)
+        self._n_actual = np.zeros(0, dtype=np.int64)
+
+    def _codes(self, chunk):
+        """Bucket of each value, offset by the first bucket of its feature.
+
+        Returns:
+            np.ndarray: Codes with shape (n_features, n_rows), -1 outside
+            of the buckets.
+        """
+
+        if self._encoders is None:
+            self._define()
+        codes = np.empty((len(self.columns), len(chunk)), dtype=np.int64)
+        for i, column in enumerate(self.columns):
+            values = chunk[column]
+            if self._categorical[i]:
+                vocabulary = self._encoders[i]
+                feature_codes = _hashed_codes(
+                    values, vocabulary.get_indexer(values),
+                    len(vocabulary), self.hash_buckets)
+            else:
+                feature_codes = _numeric_codes(
+                    _numeric_array(values), self._encoders[i])
+            codes[i] = np.where(
+                feature_codes >= 0, feature_codes + self._offsets[i], -1)
+        return codes
+
+    def add_expected(self, chunk):
+        """Count a chunk of the reference data.
+
+        Args:
+            chunk (pd.DataFrame): The next reference rows.
+        """
+
+        codes = self._codes(chunk)
+        self._expected += np.bincount(
+            codes[codes >= 0], minlength=len(self._expected))
+        self._n_expected += len(chunk)
+
+    def add_actual(self, chunk, segments):
+        """Count a chunk of the production data.
+
+        Args:
+            chunk (pd.DataFrame): The next production rows.
+            segments (array-like): The segment of each row.
+        """
+
+        codes = self._codes(chunk)
+        keys, uniques = pd.factorize(np.asarray(segments))
+        for segment in uniques:
+            if segment not in self._segment_codes:
+                self._segment_codes[segment] = len(self.segments)
+                self.segments.append(segment)
+        n_segments = len(self.segments)
+        if n_segments > len(self._n_actual):
+            added = n_segments - len(self._n_actual)
+            self._actual = np.pad(self._actual, ((0, added), (0, 0)))
+            self._n_actual = np.pad(self._n_actual, (0, added))
+
+        rows = np.array([self._segment_codes[segment] for segment in uniques],
+                        dtype=np.int64)[keys]
+        self._n_actual += np.bincount(rows, minlength=n_segments)
+        rows = np.broadcast_to(rows, codes.shape)
+        valid = codes >= 0
+        n_buckets = self._offsets[-1]
+        self._actual += np.bincount(
+            rows[valid] * n_buckets + codes[valid],
+            minlength=n_segments * n_buckets).reshape(n_segments, n_buckets)
+
+    def histograms(self):
+        """The bucket counts of every segment against the reference.
+
+        Returns:
+            FeatureHistograms: The histograms, one segment per row.
+        """
+
+        if self._encoders is None:
+            self._define()
+        n_segments = len(self.segments)
+        return FeatureHistograms(
+            expected=np.repeat(
+                self._expected[np.newaxis], n_segments, axis=0
+            ).astype(np.float64),
+            actual=self._actual.astype(np.float64),
+            offsets=self._offsets,
+            steps=self._steps,
+            n_expected=np.full(n_segments, self._n_expected),
+            n_actual=self._n_actual,
+        )
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def _median_bandwidth(Z, max_rows=1000, rng=None):
+    """Median distance between rows, on a sample of them."""
+    rng = np.random.default_rng(rng)
+    if len(Z) > max_rows:
+        Z = Z[rng.choice(len(Z), max_rows, replace=False)]
+    squared = (Z ** 2).sum(axis=1)
+    distances = squared[:, None] + squared[None, :] - 2 * Z @ Z.T
+    distances = distances[np.triu_indices(len(Z), k=1)]
+    median = np.sqrt(np.median(np.maximum(distances, 0))) if len(distances) \
+        else 1.0
+    return median if median > 0 else 1.0
+
+
+def _random_fourier_features(Z, weights, offsets):
+    """Features whose inner products approximate a Gaussian kernel."""
+    return np.sqrt(2 / weights.shape[1]) * np.cos(Z @ weights + offsets)
+
+
+def _rff_mmd(Z_train, Z_test, n_features=256, bandwidth=None,
+             random_state=None):
+    """Squared maximum mean discrepancy under a Gaussian kernel.
+
+    The kernel is approximated with random Fourier features, so the
+    statistic is the squared distance between the mean features of both
+    samples and takes linear time.
+
+    Args:
+        Z_train (np.ndarray): Reference rows.
+        Z_test (np.ndarray): Production rows.
+        n_features (int, optional): Number of random features. Defaults
+        to 256.
+        bandwidth (float, optional): Bandwidth of the kernel. Defaults to
+        None, the median distance between reference rows.
+        random_state (int, optional): The seed of the features. Defaults
+        to None.
+
+    Returns:
+        Tuple[float, float]: The squared MMD and the bandwidth.
+    """
+
+    rng = np.random.default_rng(random_state)
+    Z_train = np.asarray(Z_train, dtype=np.float64)
+    Z_test = np.asarray(Z_test, dtype=np.float64)
+    if bandwidth is None:
+        bandwidth = _median_bandwidth(Z_train, rng=rng)
+
+    weights = rng.normal(0, 1 / bandwidth, (Z_train.shape[1], n_features))
+    offsets = rng.uniform(0, 2 * np.pi, n_features)
+    difference = \
+        _random_fourier_features(Z_train, weights, offsets).mean(axis=0) \
+        - _random_fourier_features(Z_test, weights, offsets).mean(axis=0)
+    return float(difference @ difference), bandwidth
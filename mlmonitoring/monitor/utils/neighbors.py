@@ -0,0 +1,178 @@
+import os
+import numpy as np
+from mlmonitoring.monitor.utils.persistence import _dump, _fingerprint
+
+
+ALGORITHMS = ('auto', 'kd_tree', 'ball_tree', 'projection')
+METHODS = ('knn', 'lof')
+
+
+class NeighborIndex:
+    """A spatial index of the reference data for kNN and LOF scores.
+
+    The reference rows are standardized and indexed once, with a KD-tree,
+    a ball tree, or a KD-tree over a Gaussian random projection of the
+    rows for high dimensional data, faster to build and query but less
+    accurate as distances are distorted. The scores of the reference rows are
+    kept to turn production scores into outlier probabilities, as pyod's
+    linear ``predict_proba``.
+
+    Args:
+        n_neighbors (int, optional): Number of neighbors. Defaults to 10.
+        algorithm (str, optional): 'kd_tree', 'ball_tree', 'projection'
+        or 'auto', a projection above twice n_components features and a
+        KD-tree otherwise.
+        Defaults to 'auto'.
+        n_components (int, optional): Dimensions of the random
+        projection. Defaults to 20.
+        leaf_size (int, optional): Leaf size of the tree. Defaults to 40.
+        random_state (int, optional): The seed of the projection.
+        Defaults to None.
+    """
+
+    def __init__(self, n_neighbors=10, algorithm='auto', n_components=20,
+                 leaf_size=40, random_state=None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError('Unknown algorithm: {}'.format(algorithm))
+        self.n_neighbors = n_neighbors
+        self.algorithm = algorithm
+        self.n_components = n_components
+        self.leaf_size = leaf_size
+        self.random_state = random_state
+
+    def _transform(self, X):
+        X = (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+        if self.projection_ is not None:
+            X = X @ self.projection_
+        return X
+
+    def fit(self, X):
+        """Builds the index and scores the reference rows.
+
+        Args:
+            X (array-like): Reference data.
+
+        Returns:
+            NeighborIndex: The fitted index.
+        """
+
+        from sklearn.neighbors import BallTree, KDTree
+
+        X = np.asarray(X, dtype=np.float64)
+        self.n_features_ = X.shape[1]
+        self.mean_ = X.mean(axis=0)
+        scale = X.std(axis=0)
+        self.scale_ = np.where(scale > 0, scale, 1.0)
+
+        algorithm = self.algorithm
+        if algorithm == 'auto':
+            # trees degrade to a linear scan in high dimensions
+            algorithm = 'projection' \
+                if self.n_features_ > 2 * self.n_components else 'kd_tree'
+        self.projection_ = None
+        if algorithm == 'projection':
+            rng = np.random.default_rng(self.random_state)
+            self.projection_ = rng.normal(
+                0, 1 / np.sqrt(self.n_components),
+                (self.n_features_, self.n_components))
+        tree = BallTree if algorithm == 'ball_tree' else KDTree
+        self.tree_ = tree(self._transform(X), leaf_size=self.leaf_size)
+
+        # neighbors of the reference rows, without the rows themselves
+        distances, indices = self.tree_.query(
+            self._transform(X), k=self.n_neighbors + 1)
+        distances, indices = distances[:, 1:], indices[:, 1:]
+        self.k_distance_ = distances[:, -1]
+        self.lrd_ = self._lrd(distances, indices)
+        self.train_scores_ = {
+            'knn': self.k_distance_,
+            'lof': self.lrd_[indices].mean(axis=1) / self.lrd_,
+        }
+        return self
+
+    def _lrd(self, distances, indices):
+        """Local reachability density of rows from their neighbors."""
+        reach = np.maximum(distances, self.k_distance_[indices])
+        return 1 / np.maximum(reach.mean(axis=1), 1e-10)
+
+    def score(self, X, method='knn'):
+        """Outlier scores of rows, higher is more abnormal.
+
+        Args:
+            X (array-like): Rows to score.
+            method (str, optional): 'knn', the distance to the k-th
+            neighbor, or 'lof', the local outlier factor. Defaults to
+            'knn'.
+
+        Returns:
+            np.ndarray: The score of each row.
+        """
+
+        distances, indices = self.tree_.query(
+            self._transform(X), k=self.n_neighbors)
+        if method == 'knn':
+            return distances[:, -1]
+        return self.lrd_[indices].mean(axis=1) / self._lrd(distances, indices)
+
+    def predict_proba(self, scores, method='knn'):
+        """Scores scaled by the range of the reference scores, in [0, 1]."""
+        train_scores = self.train_scores_[method]
+        low, high = train_scores.min(), train_scores.max()
+        return np.clip((scores - low) / max(high - low, 1e-10), 0, 1)
+
+
+def _neighbor_index(X_train, index_path=None, **kwargs):
+    """Builds the index of the reference data, or loads it from disk.
+
+    The index is saved to ``index_path`` with joblib and loaded with
+    ``mmap_mode='r'``, so that its arrays are mapped rather than read
+    and shared by the processes querying it. The file keeps a fingerprint
+    of the reference data and of the index parameters, and the index is
+    rebuilt when they change. Without ``X_train`` it is used as is.
+
+    Args:
+        X_train (array-like): Reference data, None to use the saved index.
+        index_path (str, optional): The file of the index. Defaults to
+        None.
+        **kwargs: Arguments of NeighborIndex.
+
+    Returns:
+        NeighborIndex: The fitted index.
+    """
+
+    import joblib
+
+    params = _fingerprint(sorted(kwargs.items()))
+    data = None if X_train is None else _fingerprint(X_train)
+    if index_path is not None and os.path.exists(index_path):
+        saved = joblib.load(index_path, mmap_mode='r')
+        if not isinstance(saved, dict):
+            # an index saved without its fingerprint
+            saved = {'index': saved, 'data': None, 'params': None}
+        if X_train is None or (
+                saved['params'] == params and saved['data'] == data):
+            return saved['index']
+    if X_train is None:
+        raise ValueError('No reference data and no saved index')
+
+    index = NeighborIndex(**kwargs).fit(X_train)
+    if index_path is not None:
+        _dump({'index': index, 'data': data, 'params': params}, index_path)
+    return index
+
+
+def _score_chunks(index, X, method='knn', chunk_size=10_000, n_jobs=None):
+    """Outlier probabilities of rows queried in parallel chunks.
+
+    The chunks are queried by threads, the trees release the GIL and
+    share the mapped index.
+    """
+
+    from joblib import Parallel, delayed
+
+    X = np.asarray(X, dtype=np.float64)
+    chunks = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(index.score)(X[start:start + chunk_size], method)
+        for start in range(0, len(X), chunk_size))
+    scores = np.concatenate(chunks) if chunks else np.empty(0)
+    return index.predict_proba(scores, method)
@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+
+def _fingerprint(*values):
+    """Hash of the data and the parameters a saved model was built from."""
+    import joblib
+    return joblib.hash(values)
+
+
+def _dump(value, path):
+    """Saves an object with joblib, atomically.
+
+    The object is written to a temporary file of the same directory,
+    unique to the writer, then renamed over ``path``: readers never load
+    a partial file and concurrent writers never share a temporary file.
+    """
+
+    import joblib
+
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            joblib.dump(value, file)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
@@ -21,6 +21,14 @@ def _sub_psi(e_perc, a_perc):
     return(value)
 
 
+def _sub_psi_array(e_perc, a_perc):
+    '''Vectorized _sub_psi over arrays of percentages.
+    '''
+    e_perc = np.where(e_perc == 0, 0.0001, e_perc)
+    a_perc = np.where(a_perc == 0, 0.0001, a_perc)
+    return (e_perc - a_perc) * np.log(e_perc / a_perc)
+
+
 def _psi(expected_array, actual_array, buckets, buckettype='bins'):
     '''Calculate the PSI for a single variable
     Args:
@@ -0,0 +1,283 @@
+import numpy as np
+import pandas as pd
+
+
+SAMPLINGS = ('uniform', 'stratified', 'reservoir')
+
+
+def _take(X, indices):
+    if isinstance(X, (pd.DataFrame, pd.Series)):
+        return X.iloc[indices]
+    return np.asarray(X)[indices]
+
+
+def _concat(parts):
+    if isinstance(parts[0], (pd.DataFrame, pd.Series)):
+        return pd.concat(parts)
+    return np.concatenate(parts)
+
+
+def _is_stream(X):
+    """Whether the data is an iterable of chunks rather than rows."""
+    return not isinstance(X, (pd.DataFrame, pd.Series, np.ndarray, list, tuple))
+
+
+class Reservoir:
+    """A uniform sample of fixed size of a stream of chunks.
+
+    Every row of the stream has the same probability to be in the sample
+    (algorithm R), without knowing the length of the stream beforehand.
+    Chunks are DataFrames, Series or arrays and are processed with
+    vectorized operations.
+
+    Args:
+        size (int): The number of rows of the sample.
+        random_state (Union[int, np.random.Generator], optional): The
+        seed of the sample. Defaults to None.
+    """
+
+    def __init__(self, size, random_state=None):
+        self.size = size
+        self.seen = 0
+        self.sample = None
+        self._rng = np.random.default_rng(random_state)
+
+    def update(self, chunk):
+        """Add a chunk of rows of the stream.
+
+        Args:
+            chunk (array-like): The next rows.
+
+        Returns:
+            Reservoir: The updated reservoir.
+        """
+
+        n = len(chunk)
+        if n == 0:
+            return self
+
+        # the first rows fill the reservoir
+        filled = 0 if self.sample is None else len(self.sample)
+        fill = min(self.size - filled, n)
+        if fill > 0:
+            head = _take(chunk, np.arange(fill))
+            self.sample = head if self.sample is None \
+                else _concat([self.sample, head])
+
+        # row t of the stream replaces a random slot with probability size / t
+        rows = np.arange(fill, n)
+        positions = self.seen + rows
+        slots = np.floor(
+            self._rng.random(len(rows)) * (positions + 1)).astype(np.int64)
+        replaced = slots < self.size
+        rows, slots = rows[replaced], slots[replaced]
+        if len(rows):
+            # the last row drawn for a slot is the one kept in it
+            slots, last = np.unique(slots[::-1], return_index=True)
+            rows = rows[::-1][last]
+            kept = np.setdiff1d(np.arange(self.size), slots)
+            self.sample = _concat([
+                _take(self.sample, kept), _take(chunk, rows)])
+
+        self.seen += n
+        return self
+
+
+def _sample_size(n, sample):
+    """Rows of a sample given as a number of rows or a fraction."""
+    if isinstance(sample, float):
+        if not 0 < sample <= 1:
+            raise ValueError('A sample rate must be in (0, 1]')
+        return int(round(n * sample))
+    return min(int(sample), n)
+
+
+def _stratified_indices(strata, size, rng):
+    """Indices of a sample with the proportion of each stratum kept."""
+    codes, uniques = pd.factorize(np.asarray(strata))
+    # missing values are a stratum of their own
+    codes = np.where(codes < 0, len(uniques), codes)
+    n = len(codes)
+    counts = np.bincount(codes, minlength=len(uniques) + 1)
+
+    # largest remainder allocation of the sample to the strata
+    quotas = counts * size / n
+    allocation = np.floor(quotas).astype(np.int64)
+    remainder = size - allocation.sum()
+    if remainder > 0:
+        allocation[np.argsort(allocation - quotas)[:remainder]] += 1
+
+    # a random order within each stratum, then the first rows of each
+    order = np.lexsort((rng.random(n), codes))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(n) - starts[codes[order]]
+    return np.sort(order[rank < allocation[codes[order]]])
+
+
+def _sample_indices(n, size, sampling='uniform', strata=None, rng=None):
+    """Indices of the rows of a sample.
+
+    Args:
+        n (int): Number of rows.
+        size (int): Number of rows of the sample.
+        sampling (str, optional): 'uniform', 'stratified' or
+        'reservoir'. Defaults to 'uniform'.
+        strata (array-like, optional): The stratum of each row, required
+        by stratified sampling. Defaults to None.
+        rng (np.random.Generator, optional): The random generator.
+        Defaults to None.
+
+    Returns:
+        np.ndarray: The sorted indices of the sampled rows.
+    """
+
+    rng = np.random.default_rng(rng)
+    if sampling == 'uniform':
+        return np.sort(rng.choice(n, size, replace=False))
+    if sampling == 'stratified':
+        if strata is None:
+            raise ValueError('Stratified sampling requires strata')
+        return _stratified_indices(strata, size, rng)
+    if sampling == 'reservoir':
+        return np.sort(Reservoir(size, rng).update(np.arange(n)).sample)
+    raise ValueError('Unknown sampling: {}'.format(sampling))
+
+
+def _strata_pair(X_train, X_test, strata):
+    if isinstance(strata, str):
+        return X_train[strata], X_test[strata]
+    if strata is None:
+        return None, None
+    return strata
+
+
+def _reservoir_sample(X, size, rng):
+    """Sample a dataset, or an iterable of its chunks, in a reservoir."""
+    reservoir = Reservoir(size, rng)
+    for chunk in X if _is_stream(X) else [X]:
+        reservoir.update(chunk)
+    return reservoir.sample
+
+
+def _sample_streams(X_train, X_test, sample, sampling, group_by, rng):
+    """Sample a pair of which a dataset is streamed, see ``_sample_pair``."""
+    if sampling != 'reservoir' or isinstance(sample, float):
+        raise ValueError(
+            'Streams are sampled with a reservoir of a number of rows')
+    if group_by is not None and not isinstance(group_by, str):
+        raise ValueError('Streams are grouped by a column')
+    return (_reservoir_sample(X_train, sample, rng),
+            _reservoir_sample(X_test, sample, rng), group_by)
+
+
+def _sample_pair(X_train, X_test, sample, sampling='uniform', strata=None,
+                 group_by=None, random_state=None):
+    """Sample the reference and the production data.
+
+    Args:
+        X_train (array-like): Reference data, or an iterable of chunks
+        with reservoir sampling.
+        X_test (array-like): Production data, or an iterable of chunks
+        with reservoir sampling.
+        sample (Union[int, float]): Rows of each sample, or the fraction
+        of the rows of each dataset.
+        sampling (str, optional): 'uniform', 'stratified' or
+        'reservoir'. Defaults to 'uniform'.
+        strata (Union[str, Tuple[array-like, array-like]], optional): A
+        column of both DataFrames or the stratum of each reference and
+        production row. Defaults to None, the segments of group_by.
+        group_by (Union[str, Tuple[array-like, array-like]], optional):
+        The segments of the rows, sampled with them. Defaults to None.
+        random_state (int, optional): The seed of the samples. Defaults
+        to None.
+
+    Returns:
+        Tuple: The sampled reference and production data and group_by.
+    """
+
+    if sampling not in SAMPLINGS:
+        raise ValueError('Unknown sampling: {}'.format(sampling))
+    rng = np.random.default_rng(random_state)
+
+    if _is_stream(X_train) or _is_stream(X_test):
+        return _sample_streams(X_train, X_test, sample, sampling, group_by, rng)
+
+    if strata is None and sampling == 'stratified':
+        strata = group_by
+    strata = _strata_pair(X_train, X_test, strata)
+    groups = None if group_by is None or isinstance(group_by, str) \
+        else group_by
+
+    sampled, sampled_groups = [], []
+    for side, X in enumerate((X_train, X_test)):
+        n = len(X)
+        size = _sample_size(n, sample)
+        indices = None if size >= n else _sample_indices(
+            n, size, sampling, strata[side], rng)
+        sampled.append(X if indices is None else _take(X, indices))
+        if groups is not None:
+            sampled_groups.append(groups[side] if indices is None
+                                  else _take(groups[side], indices))
+
+    if groups is not None:
+        group_by = tuple(sampled_groups)
+    return sampled[0], sampled[1], group_by
+
+
+def _sample_rows(X, sample, sampling='uniform', strata=None,
+                 random_state=None):
+    """Sample the rows of a single dataset, see ``_sample_pair``."""
+    if sample is None:
+        return X
+    if sampling == 'reservoir' and _is_stream(X):
+        return _reservoir_sample(X, sample, random_state)
+    if isinstance(strata, str):
+        strata = X[strata]
+    n = len(X)
+    size = _sample_size(n, sample)
+    if size >= n:
+        return X
+    return _take(X, _sample_indices(
+        n, size, sampling, strata, np.random.default_rng(random_state)))
+
+
+def _drop_strata(X, strata):
+    if isinstance(strata, str) and isinstance(X, pd.DataFrame) \
+            and strata in X.columns:
+        return X.drop(columns=strata)
+    return X
+
+
+def _sample_detector_data(X_train, X_test, sample, test_sample,
+                          sampling='uniform', strata=None, random_state=None):
+    """Sample the rows an outlier detector is fitted on and scores.
+
+    Each sample gets its own seed drawn from ``random_state``, so the
+    production sample does not depend on the reference one, which may be
+    skipped. A strata column is dropped once sampled, it is not a feature.
+
+    Args:
+        X_train (array-like): Reference data, None to skip it.
+        X_test (array-like): Production data.
+        sample (Union[int, float]): Rows of the reference sample, or
+        their fraction, None for every row.
+        test_sample (Union[int, float]): Rows of the production sample,
+        or their fraction, None for every row.
+        sampling (str, optional): 'uniform', 'stratified' or
+        'reservoir'. Defaults to 'uniform'.
+        strata (str, optional): The column of stratified sampling.
+        Defaults to None.
+        random_state (int, optional): The seed of the samples. Defaults
+        to None.
+
+    Returns:
+        Tuple: The sampled reference and production data.
+    """
+
+    seeds = np.random.default_rng(random_state).integers(2 ** 32, size=2)
+    if X_train is not None:
+        X_train = _drop_strata(_sample_rows(
+            X_train, sample, sampling, strata, seeds[0]), strata)
+    X_test = _drop_strata(_sample_rows(
+        X_test, test_sample, sampling, strata, seeds[1]), strata)
+    return X_train, X_test
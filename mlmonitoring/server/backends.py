@@ -0,0 +1,840 @@
+from typing import Any, Iterator, List, Optional, Tuple
+import io
+import os
+import csv
+import re
+import glob
+import uuid
+import shutil
+import threading
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy_utils import database_exists, create_database
+from mlmonitoring.server import database
+
+
+# a filter of a read: (column, operator, value)
+Filter = Tuple[str, str, Any]
+
+OPERATORS = {
+    'gt': '>',
+    'ge': '>=',
+    'lt': '<',
+    'le': '<=',
+    'eq': '=',
+    'ne': '<>',
+}
+
+
+def _check_name(name: str) -> str:
+    """Table and column names are interpolated in queries and paths."""
+    if not re.fullmatch(r'\w+', name):
+        raise ValueError('Invalid name: {}'.format(name))
+    return name
+
+
+def _check_filters(filters: List[Filter]) -> None:
+    for column, operator, _ in filters:
+        _check_name(column)
+        if operator not in OPERATORS:
+            raise ValueError('Invalid operator: {}'.format(operator))
+
+
+def is_data_error(error: Exception) -> bool:
+    """Whether a write failed on its rows rather than on the database.
+
+    Retrying such a write cannot succeed: invalid names or values, and
+    the DB-API errors of the data, constraints or schema.
+
+    Args:
+        error (Exception): The error raised by a backend.
+
+    Returns:
+        bool: Whether the rows were rejected.
+    """
+
+    if isinstance(error, (ValueError, TypeError)):
+        return True
+    # DB-API errors of the drivers, also wrapped by SQLAlchemy
+    names = {cls.__name__ for cls in type(error).__mro__}
+    return bool(names & {'DataError', 'IntegrityError', 'ProgrammingError'})
+
+
+def _select_query(table_name: str, filters: List[Filter],
+                  columns: Optional[List[str]], placeholder: str) -> str:
+    """A SELECT of columns with the filters as parameters.
+
+    Args:
+        placeholder (str): The parameter of the i-th filter, formatted
+        with i, e.g. ':p{}' or '?'.
+    """
+
+    _check_filters(filters)
+    query = 'SELECT {} FROM {}'.format(
+        ', '.join(map(_check_name, columns)) if columns else '*',
+        _check_name(table_name))
+    if filters:
+        query += ' WHERE ' + ' AND '.join(
+            '{} {} {}'.format(column, OPERATORS[operator], placeholder.format(i))
+            for i, (column, operator, _) in enumerate(filters))
+    return query
+
+
+def _downcast_arrow(table):
+    """Stores floats in 32 bits, integers in their smallest type and
+    strings as dictionary codes."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = []
+    for column in table.columns:
+        if pa.types.is_float64(column.type):
+            column = column.cast(pa.float32())
+        elif pa.types.is_integer(column.type) and len(column) and \
+                column.null_count < len(column):
+            bounds = pc.min_max(column).as_py()
+            for target in (pa.int8(), pa.int16(), pa.int32()):
+                info = np.iinfo(target.to_pandas_dtype())
+                if info.min <= bounds['min'] and bounds['max'] <= info.max:
+                    column = column.cast(target)
+                    break
+        elif pa.types.is_string(column.type):
+            column = column.dictionary_encode()
+        columns.append(column)
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+
+def _quote(identifier: str) -> str:
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+def _copy_rows(table, connection, keys, data_iter) -> None:
+    """A to_sql method bulk loading the rows with COPY on PostgreSQL."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+    # the schema and the table are quoted apart, "a.b" is a single name
+    name = _quote(table.name) if table.schema is None \
+        else '{}.{}'.format(_quote(table.schema), _quote(table.name))
+    with connection.connection.cursor() as cursor:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN WITH CSV'.format(
+            name, ', '.join(_quote(key) for key in keys)), buffer)
+
+
+def _write_parquet(table, path: str) -> None:
+    """Writes then renames, readers never see a partial file."""
+    import pyarrow.parquet as pq
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+class Backend:
+    """Storage of the monitoring tables.
+
+    Tables are append-only. Reads push the projection and the filters
+    down to the storage.
+    """
+
+    def insert(self, table_name: str, dataframe: pd.DataFrame) -> None:
+        """Appends a dataframe to a table, creating it when needed.
+
+        Args:
+            table_name (str): The name of the table.
+            dataframe (pd.DataFrame): The rows to append, with their index.
+        """
+
+        raise NotImplementedError
+
+    def insert_many(self, tables: List[Tuple[str, pd.DataFrame]]) -> None:
+        """Appends dataframes to several tables at once.
+
+        SQL and DuckDB backends write them in a single transaction, so
+        either all of them or none are written.
+
+        Args:
+            tables (List[Tuple[str, pd.DataFrame]]): The name of each table
+            and the rows to append to it.
+        """
+
+        for table_name, dataframe in tables:
+            self.insert(table_name, dataframe)
+
+    def read(
+        self,
+        table_name: str,
+        filters: Optional[List[Filter]] = None,
+        columns: Optional[List[str]] = None,
+        consistent: bool = False
+    ) -> pd.DataFrame:
+        """Reads a table.
+
+        Args:
+            table_name (str): The name of the table.
+            filters (List[Filter], optional): Conditions every row must
+            match. Defaults to None.
+            columns (List[str], optional): The columns to read. Defaults
+            to None, reading every column.
+            consistent (bool, optional): Read the latest writes, for
+            backends with replicas. Defaults to False.
+
+        Returns:
+            pd.DataFrame: The rows of the table.
+        """
+
+        raise NotImplementedError
+
+    def read_chunks(
+        self,
+        table_name: str,
+        filters: Optional[List[Filter]] = None,
+        columns: Optional[List[str]] = None,
+        chunksize: int = 100_000,
+        consistent: bool = False
+    ) -> Iterator[pd.DataFrame]:
+        """Reads a table chunk by chunk, never the whole table at once.
+
+        Args:
+            table_name (str): The name of the table.
+            filters (List[Filter], optional): Conditions every row must
+            match. Defaults to None.
+            columns (List[str], optional): The columns to read. Defaults
+            to None, reading every column.
+            chunksize (int, optional): The maximum number of rows of a
+            chunk, DuckDB rounds it to vectors of 2,048 rows. Defaults to
+            100,000.
+            consistent (bool, optional): Read the latest writes, for
+            backends with replicas. Defaults to False.
+
+        Yields:
+            pd.DataFrame: The next rows of the table.
+        """
+
+        raise NotImplementedError
+
+    def tables(self) -> List[str]:
+        """Returns the names of the tables."""
+        raise NotImplementedError
+
+    def size(self, table_name: str) -> Optional[int]:
+        """Returns the bytes used by a table, None when unknown."""
+        raise NotImplementedError
+
+    def delete_before(self, table_name: str, column: str, cutoff) -> int:
+        """Deletes the rows older than a time.
+
+        Args:
+            table_name (str): The name of the table.
+            column (str): The time column of the table.
+            cutoff (pd.Timestamp): Rows before this time are deleted.
+
+        Returns:
+            int: The number of rows deleted.
+        """
+
+        raise NotImplementedError
+
+    def compact(self, table_name: str, column: str, downcast: bool = False) -> None:
+        """Rewrites a table in fewer pieces sorted by its time column.
+
+        Args:
+            table_name (str): The name of the table.
+            column (str): The time column the rows are sorted by.
+            downcast (bool, optional): Store floats in 32 bits, integers in
+            the smallest type holding them and strings as dictionary
+            codes, where the storage supports it. Defaults to False.
+        """
+
+        raise NotImplementedError
+
+    def dispose(self) -> None:
+        """Releases the connections and files of the backend."""
+
+
+class SQLBackend(Backend):
+    """Tables of a SQLAlchemy database, with reads on its replicas.
+
+    Args:
+        uri (str, optional): The URI of the database. Defaults to None,
+        using the engines of the server process, see ``database``.
+    """
+
+    def __init__(self, uri: Optional[str] = None) -> None:
+        self._engine = None if uri is None else \
+            sqlalchemy.create_engine(uri, **database.engine_options())
+
+    def insert(self, table_name, dataframe):
+        self.insert_many([(table_name, dataframe)])
+
+    def insert_many(self, tables):
+        # creates the database if it does
+        # not exist
+        engine = self._engine or database.get_engine()
+        if not database_exists(engine.url):
+            create_database(engine.url)
+
+        method = _copy_rows if engine.dialect.driver == 'psycopg2' else 'multi'
+        # save the dataframes to the sql tables in one transaction
+        with engine.begin() as connection:
+            for table_name, dataframe in tables:
+                dataframe.to_sql(
+                    name=table_name,
+                    con=connection,
+                    if_exists="append",
+                    method=method,
+                )
+
+    def _select(self, table_name, filters, columns):
+        filters = filters or []
+        query = _select_query(table_name, filters, columns, ':p{}')
+        params = {'p{}'.format(i): value
+                  for i, (_, _, value) in enumerate(filters)}
+        return sqlalchemy.text(query), params
+
+    def read(self, table_name, filters=None, columns=None, consistent=False):
+        query, params = self._select(table_name, filters, columns)
+        return self._read_sql(query, params, consistent)
+
+    def read_chunks(self, table_name, filters=None, columns=None,
+                    chunksize=100_000, consistent=False):
+        query, params = self._select(table_name, filters, columns)
+        engines = self._read_engines(consistent)
+        for engine in engines:
+            connection = engine.connect()
+            try:
+                # a server-side cursor, the rows are fetched chunk by chunk
+                chunks = pd.read_sql(
+                    query, connection.execution_options(stream_results=True),
+                    params=params, chunksize=chunksize)
+                # the query runs with the first chunk, a replica
+                # can still be left for the next engine
+                first = next(chunks, None)
+            except sqlalchemy.exc.DBAPIError:
+                connection.close()
+                if engine is engines[-1]:
+                    raise
+                database.mark_unhealthy(engine)
+                continue
+            with connection:
+                if first is not None:
+                    yield first
+                yield from chunks
+            return
+
+    def _read_engines(self, consistent):
+        """The engines to read from, the last one being the primary."""
+        return [self._engine] if self._engine is not None \
+            else list(database.read_engines(consistent))
+
+    def _read_sql(self, query, params, consistent):
+        """Runs a query on a read replica, falling back to the primary.
+
+        A replica that cannot be connected to or whose query fails is
+        skipped for a cooldown and the query runs on the next engine.
+        """
+
+        engines = self._read_engines(consistent)
+        for engine in engines[:-1]:
+            try:
+                with engine.connect() as connection:
+                    return pd.read_sql(query, connection, params=params)
+            except sqlalchemy.exc.DBAPIError:
+                database.mark_unhealthy(engine)
+        with engines[-1].connect() as connection:
+            return pd.read_sql(query, connection, params=params)
+
+    def _write_engine(self):
+        return self._engine or database.get_engine()
+
+    def tables(self):
+        return sqlalchemy.inspect(self._write_engine()).get_table_names()
+
+    def size(self, table_name):
+        engine = self._write_engine()
+        with engine.connect() as connection:
+            if engine.dialect.name == 'postgresql':
+                return connection.execute(
+                    sqlalchemy.text('SELECT pg_total_relation_size(:table)'),
+                    {'table': _check_name(table_name)}).scalar()
+            if engine.dialect.name == 'sqlite':
+                try:
+                    return connection.execute(sqlalchemy.text(
+                        'SELECT SUM(pgsize) FROM dbstat WHERE name = :table'),
+                        {'table': _check_name(table_name)}).scalar()
+                except sqlalchemy.exc.OperationalError:
+                    # SQLite built without the dbstat table
+                    return None
+        return None
+
+    def delete_before(self, table_name, column, cutoff):
+        with self._write_engine().begin() as connection:
+            return connection.execute(sqlalchemy.text(
+                'DELETE FROM {} WHERE {} < :cutoff'.format(
+                    _check_name(table_name), _check_name(column))),
+                {'cutoff': str(pd.Timestamp(cutoff))}).rowcount
+
+    def compact(self, table_name, column, downcast=False):
+        engine = self._write_engine()
+        table_name = _check_name(table_name)
+        columns = sqlalchemy.inspect(engine).get_columns(table_name)
+        with engine.begin() as connection:
+            # SQLite stores every float in 8 bytes
+            if downcast and engine.dialect.name == 'postgresql':
+                for name in [row['name'] for row in columns
+                             if isinstance(row['type'], sqlalchemy.Float)]:
+                    connection.exec_driver_sql(
+                        'ALTER TABLE {} ALTER COLUMN "{}" TYPE real'.format(
+                            table_name, name))
+            if column in [row['name'] for row in columns]:
+                # the rows are written again in time order, the table keeps
+                # its indexes and constraints
+                connection.exec_driver_sql(
+                    'CREATE TEMPORARY TABLE _compact AS '
+                    'SELECT * FROM {} ORDER BY {}'.format(
+                        table_name, _check_name(column)))
+                connection.exec_driver_sql('DELETE FROM {}'.format(table_name))
+                connection.exec_driver_sql(
+                    'INSERT INTO {} SELECT * FROM _compact ORDER BY {}'.format(
+                        table_name, column))
+                connection.exec_driver_sql('DROP TABLE _compact')
+
+        # VACUUM cannot run inside a transaction, it reclaims the space
+        # of the deleted rows
+        with engine.connect().execution_options(
+                isolation_level='AUTOCOMMIT') as connection:
+            if engine.dialect.name == 'postgresql':
+                connection.exec_driver_sql('VACUUM FULL ANALYZE {}'.format(table_name))
+            elif engine.dialect.name == 'sqlite':
+                connection.exec_driver_sql('VACUUM')
+
+    def dispose(self):
+        if self._engine is not None:
+            self._engine.dispose()
+        else:
+            database.dispose_engine()
+
+
+class ParquetBackend(Backend):
+    """Tables of monthly partitioned Parquet files in a directory.
+
+    Every insert writes one file per month of its time column, the first
+    datetime column, under ``<root>/<table>/month=YYYY-MM``. Reads only
+    open the partitions matching the filters on the time column and let
+    Parquet statistics skip the row groups of the other filters.
+    Requires pyarrow.
+
+    Args:
+        root (str): The directory of the tables.
+    """
+
+    PARTITION = 'month'
+
+    def __init__(self, root: str) -> None:
+        import pyarrow  # noqa: F401, fail early without the dependency
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, table_name: str) -> str:
+        return os.path.join(self.root, _check_name(table_name))
+
+    def _schema_path(self, table_name: str) -> str:
+        return os.path.join(self._path(table_name), '_schema.parquet')
+
+    def schema(self, table_name: str):
+        """Returns the schema of a table, None when it does not exist."""
+        import pyarrow.parquet as pq
+        path = self._schema_path(table_name)
+        return pq.read_schema(path) if os.path.exists(path) else None
+
+    def _time_column(self, schema) -> Optional[str]:
+        import pyarrow as pa
+        for field in schema:
+            if pa.types.is_timestamp(field.type) or pa.types.is_date(field.type):
+                return field.name
+        return None
+
+    def insert(self, table_name, dataframe):
+        self.insert_many([(table_name, dataframe)])
+
+    def insert_many(self, tables):
+        # files are removed when a table fails, readers may see the
+        # tables written first in the meantime
+        written = []
+        try:
+            for table_name, dataframe in tables:
+                self._insert(table_name, dataframe, written)
+        except BaseException:
+            for path in written:
+                os.remove(path)
+            raise
+
+    def _insert(self, table_name, dataframe, written):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(
+            dataframe.reset_index(), preserve_index=False)
+        with self._lock:
+            schema = current = self.schema(table_name)
+            # new columns are added and types promoted, e.g. int to float
+            schema = table.schema if schema is None else pa.unify_schemas(
+                [schema, table.schema], promote_options='permissive')
+            if current is None or not schema.equals(current):
+                os.makedirs(self._path(table_name), exist_ok=True)
+                _write_parquet(schema.empty_table(), self._schema_path(table_name))
+
+        time_column = self._time_column(schema)
+        if time_column is None or time_column not in table.column_names:
+            partitions = {'all': table}
+        else:
+            months = pd.Series(table[time_column].to_pandas())
+            months = months.dt.strftime('%Y-%m').fillna('none')
+            partitions = {
+                month: table.take(pa.array(indices))
+                for month, indices in months.groupby(months).indices.items()
+            }
+
+        for month, partition in partitions.items():
+            directory = os.path.join(
+                self._path(table_name), '{}={}'.format(self.PARTITION, month))
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(
+                directory, 'part-{}.parquet'.format(uuid.uuid4().hex))
+            _write_parquet(partition, path)
+            written.append(path)
+
+    def _expression(self, schema, time_column, filters):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        expression = None
+        for column, operator, value in filters:
+            field = schema.field(column)
+            if pa.types.is_timestamp(field.type):
+                value = pa.scalar(pd.Timestamp(value), type=field.type)
+            condition = {
+                'gt': lambda f: f > value,
+                'ge': lambda f: f >= value,
+                'lt': lambda f: f < value,
+                'le': lambda f: f <= value,
+                'eq': lambda f: f == value,
+                'ne': lambda f: f != value,
+            }[operator](ds.field(column))
+
+            # prune the partitions of the months out of the range
+            if column == time_column and operator != 'ne':
+                month = pd.Timestamp(value.as_py() if isinstance(value, pa.Scalar)
+                                     else value).strftime('%Y-%m')
+                partition = ds.field(self.PARTITION)
+                condition = condition & {
+                    'gt': partition >= month,
+                    'ge': partition >= month,
+                    'lt': partition <= month,
+                    'le': partition <= month,
+                    'eq': partition == month,
+                }[operator]
+            expression = condition if expression is None \
+                else expression & condition
+        return expression
+
+    def _scan(self, table_name, filters, columns):
+        """The dataset of a table with the arguments of its scan."""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        filters = filters or []
+        _check_filters(filters)
+        schema = self.schema(table_name)
+        if schema is None:
+            raise ValueError('no such table: {}'.format(table_name))
+
+        files = glob.glob(os.path.join(self._path(table_name), '*=*', '*.parquet'))
+        partitioning = ds.partitioning(
+            pa.schema([(self.PARTITION, pa.string())]), flavor='hive')
+        dataset = ds.dataset(
+            files,
+            schema=schema.append(pa.field(self.PARTITION, pa.string())),
+            format='parquet',
+            partitioning=partitioning,
+            partition_base_dir=self._path(table_name),
+        )
+        return dataset, {
+            'columns': list(columns) if columns else schema.names,
+            'filter': self._expression(
+                schema, self._time_column(schema), filters),
+        }
+
+    def read(self, table_name, filters=None, columns=None, consistent=False):
+        dataset, scan = self._scan(table_name, filters, columns)
+        return dataset.to_table(**scan).to_pandas()
+
+    def read_chunks(self, table_name, filters=None, columns=None,
+                    chunksize=100_000, consistent=False):
+        dataset, scan = self._scan(table_name, filters, columns)
+        # batches are at most chunksize rows, and never span two files
+        for batch in dataset.to_batches(batch_size=chunksize, **scan):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def tables(self):
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(self._schema_path(name)))
+
+    def size(self, table_name):
+        return sum(
+            os.path.getsize(os.path.join(directory, name))
+            for directory, _, names in os.walk(self._path(table_name))
+            for name in names)
+
+    def _partitions(self, table_name: str) -> List[str]:
+        return sorted(glob.glob(os.path.join(self._path(table_name), '*=*')))
+
+    def _rewrite(self, schema, time_column, directory, files, cutoff=None,
+                 downcast=False) -> int:
+        """Replaces the files of a partition by a single sorted file.
+
+        Returns:
+            int: The number of rows deleted.
+        """
+
+        import pyarrow.dataset as ds
+
+        table = ds.dataset(files, schema=schema, format='parquet').to_table()
+        rows = table.num_rows
+        if cutoff is not None:
+            table = table.filter(ds.field(time_column) >= pd.Timestamp(cutoff))
+        if time_column is not None:
+            table = table.sort_by(time_column)
+        if downcast:
+            table = _downcast_arrow(table)
+        if table.num_rows:
+            _write_parquet(table, os.path.join(
+                directory, 'part-{}.parquet'.format(uuid.uuid4().hex)))
+        # readers listing the files now may see both, never none
+        for path in files:
+            os.remove(path)
+        return rows - table.num_rows
+
+    def delete_before(self, table_name, column, cutoff):
+        import pyarrow.parquet as pq
+
+        # the partitions are always by the first time column
+        schema = self.schema(table_name)
+        time_column = self._time_column(schema)
+        if time_column is None:
+            return 0
+        month = pd.Timestamp(cutoff).strftime('%Y-%m')
+
+        deleted = 0
+        for directory in self._partitions(table_name):
+            partition = directory.rsplit('=', 1)[1]
+            files = glob.glob(os.path.join(directory, '*.parquet'))
+            if partition < month:
+                deleted += sum(pq.read_metadata(path).num_rows for path in files)
+                shutil.rmtree(directory)
+            elif partition == month and files:
+                deleted += self._rewrite(
+                    schema, time_column, directory, files, cutoff=cutoff)
+        return deleted
+
+    def compact(self, table_name, column, downcast=False):
+        schema = self.schema(table_name)
+        time_column = self._time_column(schema)
+        for directory in self._partitions(table_name):
+            files = glob.glob(os.path.join(directory, '*.parquet'))
+            if len(files) > 1 or (downcast and files):
+                self._rewrite(schema, time_column, directory, files,
+                              downcast=downcast)
+
+
+class DuckDBBackend(Backend):
+    """Tables of a local DuckDB file.
+
+    DuckDB stores the tables by column and pushes projections and
+    filters down to its scans. A DuckDB file can only be opened by one
+    process, run the server with a single worker. Requires duckdb.
+
+    Args:
+        path (str): The DuckDB file.
+    """
+
+    def __init__(self, path: str) -> None:
+        import duckdb
+        self.path = path
+        self._connection = duckdb.connect(path)
+        self._lock = threading.Lock()
+
+    def insert(self, table_name, dataframe):
+        self.insert_many([(table_name, dataframe)])
+
+    def insert_many(self, tables):
+        with self._lock:
+            cursor = self._connection.cursor()
+            try:
+                cursor.execute('BEGIN TRANSACTION')
+                try:
+                    for table_name, dataframe in tables:
+                        self._insert(cursor, table_name, dataframe)
+                except BaseException:
+                    cursor.execute('ROLLBACK')
+                    raise
+                cursor.execute('COMMIT')
+            finally:
+                cursor.close()
+
+    def _insert(self, cursor, table_name, dataframe):
+        table_name = _check_name(table_name)
+        cursor.register('dataframe', dataframe.reset_index())
+        try:
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS {} AS '
+                'SELECT * FROM dataframe LIMIT 0'.format(table_name))
+            # columns added since the table was created
+            existing = {row[0] for row in cursor.execute(
+                'DESCRIBE {}'.format(table_name)).fetchall()}
+            for row in cursor.execute(
+                    'DESCRIBE SELECT * FROM dataframe').fetchall():
+                name, column_type = row[0], row[1]
+                if name not in existing:
+                    cursor.execute('ALTER TABLE {} ADD COLUMN "{}" {}'.format(
+                        table_name, name.replace('"', '""'), column_type))
+            cursor.execute(
+                'INSERT INTO {} BY NAME SELECT * FROM dataframe'.format(
+                    table_name))
+        finally:
+            cursor.unregister('dataframe')
+
+    # rows of a DuckDB vector, chunks are fetched in whole vectors
+    VECTOR_SIZE = 2048
+
+    def read(self, table_name, filters=None, columns=None, consistent=False):
+        filters = filters or []
+        query = _select_query(table_name, filters, columns, '?')
+        with self._lock:
+            cursor = self._connection.cursor()
+            try:
+                return cursor.execute(
+                    query, [value for _, _, value in filters]).df()
+            finally:
+                cursor.close()
+
+    def read_chunks(self, table_name, filters=None, columns=None,
+                    chunksize=100_000, consistent=False):
+        filters = filters or []
+        query = _select_query(table_name, filters, columns, '?')
+        vectors = max(1, chunksize // self.VECTOR_SIZE)
+        with self._lock:
+            cursor = self._connection.cursor()
+        try:
+            with self._lock:
+                cursor.execute(query, [value for _, _, value in filters])
+            while True:
+                with self._lock:
+                    chunk = cursor.fetch_df_chunk(vectors)
+                if not len(chunk):
+                    break
+                yield chunk
+        finally:
+            cursor.close()
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            cursor = self._connection.cursor()
+            try:
+                return cursor.execute(query, params).fetchall()
+            finally:
+                cursor.close()
+
+    def tables(self):
+        return [row[0] for row in self._execute(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = 'main' ORDER BY table_name")]
+
+    def size(self, table_name):
+        blocks = self._execute(
+            'SELECT COUNT(DISTINCT block_id) FROM pragma_storage_info(?) '
+            'WHERE block_id IS NOT NULL', [_check_name(table_name)])[0][0]
+        block_size = self._execute(
+            'SELECT block_size FROM pragma_database_size()')[0][0]
+        return blocks * block_size
+
+    def delete_before(self, table_name, column, cutoff):
+        return self._execute('DELETE FROM {} WHERE {} < ?'.format(
+            _check_name(table_name), _check_name(column)),
+            [pd.Timestamp(cutoff).to_pydatetime()])[0][0]
+
+    def compact(self, table_name, column, downcast=False):
+        table_name = _check_name(table_name)
+        columns = self._execute('DESCRIBE {}'.format(table_name))
+        selection = ', '.join(
+            '"{0}"::FLOAT AS "{0}"'.format(row[0])
+            if downcast and row[1] == 'DOUBLE' else '"{}"'.format(row[0])
+            for row in columns)
+        order = ' ORDER BY {}'.format(_check_name(column)) \
+            if column in [row[0] for row in columns] else ''
+        # strings are dictionary compressed by DuckDB itself
+        self._execute('CREATE OR REPLACE TABLE {0} AS SELECT {1} FROM {0}{2}'.format(
+            table_name, selection, order))
+        self._execute('CHECKPOINT')
+
+    def dispose(self):
+        self._connection.close()
+
+
+_backend = None
+_backend_pid = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(uri: str) -> Backend:
+    """Creates the backend of a URI.
+
+    ``parquet:///path/to/directory`` stores the tables in Parquet files,
+    ``duckdb:///path/to/file.duckdb`` in a DuckDB file and any other URI
+    is a SQLAlchemy database. The database of ``MLMONITOR_DATABASE_URI``
+    uses the engines of the server process, with its read replicas.
+
+    Args:
+        uri (str): The URI of the storage.
+
+    Returns:
+        Backend: The backend.
+    """
+
+    scheme = urlparse(uri).scheme
+    if scheme in ('parquet', 'duckdb'):
+        # parquet:///tmp/tables is /tmp/tables, parquet://tables is relative
+        path = uri[len(scheme) + 3:]
+        return ParquetBackend(path) if scheme == 'parquet' else DuckDBBackend(path)
+    if uri == (os.environ.get(database.DATABASE_URI) or ''):
+        return SQLBackend()
+    return SQLBackend(uri)
+
+
+def get_backend() -> Backend:
+    """Returns the backend of the current process, selected by the
+    scheme of ``MLMONITOR_DATABASE_URI`` on first use.
+
+    Returns:
+        Backend: The backend.
+    """
+
+    global _backend, _backend_pid
+    if _backend is None or _backend_pid != os.getpid():
+        with _backend_lock:
+            if _backend is None or _backend_pid != os.getpid():
+                _backend = create_backend(
+                    os.environ.get(database.DATABASE_URI) or '')
+                _backend_pid = os.getpid()
+    return _backend
+
+
+def dispose_backend() -> None:
+    """Releases the backend of the current process."""
+    global _backend
+    with _backend_lock:
+        if _backend is not None and _backend_pid == os.getpid():
+            _backend.dispose()
+        _backend = None
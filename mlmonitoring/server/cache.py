@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+import os
+import threading
+import time
+import uuid
+import zlib
+from mlmonitoring.server.metrics import CACHE_BYTES, REGISTRY
+
+
+CACHE_MAX_BYTES = 'MLMONITOR_CACHE_BYTES'
+CACHE_TTL = 'MLMONITOR_CACHE_TTL'
+
+
+class ResponseCache:
+    """An LRU cache of encoded read responses invalidated per table.
+
+    Every table has a version that changes when the table is written, so
+    that the validators (ETag and Last-Modified) of a read are known
+    without querying the database. The cache lives in the server process,
+    so with several workers, or other writers of the database, a read can
+    be stale for up to ``ttl`` seconds.
+
+    Args:
+        max_bytes (int, optional): Maximum size of the cached bodies, 0
+        disables the cache. Defaults to 64 MiB.
+        ttl (float, optional): Seconds after which the version of a table
+        expires, None to only change versions on writes. Defaults to 60.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20, ttl: Optional[float] = 60.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        # ETags of other processes or of a previous run never match
+        self._token = uuid.uuid4().hex[:8]
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def version(self, table_name: str) -> Tuple[str, float]:
+        """Returns the version of a table and the time it started.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            Tuple[str, float]: The version and its time as a UNIX timestamp.
+        """
+
+        with self._lock:
+            version = self._versions.get(table_name)
+            expired = version is not None and self.ttl is not None and \
+                time.time() - version[1] >= self.ttl
+            if version is None or expired:
+                version = self._new_version(table_name)
+            return version
+
+    def _new_version(self, table_name: str) -> Tuple[str, float]:
+        self._counter += 1
+        version = ('{}-{}'.format(self._token, self._counter), time.time())
+        self._versions[table_name] = version
+        return version
+
+    def validators(self, table_name: str, key: Hashable) -> Tuple[str, float]:
+        """Returns the ETag and Last-Modified time of a read.
+
+        Args:
+            table_name (str): The name of the table read.
+            key (Hashable): The key of the read.
+
+        Returns:
+            Tuple[str, float]: The ETag and the last modification time.
+        """
+
+        version, modified = self.version(table_name)
+        digest = zlib.crc32(repr(key).encode())
+        return '"{}-{:08x}"'.format(version, digest), modified
+
+    def get(self, key: Hashable, version: str) -> Optional[bytes]:
+        """Returns a cached body of the given table version.
+
+        Args:
+            key (Hashable): The key of the read.
+            version (str): The current version of the table.
+
+        Returns:
+            Optional[bytes]: The body, None when it is not cached.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, body: bytes, version: str) -> None:
+        """Caches a body read at a version of its table.
+
+        Args:
+            key (Hashable): The key of the read.
+            body (bytes): The encoded response.
+            version (str): The version of the table when the read started.
+        """
+
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            table_name = key[0]
+            current = self._versions.get(table_name)
+            # the table was written during the read
+            if current is not None and current[0] != version:
+                return
+            self._discard(key)
+            self._entries[key] = (version, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, table_name: str) -> None:
+        """Drops the cached reads of a table and starts a new version.
+
+        Args:
+            table_name (str): The name of the table written.
+        """
+
+        with self._lock:
+            self._new_version(table_name)
+            for key in [key for key in self._entries if key[0] == table_name]:
+                self._discard(key)
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """Returns the response cache of the process, configured by the
+    ``MLMONITOR_CACHE_BYTES`` and ``MLMONITOR_CACHE_TTL`` environment
+    variables on first use.
+
+    Returns:
+        ResponseCache: The response cache.
+    """
+
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_bytes = os.environ.get(CACHE_MAX_BYTES)
+                ttl = os.environ.get(CACHE_TTL)
+                _cache = ResponseCache(
+                    int(max_bytes) if max_bytes else 64 * 2 ** 20,
+                    float(ttl) if ttl else 60.0,
+                )
+    return _cache
+
+
+def _collect_cache_metrics() -> None:
+    if _cache is not None:
+        CACHE_BYTES.set(_cache.size)
+
+
+REGISTRY.register_collector(_collect_cache_metrics)
@@ -0,0 +1,131 @@
+from typing import Any, Tuple
+import json
+import pandas as pd
+
+
+def _orjson():
+    # orjson is optional, the standard library decoder is always available
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def loads(body: bytes) -> Any:
+    """Decodes a JSON body, with orjson when it is installed.
+
+    Args:
+        body (bytes): The JSON document.
+
+    Raises:
+        ValueError: If the body is not valid JSON.
+
+    Returns:
+        Any: The decoded document.
+    """
+
+    orjson = _orjson()
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+# pandas dtypes of the field types of a Table Schema
+_DTYPES = {
+    'integer': 'int64',
+    'number': 'float64',
+    'boolean': 'bool',
+    'string': 'object',
+}
+
+
+def _decode_field(column: pd.Series, field: dict) -> pd.Series:
+    field_type = field.get('type')
+    if field_type == 'datetime':
+        if 'tz' in field:
+            return pd.to_datetime(column, utc=True).dt.tz_convert(field['tz'])
+        return pd.to_datetime(column)
+    if field_type == 'duration':
+        return pd.to_timedelta(column)
+    if 'constraints' in field:
+        return pd.Series(pd.Categorical(
+            column,
+            categories=field['constraints'].get('enum'),
+            ordered=field.get('ordered', False),
+        ), index=column.index)
+    if field_type == 'integer' and column.isna().any():
+        return column.astype('float64')
+    if field_type in _DTYPES:
+        return column.astype(_DTYPES[field_type])
+    return column
+
+
+def decode_table(payload: dict) -> pd.DataFrame:
+    """Builds a dataframe from a ``to_json(orient='table')`` document.
+
+    The columns are built at once from the records and cast to the types
+    of the schema, the values are not validated one by one.
+
+    Args:
+        payload (dict): The schema and the records of the dataframe.
+
+    Raises:
+        ValueError: If the document is not a table.
+
+    Returns:
+        pd.DataFrame: The dataframe, indexed by its primary key.
+    """
+
+    schema = payload.get('schema', {})
+    data = payload.get('data', [])
+    if not isinstance(schema, dict) or not isinstance(data, list):
+        raise ValueError("Expected a dataframe with orient='table'")
+    fields = schema.get('fields', [])
+    try:
+        names = [field['name'] for field in fields]
+    except (KeyError, TypeError):
+        raise ValueError('Invalid table schema')
+
+    dataframe = pd.DataFrame.from_records(data, columns=names) if data \
+        else pd.DataFrame(columns=names)
+    for field in fields:
+        try:
+            dataframe[field['name']] = _decode_field(
+                dataframe[field['name']], field)
+        except (TypeError, ValueError) as e:
+            raise ValueError('Invalid column {}: {}'.format(field['name'], e))
+
+    primary_key = schema.get('primaryKey')
+    if primary_key:
+        dataframe = dataframe.set_index(primary_key)
+        # names pandas gives to unnamed indexes, as read_json does
+        if dataframe.index.nlevels == 1 and dataframe.index.name == 'index':
+            dataframe.index.name = None
+        elif dataframe.index.nlevels > 1:
+            dataframe.index.names = [
+                None if str(name).startswith('level_') else name
+                for name in dataframe.index.names
+            ]
+    return dataframe
+
+
+def decode_insert(payload: Any) -> Tuple[str, pd.DataFrame]:
+    """Decodes the payload of an insert.
+
+    Args:
+        payload (Any): A decoded JSON body with the table_name and the
+        dataframe to insert.
+
+    Raises:
+        ValueError: If the payload is not an insert.
+
+    Returns:
+        Tuple[str, pd.DataFrame]: The name of the table and the dataframe.
+    """
+
+    if not isinstance(payload, dict) or \
+            not isinstance(payload.get('table_name'), str) or \
+            not isinstance(payload.get('dataframe', {}), dict):
+        raise ValueError('Expected a table_name and a dataframe')
+    return payload['table_name'], decode_table(payload.get('dataframe', {}))
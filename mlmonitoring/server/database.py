@@ -0,0 +1,185 @@
+import os
+import time
+import itertools
+import threading
+from typing import Iterator, List, Optional
+import sqlalchemy
+from mlmonitoring.server.metrics import POOL_CONNECTIONS, REGISTRY
+
+
+# the server reads environment variables to set the SQLAlchemy
+# connector and its pool, so that every worker process shares them.
+DATABASE_URI = 'MLMONITOR_DATABASE_URI'
+READ_URIS = 'MLMONITOR_DATABASE_READ_URIS'
+REPLICA_COOLDOWN = 'MLMONITOR_REPLICA_COOLDOWN'
+POOL_SIZE = 'MLMONITOR_POOL_SIZE'
+MAX_OVERFLOW = 'MLMONITOR_MAX_OVERFLOW'
+POOL_PRE_PING = 'MLMONITOR_POOL_PRE_PING'
+POOL_RECYCLE = 'MLMONITOR_POOL_RECYCLE'
+
+_engine = None
+_replicas = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+# replica engine -> time until which it is skipped after a failure
+_unhealthy = {}
+_round_robin = itertools.count()
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else None
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options() -> dict:
+    """Returns the pool options of the engine set in the environment.
+
+    Pool size and overflow are only passed when set, since the pools
+    used by SQLite do not accept them.
+
+    Returns:
+        dict: Keyword arguments of ``sqlalchemy.create_engine``.
+    """
+
+    options = {
+        'pool_pre_ping': _env_bool(POOL_PRE_PING, True),
+        'pool_recycle': _env_int(POOL_RECYCLE) or -1,
+    }
+    for option, name in (('pool_size', POOL_SIZE), ('max_overflow', MAX_OVERFLOW)):
+        value = _env_int(name)
+        if value is not None:
+            options[option] = value
+    return options
+
+
+def _read_uris() -> List[str]:
+    uris = os.environ.get(READ_URIS, '')
+    return [uri.strip() for uri in uris.split(',') if uri.strip()]
+
+
+def _check_process() -> None:
+    """Drops the engines inherited from a parent process."""
+    global _engine, _replicas
+    if _engine_pid == os.getpid():
+        return
+    # leave the connections of the parent process untouched
+    for engine in [_engine] + list(_replicas or []):
+        if engine is not None:
+            engine.dispose(close=False)
+    _engine, _replicas = None, None
+    _unhealthy.clear()
+
+
+def get_engine() -> sqlalchemy.engine.Engine:
+    """Returns the SQLAlchemy engine of the primary database.
+
+    The engine is created on first use, so that the CLI starts without
+    connecting to the database, and again in a forked process, where the
+    connections of the parent must not be shared.
+
+    Returns:
+        sqlalchemy.engine.Engine: The engine of the database.
+    """
+
+    global _engine, _engine_pid
+    if _engine is None or _engine_pid != os.getpid():
+        with _engine_lock:
+            _check_process()
+            if _engine is None:
+                _engine = sqlalchemy.create_engine(
+                    os.environ.get(DATABASE_URI), **engine_options())
+                _engine_pid = os.getpid()
+    return _engine
+
+
+def get_replicas() -> List[sqlalchemy.engine.Engine]:
+    """Returns the engines of the read replicas of the current process.
+
+    Returns:
+        List[sqlalchemy.engine.Engine]: One engine per URI of
+        ``MLMONITOR_DATABASE_READ_URIS``, empty when there is none.
+    """
+
+    global _replicas
+    get_engine()
+    if _replicas is None:
+        with _engine_lock:
+            if _replicas is None:
+                _replicas = [
+                    sqlalchemy.create_engine(uri, **engine_options())
+                    for uri in _read_uris()
+                ]
+    return _replicas
+
+
+def mark_unhealthy(engine: sqlalchemy.engine.Engine) -> None:
+    """Skips a replica for ``MLMONITOR_REPLICA_COOLDOWN`` seconds.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): The replica that failed.
+    """
+
+    cooldown = _env_int(REPLICA_COOLDOWN)
+    _unhealthy[engine] = time.monotonic() + (
+        30 if cooldown is None else cooldown)
+
+
+def read_engines(consistent: bool = False) -> Iterator[sqlalchemy.engine.Engine]:
+    """Engines to read from, in the order they should be tried.
+
+    Healthy replicas are yielded in round-robin order, followed by the
+    primary as fallback. Consistent reads only use the primary, so that
+    they see the writes not yet replicated.
+
+    Args:
+        consistent (bool, optional): Read your writes. Defaults to False.
+
+    Yields:
+        sqlalchemy.engine.Engine: The next engine to try.
+    """
+
+    replicas = [] if consistent else get_replicas()
+    if replicas:
+        start = next(_round_robin) % len(replicas)
+        now = time.monotonic()
+        for engine in replicas[start:] + replicas[:start]:
+            if _unhealthy.get(engine, 0) <= now:
+                yield engine
+    yield get_engine()
+
+
+def dispose_engine() -> None:
+    """Closes the connections of the pools of the current process."""
+    global _engine, _replicas
+    with _engine_lock:
+        if _engine_pid == os.getpid():
+            for engine in [_engine] + list(_replicas or []):
+                if engine is not None:
+                    engine.dispose()
+        _engine, _replicas = None, None
+        _unhealthy.clear()
+
+
+def _collect_pool_metrics() -> None:
+    """Updates the connection pool gauges, when the pools report them."""
+    engines = [('primary', _engine)] + [
+        ('replica{}'.format(i), engine) for i, engine in enumerate(_replicas or [])]
+    for name, engine in engines:
+        if engine is None:
+            continue
+        for state in ('size', 'checkedin', 'checkedout', 'overflow'):
+            value = getattr(engine.pool, state, None)
+            value = value() if callable(value) else value
+            if isinstance(value, int):
+                POOL_CONNECTIONS.set(value, database=name, state=state)
+
+
+REGISTRY.register_collector(_collect_pool_metrics)
@@ -0,0 +1,129 @@
+from typing import List, Optional
+import pandas as pd
+from mlmonitoring.monitor.utils.divergence import _divergences
+from mlmonitoring.monitor.utils.histogram import HistogramAccumulator
+from mlmonitoring.server.backends import Backend
+from mlmonitoring.server.cache import get_cache
+
+
+def _window(time_column: str, start, end) -> list:
+    filters = []
+    if start is not None:
+        filters.append((time_column, 'ge', str(pd.Timestamp(start))))
+    if end is not None:
+        filters.append((time_column, 'lt', str(pd.Timestamp(end))))
+    return filters
+
+
+def _features(backend: Backend, table_name: str, filters: list,
+              time_column: str) -> List[str]:
+    """Every column of a table but its time column and unnamed index."""
+    chunks = backend.read_chunks(table_name, filters, chunksize=1)
+    try:
+        for chunk in chunks:
+            return [column for column in chunk.columns
+                    if column not in (time_column, 'index')]
+    finally:
+        # releases the connection or cursor of the read
+        chunks.close()
+    raise ValueError('No rows in {}'.format(table_name))
+
+
+def table_drift(
+    backend: Backend,
+    table_name: str,
+    reference_start,
+    reference_end,
+    start=None,
+    end=None,
+    columns: Optional[List[str]] = None,
+    reference_table: Optional[str] = None,
+    time_column: str = 'timestamp',
+    freq: str = 'D',
+    buckettype: str = 'bins',
+    buckets: int = 10,
+    chunksize: int = 100_000,
+    results_table: Optional[str] = None,
+) -> pd.DataFrame:
+    """Drift of the stored rows of a table against a reference window.
+
+    The table is read chunk by chunk and the chunks are counted in
+    histograms, so memory is bounded whatever the size of the table. The
+    reference window is read twice, once to define the buckets and once
+    to count them. The production rows are counted by period of their
+    time column, and the drift metrics of every period and feature are
+    written to the results table.
+
+    Args:
+        backend (Backend): The storage of the tables.
+        table_name (str): The table of the production rows.
+        reference_start (pd.Timestamp): Start of the reference window.
+        reference_end (pd.Timestamp): End of the reference window,
+        excluded.
+        start (pd.Timestamp, optional): Start of the production rows.
+        Defaults to None, the first row.
+        end (pd.Timestamp, optional): End of the production rows,
+        excluded. Defaults to None, the last row.
+        columns (List[str], optional): The features. Defaults to None,
+        every column but the time column.
+        reference_table (str, optional): The table of the reference rows.
+        Defaults to None, table_name.
+        time_column (str, optional): The time column of the tables.
+        Defaults to 'timestamp'.
+        freq (str, optional): The periods of the production rows, as
+        pandas periods. Defaults to 'D'.
+        buckettype (str, optional): 'bins' for even splits or 'quantiles'
+        for quantile buckets of a sample of the reference. Defaults to
+        'bins'.
+        buckets (int, optional): Number of buckets of numeric features.
+        Defaults to 10.
+        chunksize (int, optional): Rows read at once. Defaults to 100,000.
+        results_table (str, optional): The table the results are appended
+        to, '' to not write them. Defaults to None, '<table_name>_drift'.
+
+    Returns:
+        pd.DataFrame: One row per period and feature with the psi, kl,
+        js, hellinger and wasserstein drift and the number of reference
+        and production rows, indexed by the start of the period.
+    """
+
+    reference_table = reference_table or table_name
+    reference = _window(time_column, reference_start, reference_end)
+    production = _window(time_column, start, end)
+    if columns is None:
+        columns = _features(backend, reference_table, reference, time_column)
+    columns = list(columns)
+
+    accumulator = HistogramAccumulator(
+        columns, buckettype=buckettype, buckets=buckets)
+    for chunk in backend.read_chunks(
+            reference_table, reference, columns, chunksize):
+        accumulator.observe(chunk)
+    for chunk in backend.read_chunks(
+            reference_table, reference, columns, chunksize):
+        accumulator.add_expected(chunk)
+    for chunk in backend.read_chunks(
+            table_name, production, columns + [time_column], chunksize):
+        periods = pd.to_datetime(chunk[time_column]).dt.to_period(freq)
+        accumulator.add_actual(chunk, periods.dt.start_time)
+
+    histograms = accumulator.histograms()
+    periods = pd.DatetimeIndex(accumulator.segments)
+    n_features = len(columns)
+    result = pd.DataFrame({
+        time_column: periods.repeat(n_features),
+        'feature': columns * len(periods),
+    })
+    for metric, values in _divergences(histograms).items():
+        result[metric] = values.ravel()
+    result['n_train'] = histograms.n_expected.repeat(n_features)
+    result['n_test'] = histograms.n_actual.repeat(n_features)
+    result = result.sort_values(time_column, kind='stable')
+    result = result.set_index(time_column)
+
+    if results_table is None:
+        results_table = '{}_drift'.format(table_name)
+    if results_table and len(result):
+        backend.insert(results_table, result)
+        get_cache().invalidate(results_table)
+    return result
@@ -1,42 +1,394 @@
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Optional
+from contextlib import asynccontextmanager
 import uvicorn
 import click
-from fastapi import FastAPI, HTTPException
-from mlmonitoring.server.schemas import InsertModel
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Match
+from mlmonitoring.compression import (
+    BodyTooLarge,
+    available_encodings,
+    compress,
+    decompress,
+    negotiate,
+)
+from mlmonitoring.server import backends, database, store
+from mlmonitoring.server.cache import CACHE_TTL, get_cache
+from mlmonitoring.server.codec import decode_insert, loads
+from mlmonitoring.server.drift import table_drift
+from mlmonitoring.server.maintenance import maintain
+from mlmonitoring.server.schemas import DriftModel
+from mlmonitoring.server.metrics import (
+    CACHE_REQUESTS,
+    PHASE_LATENCY,
+    REGISTRY,
+    REQUEST_LATENCY,
+    REQUESTS_IN_FLIGHT,
+    TABLE_BYTES,
+)
 from mlmonitoring.server.store import (
-    insert_table,
     view_table,
     filter_table
 )
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # each worker process opens its own storage and closes it
+    backends.get_backend()
+    try:
+        yield
+    finally:
+        backends.dispose_backend()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency of each route and the
+    number of requests in flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route(self, scope) -> str:
+        # label by route template to keep the number of series bounded
+        for route in scope['app'].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return 'unmatched'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope['method'],
+                route=self._route(scope),
+                status=status['code'],
+            )
+
+
+# the largest request body accepted once decompressed, in bytes
+MAX_BODY_SIZE = 'MLMONITOR_MAX_BODY_SIZE'
+
+
+class CompressionMiddleware:
+    """ASGI middleware decompressing gzip and zstd request bodies and
+    compressing responses with the encoding accepted by the client.
+
+    Responses are buffered before being compressed, the routes of the
+    server do not stream. Compressed request bodies larger than
+    ``max_body_size`` once decompressed are rejected with a 413.
+
+    Args:
+        app: The ASGI application.
+        minimum_size (int, optional): Responses smaller than this number
+        of bytes are sent uncompressed. Defaults to 1024.
+        max_body_size (int, optional): Maximum size of a decompressed
+        request body in bytes. Defaults to None, the
+        ``MLMONITOR_MAX_BODY_SIZE`` environment variable or 256 MiB.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024,
+                 max_body_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_body_size = max_body_size
+
+    def _max_body_size(self) -> int:
+        # read on each request, the CLI sets it after the app is built
+        if self.max_body_size is not None:
+            return self.max_body_size
+        value = os.environ.get(MAX_BODY_SIZE)
+        return int(value) if value else 256 * 2 ** 20
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get('content-encoding', 'identity').lower()
+        if content_encoding != 'identity':
+            request = await self._decompress_request(
+                scope, receive, content_encoding)
+            if isinstance(request, Response):
+                await request(scope, receive, send)
+                return
+            scope, receive = request
+
+        encoding = negotiate(headers.get('accept-encoding', ''))
+        if encoding is not None:
+            send = self._compress_response(send, encoding)
+        await self.app(scope, receive, send)
+
+    async def _decompress_request(self, scope, receive, content_encoding):
+        """The scope and receive callable of the decompressed request, or
+        the error response to send."""
+        if content_encoding not in available_encodings():
+            return PlainTextResponse(
+                'Unsupported content encoding', status_code=415)
+        max_size = self._max_body_size()
+        chunks, size = [], 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            size += len(chunks[-1])
+            more_body = message.get('more_body', False)
+            if size > max_size:
+                # a body compressed this much expands even further
+                return PlainTextResponse(
+                    'Request body too large', status_code=413)
+        try:
+            body = decompress(b''.join(chunks), content_encoding, max_size)
+        except BodyTooLarge as e:
+            return PlainTextResponse(str(e), status_code=413)
+        except ValueError as e:
+            return PlainTextResponse(str(e), status_code=400)
+        scope = dict(scope)
+        scope['headers'] = [
+            (key, value) for key, value in scope['headers']
+            if key not in (b'content-encoding', b'content-length')
+        ] + [(b'content-length', str(len(body)).encode())]
+        return scope, _replay(body, receive)
+
+    def _compress_response(self, send, encoding):
+        """An ASGI send callable buffering the response and compressing it
+        with ``encoding``."""
+        start, chunks = {}, []
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                start.update(message)
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+            chunks.append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+
+            body = b''.join(chunks)
+            response_headers = MutableHeaders(raw=list(start.get('headers', [])))
+            if len(body) >= self.minimum_size and \
+                    'content-encoding' not in response_headers:
+                body = compress(body, encoding)
+                response_headers['content-encoding'] = encoding
+                response_headers['content-length'] = str(len(body))
+                response_headers.add_vary_header('Accept-Encoding')
+            start['headers'] = response_headers.raw
+            await send(start)
+            await send({'type': 'http.response.body', 'body': body})
+        return send_wrapper
+
+
+def _replay(body: bytes, receive):
+    """An ASGI receive callable returning a body already read, then the
+    next messages of the connection."""
+    sent = {'body': False}
+
+    async def replay():
+        if not sent['body']:
+            sent['body'] = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return await receive()
+    return replay
+
+
+# the last middleware added is the outermost one
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.post("/insert")
-async def insert_dataframe(data: InsertModel):
+async def insert_dataframe(request: Request):
+    body = await request.body()
+    try:
+        with PHASE_LATENCY.time(operation='insert', phase='body_parse'):
+            payload = loads(body)
+        with PHASE_LATENCY.time(operation='insert', phase='dataframe_build'):
+            table_name, dataframe = decode_insert(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    TABLE_BYTES.inc(len(body), table=table_name, operation='insert')
+
     try:
-        insert_table(data)
+        store.insert_dataframe(table_name, dataframe)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        # rejected rows are not retried by the clients
+        status = 422 if backends.is_data_error(e) else 500
+        raise HTTPException(status_code=status, detail=str(e))
 
 
-@app.get("/view/{table_name}")
-async def view_dataframe(table_name: str):
+@app.post("/insert_many")
+async def insert_dataframes(request: Request):
+    body = await request.body()
+    try:
+        with PHASE_LATENCY.time(operation='insert_many', phase='body_parse'):
+            payload = loads(body)
+        if not isinstance(payload, dict) or \
+                not isinstance(payload.get('tables', []), list):
+            raise ValueError('Expected a list of tables')
+        with PHASE_LATENCY.time(
+                operation='insert_many', phase='dataframe_build'):
+            tables = [decode_insert(table) for table in payload.get('tables', [])]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # the body is not encoded again to measure each table, its bytes are
+    # split between the tables by their number of values
+    sizes = [dataframe.size + len(dataframe) for _, dataframe in tables]
+    for (table_name, _), size in zip(tables, sizes):
+        TABLE_BYTES.inc(
+            len(body) * size / max(sum(sizes), 1),
+            table=table_name, operation='insert')
+
     try:
-        return view_table(table_name)
+        store.insert_dataframes(tables)
+    except Exception as e:
+        # rejected rows are not retried by the clients
+        status = 422 if backends.is_data_error(e) else 500
+        raise HTTPException(status_code=status, detail=str(e))
+
+
+def _not_modified(request: Request, etag: str, modified: float) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or 'W/' + etag in tags
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(modified) <= since
+    return False
+
+
+def _columns(columns: Optional[str]):
+    if columns is None:
+        return None
+    columns = tuple(column.strip() for column in columns.split(','))
+    if not all(column.isidentifier() for column in columns):
+        raise HTTPException(status_code=422, detail='Invalid columns')
+    return columns
+
+
+def _cached_read(request: Request, key: tuple, consistent: bool,
+                 read: Callable[[], str]) -> Response:
+    """Answers a read from the response cache when possible.
+
+    Consistent reads always query the primary database and are not
+    cached. Other reads get an ETag and a Last-Modified header from the
+    version of their table, so polls with If-None-Match or
+    If-Modified-Since get a 304 without querying the database.
+    """
+
+    try:
+        # the records are encoded once, as the body of the response
+        if consistent:
+            return Response(read().encode(), media_type='application/json')
+
+        cache = get_cache()
+        version, _ = cache.version(key[0])
+        etag, modified = cache.validators(key[0], key)
+        headers = {
+            'ETag': etag,
+            'Last-Modified': formatdate(modified, usegmt=True),
+            'Cache-Control': 'no-cache',
+        }
+        if _not_modified(request, etag, modified):
+            CACHE_REQUESTS.inc(result='not_modified')
+            return Response(status_code=304, headers=headers)
+
+        body = cache.get(key, version)
+        CACHE_REQUESTS.inc(result='miss' if body is None else 'hit')
+        if body is None:
+            body = read().encode()
+            cache.put(key, body, version)
+        return Response(body, media_type='application/json', headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/view/{table_name}")
+async def view_dataframe(
+    request: Request,
+    table_name: str,
+    consistent: bool = False,
+    columns: Optional[str] = None
+):
+    columns = _columns(columns)
+    return _cached_read(
+        request, (table_name, None, columns), consistent,
+        lambda: view_table(table_name, consistent, columns))
+
+
 @app.get("/filter/{table_name}/{query_string}")
-async def filter_dataframe(table_name: str, query_string: str):
+async def filter_dataframe(
+    request: Request,
+    table_name: str,
+    query_string: str,
+    consistent: bool = False,
+    columns: Optional[str] = None
+):
+    columns = _columns(columns)
+    return _cached_read(
+        request, (table_name, query_string, columns), consistent,
+        lambda: filter_table(table_name, query_string, consistent, columns))
+
+
+@app.post("/drift/{table_name}")
+def drift_table(table_name: str, job: DriftModel):
+    # a plain function, FastAPI runs the chunked reads in its thread pool
     try:
-        return filter_table(table_name, query_string)
+        result = table_drift(
+            backends.get_backend(), table_name, **job.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {
+        'results_table': job.results_table
+        if job.results_table is not None else '{}_drift'.format(table_name),
+        'periods': int(result.index.nunique()),
+        'rows': len(result),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        REGISTRY.render(),
+        media_type='text/plain; version=0.0.4'
+    )
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option(
     '--host',
     '-h',
@@ -49,10 +401,250 @@ async def filter_dataframe(table_name: str, query_string: str):
     default=8000,
     help="The port to listen on (default: 8000)."
 )
-def cli(host, port):
+@click.option(
+    '--workers',
+    '-w',
+    default=1,
+    envvar='MLMONITOR_WORKERS',
+    help="The number of server processes (default: 1)."
+)
+@click.option(
+    '--pool-size',
+    type=int,
+    default=None,
+    envvar=database.POOL_SIZE,
+    help="Connections kept open by the pool of each process."
+)
+@click.option(
+    '--max-overflow',
+    type=int,
+    default=None,
+    envvar=database.MAX_OVERFLOW,
+    help="Connections opened above the pool size of each process."
+)
+@click.option(
+    '--pool-pre-ping/--no-pool-pre-ping',
+    default=True,
+    envvar=database.POOL_PRE_PING,
+    help="Test connections before using them (default: enabled)."
+)
+@click.option(
+    '--pool-recycle',
+    type=int,
+    default=None,
+    envvar=database.POOL_RECYCLE,
+    help="Seconds after which connections are replaced."
+)
+@click.option(
+    '--max-body-size',
+    type=int,
+    default=None,
+    envvar=MAX_BODY_SIZE,
+    help="Bytes of a decompressed request body (default: 256 MiB)."
+)
+@click.option(
+    '--cache-ttl',
+    type=float,
+    default=None,
+    envvar=CACHE_TTL,
+    help="Seconds a cached read may be stale (default: 60)."
+)
+@click.pass_context
+def cli(context, host, port, workers, pool_size, max_overflow, pool_pre_ping,
+        pool_recycle, max_body_size, cache_ttl):
+    """Serves the MLmonitoring API, or runs one of the commands."""
+    if context.invoked_subcommand is not None:
+        return
+
     click.echo('Initializing MLmonitoring server')
-    uvicorn.run(
-        app,
-        host=host,
-        port=port
-    )
+
+    # worker processes read their settings from the environment
+    for name, value in (
+        (database.POOL_SIZE, pool_size),
+        (database.MAX_OVERFLOW, max_overflow),
+        (database.POOL_RECYCLE, pool_recycle),
+        (MAX_BODY_SIZE, max_body_size),
+        (CACHE_TTL, cache_ttl),
+    ):
+        if value is not None:
+            os.environ[name] = str(value)
+    os.environ[database.POOL_PRE_PING] = str(pool_pre_ping).lower()
+
+    if workers > 1:
+        click.echo(
+            'Warning: each worker keeps its own metrics, /metrics reports those '
+            'of the worker answering the scrape',
+            err=True
+        )
+        # uvicorn needs an import string to start the worker processes
+        uvicorn.run(
+            'mlmonitoring.server.main:app',
+            host=host,
+            port=port,
+            workers=workers
+        )
+    else:
+        uvicorn.run(
+            app,
+            host=host,
+            port=port
+        )
+
+
+def _parse_ttls(context, param, values):
+    ttls = {}
+    for value in values:
+        table_name, _, duration = value.partition('=')
+        try:
+            ttls[table_name] = pd.Timedelta(duration)
+        except ValueError:
+            raise click.BadParameter('expected TABLE=DURATION, e.g. psi=30d')
+    return ttls
+
+
+def _parse_ttl(context, param, value):
+    if value is None:
+        return None
+    try:
+        return pd.Timedelta(value)
+    except ValueError:
+        raise click.BadParameter('expected a DURATION, e.g. 30d')
+
+
+@cli.command()
+@click.option(
+    '--ttl',
+    multiple=True,
+    callback=_parse_ttls,
+    help="Time to live of the rows of a table, as TABLE=DURATION (e.g. psi=30d)."
+)
+@click.option(
+    '--default-ttl',
+    default=None,
+    callback=_parse_ttl,
+    help="Time to live of the rows of the other tables (default: kept)."
+)
+@click.option(
+    '--downcast',
+    is_flag=True,
+    help="Store floats as float32 and strings as categories."
+)
+@click.option(
+    '--compact/--no-compact',
+    default=True,
+    help="Merge the appends of each table into sorted partitions."
+)
+@click.option(
+    '--time-column',
+    default='timestamp',
+    help="The time column of the tables (default: timestamp)."
+)
+@click.option(
+    '--measure-scan',
+    is_flag=True,
+    help="Report the full scan time of each table before and after."
+)
+@click.option(
+    '--every',
+    type=float,
+    default=None,
+    help="Run again every this number of seconds (default: run once)."
+)
+def maintenance(ttl, default_ttl, downcast, compact, time_column,
+                measure_scan, every):
+    """Applies retention, downcasting and compaction to the tables."""
+    backend = backends.get_backend()
+    while True:
+        for report in maintain(backend, ttl, default_ttl, downcast, compact,
+                               time_column, measure_scan=measure_scan):
+            line = '{table}: {rows_deleted} rows deleted, {reclaimed} ' \
+                'reclaimed'.format(
+                    reclaimed='?' if report['bytes_reclaimed'] is None
+                    else '{} bytes'.format(report['bytes_reclaimed']),
+                    **report)
+            if measure_scan:
+                line += ', scan {scan_before:.4f}s -> {scan_after:.4f}s'.format(
+                    **report)
+            click.echo(line)
+        if every is None:
+            break
+        time.sleep(every)
+
+
+@cli.command()
+@click.argument('table_name')
+@click.option(
+    '--reference-start',
+    required=True,
+    help="Start of the reference window, e.g. 2021-01-01."
+)
+@click.option(
+    '--reference-end',
+    required=True,
+    help="End of the reference window, excluded."
+)
+@click.option(
+    '--start',
+    default=None,
+    help="Start of the production rows (default: the first row)."
+)
+@click.option(
+    '--end',
+    default=None,
+    help="End of the production rows, excluded (default: the last row)."
+)
+@click.option(
+    '--column',
+    'columns',
+    multiple=True,
+    help="A feature column (default: every column but the time column)."
+)
+@click.option(
+    '--reference-table',
+    default=None,
+    help="The table of the reference rows (default: TABLE_NAME)."
+)
+@click.option(
+    '--time-column',
+    default='timestamp',
+    help="The time column of the tables (default: timestamp)."
+)
+@click.option(
+    '--freq',
+    default='D',
+    help="The periods of the drift, as pandas periods (default: D)."
+)
+@click.option(
+    '--buckettype',
+    type=click.Choice(['bins', 'quantiles']),
+    default='bins',
+    help="Even splits or quantiles of the reference (default: bins)."
+)
+@click.option(
+    '--buckets',
+    type=int,
+    default=10,
+    help="Number of buckets of numeric features (default: 10)."
+)
+@click.option(
+    '--chunksize',
+    type=int,
+    default=100_000,
+    help="Rows read at once (default: 100000)."
+)
+@click.option(
+    '--results-table',
+    default=None,
+    help="The table of the results (default: TABLE_NAME_drift)."
+)
+def drift(table_name, reference_start, reference_end, start, end, columns,
+          reference_table, time_column, freq, buckettype, buckets, chunksize,
+          results_table):
+    """Computes the drift of a stored table by period, chunk by chunk."""
+    result = table_drift(
+        backends.get_backend(), table_name, reference_start, reference_end,
+        start, end, list(columns) or None, reference_table, time_column, freq,
+        buckettype, buckets, chunksize, results_table)
+    click.echo('{}: {} periods, {} rows written to {}'.format(
+        table_name, result.index.nunique(), len(result),
+        results_table or '{}_drift'.format(table_name)))
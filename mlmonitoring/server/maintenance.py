@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional
+import time
+import pandas as pd
+from mlmonitoring.server.backends import Backend
+from mlmonitoring.server.cache import get_cache
+
+
+def _scan_time(backend: Backend, table_name: str) -> float:
+    """Time of a full scan of a table, in seconds.
+
+    The table is read chunk by chunk, so it is never held in memory.
+    """
+
+    start = time.perf_counter()
+    for _ in backend.read_chunks(table_name):
+        pass
+    return time.perf_counter() - start
+
+
+def maintain(
+    backend: Backend,
+    ttls: Optional[Dict[str, pd.Timedelta]] = None,
+    default_ttl: Optional[pd.Timedelta] = None,
+    downcast: bool = False,
+    compact: bool = True,
+    time_column: str = 'timestamp',
+    tables: Optional[List[str]] = None,
+    now: Optional[pd.Timestamp] = None,
+    measure_scan: bool = False,
+) -> List[dict]:
+    """Applies retention, downcasting and compaction to tables.
+
+    Args:
+        backend (Backend): The storage of the tables.
+        ttls (Dict[str, pd.Timedelta], optional): Time to live of the rows
+        of each table. Defaults to None.
+        default_ttl (pd.Timedelta, optional): Time to live of the rows of
+        the other tables, None to keep them. Defaults to None.
+        downcast (bool, optional): Store columns in compact types.
+        Defaults to False.
+        compact (bool, optional): Merge the appends of each table into
+        sorted partitions. Defaults to True.
+        time_column (str, optional): The time column of the tables.
+        Defaults to 'timestamp'.
+        tables (List[str], optional): The tables to maintain. Defaults to
+        None, every table.
+        now (pd.Timestamp, optional): The reference time of the TTLs.
+        Defaults to None, the current time.
+        measure_scan (bool, optional): Time a full scan of each table
+        before and after, which reads every table twice. Defaults to
+        False.
+
+    Returns:
+        List[dict]: For each table, the rows deleted, the bytes before and
+        after, the bytes reclaimed and the full scan time before and after
+        with its speedup, None when the scans are not measured.
+    """
+
+    ttls = ttls or {}
+    now = pd.Timestamp.now() if now is None else now
+
+    report = []
+    for table_name in tables or backend.tables():
+        bytes_before = backend.size(table_name)
+        scan_before = _scan_time(backend, table_name) if measure_scan else None
+
+        ttl = ttls.get(table_name, default_ttl)
+        deleted = 0
+        if ttl is not None:
+            deleted = backend.delete_before(table_name, time_column, now - ttl)
+        if compact or downcast:
+            backend.compact(table_name, time_column, downcast)
+
+        get_cache().invalidate(table_name)
+
+        bytes_after = backend.size(table_name)
+        scan_after = _scan_time(backend, table_name) if measure_scan else None
+        report.append({
+            'table': table_name,
+            'rows_deleted': deleted,
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'bytes_reclaimed': None if None in (bytes_before, bytes_after)
+            else bytes_before - bytes_after,
+            'scan_before': scan_before,
+            'scan_after': scan_after,
+            'scan_speedup': scan_before / scan_after
+            if measure_scan and scan_after else None,
+        })
+    return report
@@ -0,0 +1,210 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Tuple
+import threading
+import time
+
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    labels = ['{}="{}"'.format(name, _escape(value))
+              for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return '{{{}}}'.format(','.join(labels)) if labels else ''
+
+
+class _Metric:
+    """Metric base class.
+
+    Args:
+        name (str): Name of the metric.
+        documentation (str): Help text of the metric.
+        labelnames (Tuple[str, ...], optional): Names of the labels.
+        Defaults to ().
+    """
+
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '{}{} {}'.format(
+                self.name, _format_labels(self.labelnames, key), value)
+
+    def render(self) -> List[str]:
+        return [
+            '# HELP {} {}'.format(self.name, self.documentation),
+            '# TYPE {} {}'.format(self.name, self.type),
+        ] + list(self._samples())
+
+
+class Counter(_Metric):
+    """A monotonically increasing counter."""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    type = 'gauge'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Observations counted in cumulative buckets.
+
+    Args:
+        name (str): Name of the metric.
+        documentation (str): Help text of the metric.
+        labelnames (Tuple[str, ...], optional): Names of the labels.
+        Defaults to ().
+        buckets (Tuple[float, ...], optional): Upper bounds of the
+        buckets. Defaults to LATENCY_BUCKETS.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # one count per bucket, +Inf, then the sum of the values
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts[:-1]):
+                cumulative += count
+                yield '{}_bucket{} {}'.format(
+                    self.name,
+                    _format_labels(self.labelnames, key, 'le="{}"'.format(bound)),
+                    cumulative)
+            labels = _format_labels(self.labelnames, key)
+            yield '{}_sum{} {}'.format(self.name, labels, counts[-1])
+            yield '{}_count{} {}'.format(self.name, labels, cumulative)
+
+
+class Registry:
+    """A collection of metrics rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callable that updates metrics right before rendering."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'mlmonitoring_request_duration_seconds',
+    'Latency of each route.',
+    ('method', 'route', 'status'),
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'mlmonitoring_requests_in_flight',
+    'Requests being processed.',
+))
+PHASE_LATENCY = REGISTRY.register(Histogram(
+    'mlmonitoring_phase_duration_seconds',
+    'Latency of each phase of a request.',
+    ('operation', 'phase'),
+))
+TABLE_ROWS = REGISTRY.register(Counter(
+    'mlmonitoring_table_rows_total',
+    'Rows written to or read from each table.',
+    ('table', 'operation'),
+))
+TABLE_BYTES = REGISTRY.register(Counter(
+    'mlmonitoring_table_bytes_total',
+    'JSON bytes received for or sent from each table.',
+    ('table', 'operation'),
+))
+POOL_CONNECTIONS = REGISTRY.register(Gauge(
+    'mlmonitoring_pool_connections',
+    'Connections of the database pools by state.',
+    ('database', 'state'),
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'mlmonitoring_cache_requests_total',
+    'Reads answered from the response cache (hit), the database (miss) '
+    'or with 304 Not Modified (not_modified).',
+    ('result',),
+))
+CACHE_BYTES = REGISTRY.register(Gauge(
+    'mlmonitoring_cache_bytes',
+    'Bytes of the cached responses.',
+))
@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -12,3 +13,18 @@ class InsertModel(BaseModel):
                 "dataframe": {"Key": "Value"},
             }
         }
+
+
+class DriftModel(BaseModel):
+    reference_start: str
+    reference_end: str
+    start: Optional[str] = None
+    end: Optional[str] = None
+    columns: Optional[List[str]] = None
+    reference_table: Optional[str] = None
+    time_column: str = 'timestamp'
+    freq: str = 'D'
+    buckettype: str = 'bins'
+    buckets: int = 10
+    chunksize: int = 100_000
+    results_table: Optional[str] = None
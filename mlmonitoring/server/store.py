@@ -1,108 +1,159 @@
-import os
 import re
-import json
-import sqlalchemy
+from typing import List, Optional, Tuple
 import pandas as pd
-from sqlalchemy_utils import database_exists, create_database
+from mlmonitoring.server.backends import OPERATORS, Filter, get_backend
+from mlmonitoring.server.cache import get_cache
+from mlmonitoring.server.codec import decode_insert
 from mlmonitoring.server.schemas import InsertModel
-
-
-# the server reads an environment varible
-# to set the SQLAlchemy connector.
-CONNECTION = os.environ.get("MLMONITOR_DATABASE_URI")
-engine = sqlalchemy.create_engine(CONNECTION)
+from mlmonitoring.server.metrics import PHASE_LATENCY, TABLE_BYTES, TABLE_ROWS
 
 
 def insert_table(data: InsertModel) -> None:
     """Insert the pandas dataframe to the database table.
 
+    The server decodes its bodies with ``decode_insert`` and calls
+    ``insert_dataframe``, this wrapper takes an InsertModel instead.
+
     Args:
         data (InsertModel): An InsertModel with
         table_name and dataframe.
     """
 
-    # converts json to pandas dataframe
-    dataframe = pd.read_json(json.dumps(data.dataframe), orient='table')
+    with PHASE_LATENCY.time(operation='insert', phase='dataframe_build'):
+        table_name, dataframe = decode_insert(data.dict())
+    insert_dataframe(table_name, dataframe)
+
+
+def insert_dataframe(table_name: str, dataframe: pd.DataFrame) -> None:
+    """Insert a pandas dataframe to the database table.
+
+    Args:
+        table_name (str): The name of the database table.
+        dataframe (pd.DataFrame): The rows to insert.
+    """
+
+    with PHASE_LATENCY.time(operation='insert', phase='db_write'):
+        get_backend().insert(table_name, dataframe)
+    get_cache().invalidate(table_name)
+    TABLE_ROWS.inc(len(dataframe), table=table_name, operation='insert')
+
+
+def insert_dataframes(tables: List[Tuple[str, pd.DataFrame]]) -> None:
+    """Insert several pandas dataframes in a single transaction.
+
+    Args:
+        tables (List[Tuple[str, pd.DataFrame]]): The name of each
+        database table and the rows to insert to it.
+    """
+
+    with PHASE_LATENCY.time(operation='insert_many', phase='db_write'):
+        get_backend().insert_many(tables)
+    for table_name, dataframe in tables:
+        get_cache().invalidate(table_name)
+        TABLE_ROWS.inc(len(dataframe), table=table_name, operation='insert')
+
+
+def _parse_value(value: str):
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_query_string(query_string: str) -> List[Filter]:
+    """Parses a filter query string.
 
-    # creates the database if it does
-    # not exist
-    if not database_exists(engine.url):
-        create_database(engine.url)
+    Args:
+        query_string (str): Conditions such as ``score__gt__0.5`` joined
+        by ``&``.
+
+    Raises:
+        ValueError: If an operator is unknown.
+
+    Returns:
+        List[Filter]: The (column, operator, value) of each condition.
+    """
 
-    # save the dataframe to the sql table
-    dataframe.to_sql(
-        name=data.table_name,
-        con=engine,
-        if_exists="append",
-        method="multi",
+    # matchs query string
+    match = re.findall(
+        r'([\w]*)\_\_([\w]*)\_\_([\w.:-]*)',
+        query_string
     )
 
+    filters = []
+    for column, operator, value in match:
+        if operator not in OPERATORS:
+            raise ValueError('Invalid operator: {}'.format(operator))
+        filters.append((column, operator, _parse_value(value)))
+    return filters
 
-def view_table(table_name: str) -> pd.DataFrame:
+
+def view_table(
+    table_name: str,
+    consistent: bool = False,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
     """Returns the dataframe stored in the
     database table.
 
     Args:
         table_name (str): The name of the database table.
+        consistent (bool, optional): Read from the primary database to
+        see the latest writes. Defaults to False.
+        columns (List[str], optional): The columns to read. Defaults to
+        None, reading every column.
 
     Returns:
         pd.DataFrame: The table as Pandas DataFrame.
     """
 
     # read the table from the database
-    data = pd.read_sql("SELECT * FROM {}".format(table_name), engine)
-
-    # convert to JSON as records orientation
-    dataframe = data.to_json(orient="records")
+    with PHASE_LATENCY.time(operation='view', phase='db_read'):
+        data = get_backend().read(
+            table_name, columns=columns, consistent=consistent)
 
-    return dataframe
+    return _encode_records(data, table_name, 'view')
 
 
-def filter_table(table_name: str, query_string: str) -> pd.DataFrame:
+def filter_table(
+    table_name: str,
+    query_string: str,
+    consistent: bool = False,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
     """Returns the dataframe stored in the
     database table filtered by a query.
 
     Args:
         table_name (str): The name of the database table.
         query_string (str): A query string.
+        consistent (bool, optional): Read from the primary database to
+        see the latest writes. Defaults to False.
+        columns (List[str], optional): The columns to read. Defaults to
+        None, reading every column.
 
     Returns:
         pd.DataFrame: The table as Pandas DataFrame.
     """
 
-    # mapping string to sql conditionals
-    mapping = {
-        'gt': '>',
-        'ge': '>=',
-        'lt': '<',
-        'le': '<=',
-        'eq': '=',
-        'ne': '<>',
-    }
+    filters = parse_query_string(query_string)
 
-    # matchs query string
-    match = re.findall(
-        r'([\w]*)\_\_([\w]*)\_\_([\w.-]*)',
-        query_string
-    )
+    # read the table from the database
+    with PHASE_LATENCY.time(operation='filter', phase='db_read'):
+        data = get_backend().read(table_name, filters, columns, consistent)
 
-    sql_query = []
-    for query in match:
-        sql_filter = '{} {} {}'.format(
-            query[0],
-            mapping[query[1]],
-            query[2]
-        )
-        sql_query.append(sql_filter)
-    sql_query = ' AND '.join(sql_query)
+    return _encode_records(data, table_name, 'filter')
 
-    # read the table from the database
-    data = pd.read_sql(
-        "SELECT * FROM {} WHERE {}".format(table_name, sql_query),
-        engine
-    )
+
+def _encode_records(data: pd.DataFrame, table_name: str, operation: str) -> str:
+    """Convert a read table to JSON and record its size."""
 
     # convert to JSON as records orientation
-    dataframe = data.to_json(orient="records")
+    with PHASE_LATENCY.time(operation=operation, phase='response_encode'):
+        dataframe = data.to_json(orient="records")
 
+    TABLE_ROWS.inc(len(data), table=table_name, operation=operation)
+    TABLE_BYTES.inc(len(dataframe), table=table_name, operation=operation)
     return dataframe
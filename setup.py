@@ -36,6 +36,13 @@ setup(
         'pyod'
     ],
 
+    extras_require={
+        'zstd': ['zstandard'],
+        'parquet': ['pyarrow'],
+        'duckdb': ['duckdb'],
+        'orjson': ['orjson'],
+    },
+
     entry_points='''
         [console_scripts]
         mlmonitoring=mlmonitoring.server.main:cli
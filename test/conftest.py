@@ -0,0 +1,13 @@
+import pytest
+from mlmonitoring.server.backends import create_backend
+
+
+@pytest.fixture(params=['sqlite', 'parquet', 'duckdb'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        uri = 'sqlite:///{}'.format(tmp_path / 'db.sqlite')
+    else:
+        uri = '{}://{}'.format(request.param, tmp_path / 'store')
+    backend = create_backend(uri)
+    yield backend
+    backend.dispose()
@@ -0,0 +1,146 @@
+from unittest import mock
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from mlmonitoring.server.backends import (
+    DuckDBBackend,
+    ParquetBackend,
+    SQLBackend,
+    create_backend,
+)
+
+
+def generate_frame(start, periods):
+    return pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=periods, freq='D'),
+        'psi': np.linspace(0, 1, periods),
+    }).set_index('timestamp')
+
+
+def test_create_backend(tmp_path):
+    assert isinstance(create_backend('sqlite:///:memory:'), SQLBackend)
+    assert isinstance(
+        create_backend('parquet://{}'.format(tmp_path)), ParquetBackend)
+    backend = create_backend('duckdb://{}'.format(tmp_path / 'db.duckdb'))
+    assert isinstance(backend, DuckDBBackend)
+    backend.dispose()
+
+    # a SQL URI other than the server's is not replaced by the server's
+    uri = 'sqlite:///{}'.format(tmp_path / 'other.sqlite')
+    with mock.patch.dict(os.environ, {"MLMONITOR_DATABASE_URI": 'sqlite://'}):
+        backend = create_backend(uri)
+        backend.insert('scores', generate_frame('2021-01-01', 3))
+        assert str(backend._engine.url) == uri
+        assert backend.tables() == ['scores']
+        backend.dispose()
+        assert create_backend('sqlite://')._engine is None
+
+
+def test_insert_and_read(backend):
+    backend.insert('scores', generate_frame('2021-01-25', 10))
+    backend.insert('scores', generate_frame('2021-03-01', 5))
+
+    data = backend.read('scores')
+    assert len(data) == 15
+    assert list(data.columns) == ['timestamp', 'psi']
+
+    data = backend.read(
+        'scores',
+        filters=[('timestamp', 'ge', '2021-02-01'), ('psi', 'gt', 0.5)],
+        columns=['psi'],
+    )
+    assert list(data.columns) == ['psi']
+    assert len(data) == 5
+
+
+def test_read_chunks(backend):
+    backend.insert('scores', generate_frame('2021-01-25', 5000))
+
+    filters = [('timestamp', 'ge', '2021-02-01')]
+    chunks = list(backend.read_chunks(
+        'scores', filters, columns=['psi'], chunksize=2048))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2048 for chunk in chunks)
+    data = pd.concat(chunks, ignore_index=True)
+    expected = backend.read('scores', filters, columns=['psi'])
+    pd.testing.assert_frame_equal(data, expected)
+
+
+def test_new_columns(backend):
+    if isinstance(backend, SQLBackend):
+        pytest.skip('to_sql does not add columns to SQL tables')
+    backend.insert('scores', generate_frame('2021-01-01', 2))
+    frame = generate_frame('2021-01-03', 2)
+    frame['kl'] = 1.0
+    backend.insert('scores', frame)
+
+    data = backend.read('scores', columns=['kl'])
+    assert data['kl'].isna().sum() == 2
+    assert (data['kl'] == 1.0).sum() == 2
+
+
+def test_invalid_names(backend):
+    with pytest.raises(ValueError):
+        backend.read('scores; DROP TABLE scores')
+    with pytest.raises(ValueError):
+        backend.read('scores', filters=[('psi', 'like', 1)])
+
+
+def test_parquet_partitions(tmp_path):
+    backend = ParquetBackend(str(tmp_path))
+    backend.insert('scores', generate_frame('2021-01-25', 10))
+    assert sorted(os.listdir(tmp_path / 'scores')) == [
+        '_schema.parquet', 'month=2021-01', 'month=2021-02']
+
+
+def test_server_with_parquet_backend(tmp_path):
+    import json
+    from fastapi.testclient import TestClient
+    uri = 'parquet://{}'.format(tmp_path)
+    with mock.patch.dict(os.environ, {"MLMONITOR_DATABASE_URI": uri}), \
+            mock.patch('mlmonitoring.server.backends._backend', None):
+        from mlmonitoring.server.main import app
+        with TestClient(app) as client:
+            response = client.post('/insert', json={
+                'table_name': 'project_scores',
+                'dataframe': json.loads(
+                    generate_frame('2021-01-01', 4).to_json(orient='table')),
+            })
+            assert response.status_code == 200
+            response = client.get('/filter/project_scores/psi__gt__0.5')
+            assert len(response.json()) == 2
+
+
+def test_insert_many(backend):
+    backend.insert_many([
+        ('scores', generate_frame('2021-01-01', 3)),
+        ('drift', generate_frame('2021-01-01', 2)),
+    ])
+    assert len(backend.read('scores')) == 3
+    assert len(backend.read('drift')) == 2
+
+    invalid = generate_frame('2021-02-01', 2)
+    invalid['psi'] = [object(), object()]
+    with pytest.raises(Exception):
+        backend.insert_many([
+            ('scores', generate_frame('2021-02-01', 3)),
+            ('drift', invalid),
+        ])
+    # none of the tables of a failed batch are written
+    assert len(backend.read('scores')) == 3
+    assert len(backend.read('drift')) == 2
+
+
+def test_copy_rows_quotes_names():
+    from mlmonitoring.server.backends import _copy_rows
+    connection = mock.MagicMock()
+    cursor = connection.connection.cursor.return_value.__enter__.return_value
+    table = mock.Mock(schema='monitoring')
+    table.name = 'project_psi'
+
+    _copy_rows(table, connection, ['timestamp', 'psi'], [(1, 0.5)])
+
+    sql = cursor.copy_expert.call_args[0][0]
+    assert sql.startswith(
+        'COPY "monitoring"."project_psi" ("timestamp", "psi") FROM STDIN')
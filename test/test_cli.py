@@ -1,7 +1,6 @@
 from click.testing import CliRunner
 from unittest import mock
 import os
-import pytest
 
 
 @mock.patch.dict(os.environ, {
@@ -20,3 +19,24 @@ def test_cli():
         run_server_mock.assert_called_once()
         assert result.exit_code == 0
         assert result.output == 'Initializing MLmonitoring server\n'
+
+
+@mock.patch.dict(os.environ, {
+    "MLMONITOR_DATABASE_URI": "sqlite:///:memory:"
+})
+def test_cli_workers():
+    with mock.patch("uvicorn.run") as run_server_mock:
+        from mlmonitoring.server.main import cli
+        runner = CliRunner()
+        result = runner.invoke(cli, [
+            '--workers', '4',
+            '--pool-size', '10',
+            '--no-pool-pre-ping',
+        ])
+        assert result.exit_code == 0
+        args, kwargs = run_server_mock.call_args
+        assert args == ('mlmonitoring.server.main:app',)
+        assert kwargs['workers'] == 4
+        assert 'Warning: each worker keeps its own metrics' in result.output
+        assert os.environ['MLMONITOR_POOL_SIZE'] == '10'
+        assert os.environ['MLMONITOR_POOL_PRE_PING'] == 'false'
@@ -70,4 +70,64 @@ def test_client_filter(monkeypatch):
     mock_session.assert_called_once_with(
         'http://127.0.0.1:8000/filter/project_name_filter_table/value__gt__0.5'
     )
-    
+
+
+def test_client_insert_compressed(monkeypatch):
+    import gzip
+    import json
+    mock_session = MagicMock()
+    monkeypatch.setattr('requests.Session.post', mock_session)
+
+    client = Client()
+    client.set_compression('gzip', threshold=0)
+    client.insert(generate_dataframe(), 'project_name', 'insert_table')
+
+    _, kwargs = mock_session.call_args
+    assert kwargs['headers']['Content-Encoding'] == 'gzip'
+    data = json.loads(gzip.decompress(kwargs['data']))
+    assert data['table_name'] == 'project_name_insert_table'
+
+
+def test_client_compression_threshold(monkeypatch):
+    mock_session = MagicMock()
+    monkeypatch.setattr('requests.Session.post', mock_session)
+
+    client = Client()
+    client.set_compression('gzip', threshold=10 ** 9)
+    client.insert(generate_dataframe(), 'project_name', 'insert_table')
+
+    _, kwargs = mock_session.call_args
+    assert 'Content-Encoding' not in kwargs['headers']
+
+
+def test_client_view_columns(monkeypatch):
+    mock_session = MagicMock()
+    monkeypatch.setattr('requests.Session.get', mock_session)
+
+    Client().view('project_name', 'view_table', consistent=True,
+                  columns=['key', 'value'])
+
+    mock_session.assert_called_once_with(
+        'http://127.0.0.1:8000/view/project_name_view_table'
+        '?consistent=true&columns=key%2Cvalue'
+    )
+
+
+def test_client_insert_many(monkeypatch):
+    mock_session = MagicMock(side_effect=client_insert_side_effect)
+    monkeypatch.setattr('requests.Session.post', mock_session)
+
+    client = Client()
+    dataframe = generate_dataframe()
+
+    route, data = client.insert_many(
+        {'first_table': dataframe, 'second_table': dataframe['value']},
+        'project_name'
+    )
+
+    assert route == 'http://127.0.0.1:8000/insert_many'
+    assert [table['table_name'] for table in data['tables']] == [
+        'project_name_first_table',
+        'project_name_second_table',
+    ]
+    mock_session.assert_called_once()
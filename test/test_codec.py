@@ -0,0 +1,52 @@
+from unittest import mock
+import io
+import json
+import pandas as pd
+import pytest
+from mlmonitoring.server.codec import decode_insert, decode_table, loads
+
+
+@pytest.mark.parametrize('dataframe', [
+    pd.DataFrame({
+        'timestamp': pd.date_range('2021-01-01', periods=3, freq='h'),
+        'psi': [0.1, None, 0.3],
+        'count': [1, 2, 3],
+        'alert': [True, False, True],
+        'feature': ['age', 'income', None],
+        'bucket': pd.Categorical(['low', 'high', 'low']),
+        'local': pd.date_range('2021-01-01', periods=3, tz='Europe/Paris'),
+    }).set_index('timestamp'),
+    pd.DataFrame({'value': [1, 2]}),
+    pd.DataFrame({'value': []}),
+    pd.Series([0.1, 0.2], name='score'),
+    pd.DataFrame({'key': [1, 2], 'other': [3, 4], 'value': [5, 6]})
+    .set_index(['key', 'other']),
+])
+def test_decode_table_matches_read_json(dataframe):
+    document = dataframe.to_json(orient='table')
+    expected = pd.read_json(io.StringIO(document), orient='table')
+    pd.testing.assert_frame_equal(decode_table(json.loads(document)), expected)
+
+
+@pytest.mark.parametrize('payload', [
+    [1, 2],
+    {'dataframe': {}},
+    {'table_name': 'scores', 'dataframe': []},
+    {'table_name': 'scores', 'dataframe': {'schema': {'fields': [{}]}}},
+    {'table_name': 'scores', 'dataframe': {
+        'schema': {'fields': [{'name': 'value', 'type': 'integer'}]},
+        'data': [{'value': {'not': 'a number'}}],
+    }},
+])
+def test_decode_insert_invalid(payload):
+    with pytest.raises(ValueError):
+        decode_insert(payload)
+
+
+def test_loads_without_orjson():
+    with mock.patch('mlmonitoring.server.codec._orjson', return_value=None):
+        assert loads(b'{"value": [1, 2.5]}') == {'value': [1, 2.5]}
+        with pytest.raises(ValueError):
+            loads(b'not json')
+    with pytest.raises(ValueError):
+        loads(b'not json')
@@ -0,0 +1,94 @@
+import json
+import numpy as np
+import pytest
+from mlmonitoring.monitor.model_drift.concept import (
+    ADWIN,
+    DDM,
+    PageHinkley,
+    concept_drift,
+)
+from mlmonitoring.monitor.model_drift.concept.detectors import _DetectorBase
+
+
+def generate_errors():
+    rng = np.random.RandomState(42)
+    return np.concatenate([
+        rng.binomial(1, 0.1, 2000),
+        rng.binomial(1, 0.6, 2000),
+    ])
+
+
+@pytest.mark.parametrize('detector', [ADWIN, DDM, PageHinkley])
+def test_detector_detects_error_rate_increase(detector):
+    errors = generate_errors()
+    drifts = detector().update(errors)
+    assert any(2000 <= drift < 2500 for drift in drifts)
+
+
+@pytest.mark.parametrize('detector', [ADWIN, DDM, PageHinkley])
+def test_detector_without_drift(detector):
+    errors = np.random.RandomState(0).binomial(1, 0.1, 4000)
+    assert len(detector().update(errors)) == 0
+
+
+@pytest.mark.parametrize('detector', [ADWIN, DDM, PageHinkley])
+def test_batched_updates_match_single_update(detector):
+    errors = generate_errors()
+    single = detector().update(errors)
+
+    batched = detector()
+    drifts, offset = [], 0
+    for batch in np.array_split(errors, 7):
+        state = json.loads(json.dumps(batched.get_state()))
+        batched = _DetectorBase.from_state(state)
+        drifts.extend(batched.update(batch) + offset)
+        offset += len(batch)
+
+    if detector is ADWIN:
+        # the window is only checked every clock values of a batch
+        assert len(drifts) > 0
+    else:
+        assert list(drifts) == list(single)
+
+
+def test_page_hinkley_small_forgetting_factor():
+    values = np.random.RandomState(0).normal(0, 1, 20_000)
+    detector = PageHinkley(alpha=0.5)
+    assert len(detector.update(values)) == 0
+    state = detector.get_state()['state']
+    assert all(np.isfinite(value) for value in state.values())
+
+    # a single scan of the stream matches a step by step update
+    stepwise = PageHinkley(alpha=0.5)
+    for value in values[:2000]:
+        stepwise.update(np.array([value]))
+    blocked = PageHinkley(alpha=0.5)
+    blocked.update(values[:2000])
+    assert blocked.get_state()['state']['sum'] == pytest.approx(
+        stepwise.get_state()['state']['sum'])
+
+
+def test_concept_drift_persists_state(tmp_path):
+    errors = generate_errors()
+    state_path = str(tmp_path / 'state.json')
+
+    first = concept_drift(errors[:2000], 'page_hinkley', state_path=state_path)
+    second = concept_drift(errors[2000:], 'page_hinkley', state_path=state_path)
+
+    assert first.name == 'drift'
+    assert first.iloc[0] == 0
+    assert second.iloc[0] > 0
+    with open(state_path) as state_file:
+        assert json.load(state_file)['n_detections'] == second.iloc[0]
+
+
+def test_concept_drift_state_of_another_detector(tmp_path):
+    errors = generate_errors()
+    state_path = str(tmp_path / 'state.json')
+    concept_drift(errors[:100], 'adwin', state_path=state_path)
+
+    with pytest.raises(ValueError):
+        concept_drift(errors[100:], 'ddm', state_path=state_path)
+    with pytest.raises(ValueError):
+        concept_drift(errors[100:], 'adwin', state_path=state_path, delta=0.5)
+    concept_drift(errors[100:], 'adwin', state_path=state_path)
@@ -0,0 +1,132 @@
+from click.testing import CliRunner
+from unittest import mock
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from mlmonitoring.monitor.model_drift.feature import psi_drift
+from mlmonitoring.monitor.utils.histogram import (
+    HistogramAccumulator,
+    _feature_histograms,
+)
+from mlmonitoring.server.drift import table_drift
+
+
+def generate_frame(days=28):
+    rng = np.random.RandomState(0)
+    rows = days * 24
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2021-01-01', periods=rows, freq='H'),
+        # the last two weeks are shifted
+        'income': np.concatenate([
+            rng.normal(0, 1, rows // 2), rng.normal(1, 1, rows - rows // 2)]),
+        'segment': rng.choice(['a', 'b', 'c'], rows),
+    }).set_index('timestamp')
+
+
+@pytest.mark.parametrize('buckettype', ['bins', 'quantiles'])
+def test_histogram_accumulator(buckettype):
+    frame = generate_frame().reset_index(drop=True)
+    train, test = frame.iloc[:300], frame.iloc[300:]
+    periods = np.repeat(np.arange(4), 93)
+
+    accumulator = HistogramAccumulator(
+        ['income', 'segment'], buckettype=buckettype)
+    for start in range(0, 300, 64):
+        accumulator.observe(train.iloc[start:start + 64])
+    for start in range(0, 300, 64):
+        accumulator.add_expected(train.iloc[start:start + 64])
+    for start in range(0, 372, 50):
+        accumulator.add_actual(
+            test.iloc[start:start + 50], periods[start:start + 50])
+    histograms = accumulator.histograms()
+
+    expected = _feature_histograms(
+        train, test, buckettype=buckettype,
+        train_segments=np.zeros(300, dtype=np.int64), test_segments=periods,
+        n_segments=4)
+    assert accumulator.segments == [0, 1, 2, 3]
+    np.testing.assert_array_equal(histograms.offsets, expected.offsets)
+    np.testing.assert_array_equal(histograms.actual, expected.actual)
+    np.testing.assert_array_equal(histograms.n_actual, expected.n_actual)
+    for segment in range(4):
+        np.testing.assert_array_equal(
+            histograms.expected[segment], expected.expected[0])
+
+    with pytest.raises(ValueError):
+        accumulator.observe(train)
+
+
+def test_table_drift(backend):
+    frame = generate_frame()
+    backend.insert('features', frame)
+
+    result = table_drift(
+        backend, 'features', '2021-01-01', '2021-01-08',
+        start='2021-01-08', freq='W', chunksize=50)
+    assert list(result.columns) == [
+        'feature', 'psi', 'kl', 'js', 'hellinger', 'wasserstein',
+        'n_train', 'n_test']
+    assert list(result['feature'][:2]) == ['income', 'segment']
+    assert (result['n_train'] == 168).all()
+
+    # the same PSI as computed on the rows in memory
+    reference = frame.loc['2021-01-01':'2021-01-07']
+    week = frame.loc['2021-01-18':'2021-01-24']
+    expected = psi_drift(reference, week, ['income', 'segment'], [1, 1])
+    np.testing.assert_allclose(
+        result.loc['2021-01-18', 'psi'], expected['psi'])
+    income = result[result['feature'] == 'income']['psi']
+    assert income.iloc[-1] > 0.4 > income.iloc[0]
+
+    stored = backend.read('features_drift')
+    assert len(stored) == len(result)
+    assert list(stored.columns) == ['timestamp'] + list(result.columns)
+
+
+def test_table_drift_options(backend):
+    backend.insert('features', generate_frame(days=7))
+    result = table_drift(
+        backend, 'features', '2021-01-01', '2021-01-04',
+        columns=['income'], results_table='')
+    assert list(result['feature'].unique()) == ['income']
+    assert len(result) == 7
+    assert 'features_drift' not in backend.tables()
+
+    with pytest.raises(ValueError):
+        table_drift(backend, 'features', '2020-01-01', '2020-02-01')
+
+
+def test_drift_endpoint_and_cli(tmp_path):
+    from fastapi.testclient import TestClient
+    uri = 'parquet://{}'.format(tmp_path)
+    with mock.patch.dict(os.environ, {"MLMONITOR_DATABASE_URI": uri}):
+        from mlmonitoring.server import backends
+        from mlmonitoring.server.main import app, cli
+        backends.dispose_backend()
+        backends.get_backend().insert('features', generate_frame(days=7))
+
+        with TestClient(app) as client:
+            response = client.post('/drift/features', json={
+                'reference_start': '2021-01-01',
+                'reference_end': '2021-01-03',
+            })
+            assert response.status_code == 200
+            assert response.json() == {
+                'results_table': 'features_drift', 'periods': 7, 'rows': 14}
+            response = client.get('/view/features_drift')
+            assert len(response.json()) == 14
+            response = client.post('/drift/features;', json={
+                'reference_start': '2021-01-01',
+                'reference_end': '2021-01-03',
+            })
+            assert response.status_code == 422
+
+        result = CliRunner().invoke(cli, [
+            'drift', 'features', '--reference-start', '2021-01-01',
+            '--reference-end', '2021-01-03', '--freq', 'W',
+            '--column', 'income', '--results-table', 'weekly'])
+        assert result.exit_code == 0, result.output
+        assert result.output.startswith('features: 2 periods, 2 rows')
+        assert len(backends.get_backend().read('weekly')) == 2
+        backends.dispose_backend()
@@ -0,0 +1,515 @@
+from unittest import mock
+import numpy as np
+import pandas as pd
+import pytest
+from mlmonitoring.monitor.utils import _calculate_psi
+from mlmonitoring.monitor.model_drift.feature import psi_drift, drift_suite
+
+
+def generate_data():
+    rng = np.random.RandomState(42)
+    X_train = rng.normal(0, 1, (5000, 3))
+    X_test = rng.normal(0.2, 1.1, (3000, 3))
+    return X_train, X_test, ['a', 'b', 'c'], [0.5, 0.3, 0.2]
+
+
+def generate_mixed_data():
+    rng = np.random.RandomState(42)
+    categories = np.array(['c{}'.format(i) for i in range(5000)])
+    X_train = pd.DataFrame({
+        'amount': rng.normal(0, 1, 5000),
+        'city': categories[rng.zipf(1.5, 5000) % 5000],
+        'channel': pd.Categorical(rng.choice(['web', 'app'], 5000)),
+    })
+    X_test = pd.DataFrame({
+        'amount': rng.normal(0, 1, 3000),
+        'city': categories[(rng.zipf(1.5, 3000) + 7) % 5000],
+        'channel': pd.Categorical(rng.choice(['web', 'app', 'store'], 3000)),
+    })
+    return X_train, X_test, ['amount', 'city', 'channel'], [0.5, 0.3, 0.2]
+
+
+@pytest.mark.parametrize('buckettype', ['bins', 'quantiles'])
+def test_psi_drift_matches_calculate_psi(buckettype):
+    X_train, X_test, names, importances = generate_data()
+
+    result = psi_drift(
+        X_train, X_test, names, importances, buckettype=buckettype)
+
+    expected = [
+        _calculate_psi(X_train[:, i], X_test[:, i], buckettype=buckettype)
+        for i in range(X_train.shape[1])
+    ]
+    assert list(result.columns) == ['feature', 'importance', 'psi']
+    assert np.allclose(result['psi'], expected)
+
+
+@pytest.mark.parametrize('buckettype', ['bins', 'quantiles'])
+def test_drift_suite_matches_psi_drift(buckettype):
+    X_train, X_test, names, importances = generate_data()
+
+    result = drift_suite(
+        X_train, X_test, names, importances, buckettype=buckettype)
+    expected = psi_drift(
+        X_train, X_test, names, importances, buckettype=buckettype)
+
+    assert list(result.columns) == [
+        'feature', 'importance', 'psi', 'kl', 'js', 'hellinger', 'wasserstein']
+    pd.testing.assert_frame_equal(
+        result[['feature', 'importance', 'psi']], expected)
+
+
+def test_drift_suite_metrics_without_drift():
+    X_train, _, names, importances = generate_data()
+
+    result = drift_suite(X_train, X_train, names, importances)
+
+    for metric in ['psi', 'kl', 'js', 'hellinger', 'wasserstein']:
+        assert np.allclose(result[metric], 0)
+
+
+def test_drift_suite_js_and_hellinger_bounds():
+    X_train, X_test, names, importances = generate_data()
+
+    result = drift_suite(X_train, X_test + 3, names, importances)
+
+    assert ((result['js'] >= 0) & (result['js'] <= np.log(2))).all()
+    assert ((result['hellinger'] >= 0) & (result['hellinger'] <= 1)).all()
+    assert (result['wasserstein'] > 0).all()
+
+
+def test_psi_drift_mixed_dataframe():
+    X_train, X_test, names, importances = generate_mixed_data()
+
+    result = psi_drift(
+        X_train, X_test, names, importances,
+        max_categories=100, hash_buckets=16)
+
+    numeric = psi_drift(
+        X_train[['amount']], X_test[['amount']], ['amount'], [0.5])
+    assert result['psi'].iloc[0] == pytest.approx(numeric['psi'].iloc[0])
+    assert result['psi'].iloc[1] > 0.1
+    assert result['psi'].iloc[2] > 0.1
+
+
+def test_psi_drift_categorical_without_drift():
+    X_train, _, names, importances = generate_mixed_data()
+
+    result = psi_drift(
+        X_train, X_train, names, importances,
+        max_categories=100, hash_buckets=16)
+
+    assert np.allclose(result['psi'], 0)
+
+
+def test_drift_suite_categorical_wasserstein_is_nan():
+    X_train, X_test, names, importances = generate_mixed_data()
+
+    result = drift_suite(X_train, X_test, names, importances)
+
+    assert not np.isnan(result['wasserstein'].iloc[0])
+    assert result['wasserstein'].iloc[1:].isna().all()
+    assert result[['psi', 'kl', 'js', 'hellinger']].notna().all().all()
+
+
+def generate_segmented_data():
+    # every segment spans the range and the categories of the whole
+    # reference, so the grouped buckets are those of a call per segment
+    rng = np.random.RandomState(0)
+    frames = []
+    for n, shift in [(4000, 0.0), (2400, 0.3)]:
+        region = np.resize(['north', 'south'], n)
+        amount = np.clip(rng.normal(shift, 1, n), -3, 3)
+        amount[:4] = [-3, -3, 3, 3]
+        frames.append(pd.DataFrame({
+            'amount': amount,
+            'city': rng.choice(['c{}'.format(i) for i in range(20)], n),
+            'channel': pd.Categorical(rng.choice(['web', 'app'], n)),
+            'region': region,
+        }))
+    return frames[0], frames[1], ['amount', 'city', 'channel'], [0.5, 0.3, 0.2]
+
+
+def test_drift_suite_group_by_matches_per_segment_calls():
+    X_train, X_test, names, importances = generate_segmented_data()
+
+    result = drift_suite(X_train, X_test, names, importances, group_by='region')
+
+    assert list(result.columns[:3]) == ['segment', 'feature', 'importance']
+    assert len(result) == 2 * len(names)
+    for region in ['north', 'south']:
+        segment = result[result['segment'] == region].reset_index(drop=True)
+        train = X_train[X_train['region'] == region].drop(columns='region')
+        test = X_test[X_test['region'] == region].drop(columns='region')
+        expected = drift_suite(train, test, names, importances)
+        pd.testing.assert_frame_equal(segment[expected.columns], expected)
+        psi = psi_drift(train, test, names, importances)
+        np.testing.assert_allclose(segment['psi'], psi['psi'])
+
+
+def test_psi_drift_group_by_arrays():
+    X_train, X_test, names, importances = generate_data()
+    train_groups = np.arange(len(X_train)) % 3
+    test_groups = np.arange(len(X_test)) % 3
+
+    result = psi_drift(
+        X_train, X_test, names, importances,
+        group_by=(train_groups, test_groups))
+
+    assert sorted(result['segment'].unique()) == [0, 1, 2]
+    assert len(result) == 3 * len(names)
+    assert result['psi'].notna().all()
+
+
+def test_psi_drift_sample_interval_covers_full_psi():
+    X_train, X_test, names, importances = generate_data()
+    full = psi_drift(X_train, X_test, names, importances, buckettype='quantiles')
+
+    result = psi_drift(X_train, X_test, names, importances,
+                       buckettype='quantiles', sample=1000, random_state=0)
+    assert list(result['n_train']) == [1000] * 3
+    assert list(result['n_test']) == [1000] * 3
+    assert (result['psi_ci_low'] <= result['psi']).all()
+    assert (result['psi'] <= result['psi_ci_high']).all()
+    assert ((result['psi_ci_low'] <= full['psi']) &
+            (full['psi'] <= result['psi_ci_high'])).all()
+
+    # the same seed draws the same samples
+    again = psi_drift(X_train, X_test, names, importances,
+                      buckettype='quantiles', sample=1000, random_state=0)
+    pd.testing.assert_frame_equal(result, again)
+
+
+def test_psi_drift_interval_without_sampling():
+    X_train, X_test, names, importances = generate_data()
+    result = psi_drift(X_train, X_test, names, importances, ci='analytic')
+    assert list(result['n_train']) == [5000] * 3
+    assert list(result['n_test']) == [3000] * 3
+    assert 'psi_ci_low' not in psi_drift(X_train, X_test, names, importances)
+
+
+def test_psi_drift_stratified_sample_by_segment():
+    X_train, X_test, names, importances = generate_mixed_data()
+    X_train['channel'] = X_train['channel'].astype(str)
+    X_test['channel'] = X_test['channel'].astype(str)
+
+    result = psi_drift(X_train, X_test, ['amount', 'city'], [0.5, 0.5],
+                       group_by='channel', sample=0.5, sampling='stratified',
+                       random_state=0)
+    counts = result.drop_duplicates('segment').set_index('segment')
+    expected = X_train['channel'].value_counts() / 2
+    for segment in ['web', 'app']:
+        assert abs(counts.loc[segment, 'n_train'] - expected[segment]) <= 1
+    assert counts.loc['store', 'n_train'] == 0
+
+
+def test_psi_drift_strata_column_is_not_a_feature():
+    X_train, X_test, names, importances = generate_mixed_data()
+    X_train['channel'] = X_train['channel'].astype(str)
+    X_test['channel'] = X_test['channel'].astype(str)
+
+    result = psi_drift(X_train, X_test, ['amount', 'city'], [0.5, 0.5],
+                       sample=0.5, sampling='stratified', strata='channel',
+                       random_state=0)
+    assert list(result['feature']) == ['amount', 'city']
+    assert result['psi'].notna().all()
+
+
+def test_psi_drift_reservoir_stream():
+    X_train, X_test, names, importances = generate_data()
+    chunks = (X_test[i:i + 500] for i in range(0, len(X_test), 500))
+    result = psi_drift(X_train, chunks, names, importances,
+                       sample=800, sampling='reservoir', random_state=0)
+    assert list(result['n_test']) == [800] * 3
+
+    with pytest.raises(ValueError):
+        psi_drift(X_train, iter([X_test]), names, importances, sample=0.1)
+
+
+def test_pca_outlier_detection_sample():
+    from mlmonitoring.monitor.model_drift.feature import pca_outlier_detection
+    X_train, X_test, _, _ = generate_data()
+    X_test = pd.DataFrame(X_test)
+
+    result = pca_outlier_detection(
+        X_train, X_test, sample=0.2, test_sample=500, random_state=0)
+    assert result.name == 'outlier'
+    assert len(result) == 500
+    assert result.index.isin(X_test.index).all()
+    assert result.attrs == {'n_train': 1000, 'n_test': 500}
+
+
+def test_psi_drift_bootstrap_interval():
+    X_train, X_test, names, importances = generate_data()
+    result = psi_drift(X_train, X_test[:300], names, importances,
+                       buckettype='quantiles', ci='bootstrap',
+                       n_bootstrap=500, random_state=0)
+    assert list(result['n_test']) == [300] * 3
+    assert (result['psi_ci_low'] <= result['psi']).all()
+    assert (result['psi'] <= result['psi_ci_high']).all()
+
+    # close to the analytic interval
+    analytic = psi_drift(X_train, X_test[:300], names, importances,
+                         buckettype='quantiles', ci='analytic')
+    width = result['psi_ci_high'] - result['psi_ci_low']
+    analytic_width = analytic['psi_ci_high'] - analytic['psi_ci_low']
+    assert ((width / analytic_width).between(0.5, 2)).all()
+
+    again = psi_drift(X_train, X_test[:300], names, importances,
+                      buckettype='quantiles', ci='bootstrap',
+                      n_bootstrap=500, random_state=0)
+    pd.testing.assert_frame_equal(result, again)
+
+
+def test_psi_drift_bootstrap_interval_contains_psi():
+    for seed in range(5):
+        rng = np.random.RandomState(seed)
+        X_train = rng.normal(0, 1, (5000, 1))
+        X_test = rng.normal(0, 1, (200, 1))
+        # the replicates of a small batch are mostly above its PSI
+        result = psi_drift(X_train, X_test, ['a'], [1.0], buckets=20,
+                           ci='bootstrap', random_state=0)
+        assert (result['psi_ci_low'] <= result['psi']).all()
+        assert (result['psi'] <= result['psi_ci_high']).all()
+        assert (result['psi_ci_low'] < result['psi_ci_high']).all()
+
+
+def test_psi_drift_bootstrap_by_segment_and_category():
+    X_train, X_test, names, importances = generate_mixed_data()
+    result = psi_drift(X_train, X_test, ['amount', 'city'], [0.5, 0.5],
+                       group_by='channel', ci='bootstrap', n_bootstrap=200,
+                       random_state=0)
+    # the store segment has no reference rows, its PSI is undefined
+    store = result['segment'] == 'store'
+    assert (result.loc[store, 'n_train'] == 0).all()
+    assert result.loc[store, 'psi_ci_low'].isna().all()
+    bounds = result.loc[~store, ['psi_ci_low', 'psi', 'psi_ci_high']]
+    assert (bounds['psi_ci_low'] <= bounds['psi']).all()
+    assert (bounds['psi'] <= bounds['psi_ci_high']).all()
+    with pytest.raises(ValueError):
+        psi_drift(X_train, X_test, names, importances, ci='jackknife')
+
+
+def generate_correlated_data():
+    rng = np.random.RandomState(42)
+    loadings = rng.normal(size=(3, 20))
+    X_train = rng.normal(size=(2000, 3)) @ loadings
+    X_test = rng.normal(size=(2000, 3)) @ loadings
+    # same marginals as the reference, without their correlations
+    X_shuffled = np.column_stack([
+        rng.permutation(X_train[:, i]) for i in range(X_train.shape[1])])
+    return X_train, X_test, X_shuffled
+
+
+def test_autoencoder_encode_matches_regressor():
+    from mlmonitoring.monitor.utils.autoencoder import MLPRegressorAutoEncoder
+    X_train, _, _ = generate_correlated_data()
+    encoder = MLPRegressorAutoEncoder(layer_sizes=(8, 3), max_iter=5)
+    latent = encoder.fit_encode(X_train)
+    assert latent.shape == (2000, 3)
+
+    # the decoder layers applied to the latent space reconstruct the data
+    regressor = encoder._regressor
+    hidden = latent
+    for coefs, intercepts in zip(
+            regressor.coefs_[2:-1], regressor.intercepts_[2:-1]):
+        hidden = np.tanh(hidden @ coefs + intercepts)
+    np.testing.assert_allclose(
+        hidden @ regressor.coefs_[-1] + regressor.intercepts_[-1],
+        regressor.predict(encoder._scaler.transform(X_train)))
+
+
+def test_latent_drift_detects_joint_shift(tmp_path):
+    from mlmonitoring.monitor.model_drift.feature import latent_drift
+    X_train, X_test, X_shuffled = generate_correlated_data()
+    names = list(range(20))
+    assert psi_drift(X_train, X_shuffled, names, [1] * 20)['psi'].max() == 0
+
+    cache_path = str(tmp_path / 'encoder.joblib')
+    same = latent_drift(X_train, X_test, cache_path=cache_path,
+                        max_iter=50, random_state=0)
+    shifted = latent_drift(None, X_shuffled, cache_path=cache_path,
+                           random_state=0)
+    assert list(same.columns) == ['mmd', 'bandwidth', 'n_train', 'n_test']
+    assert shifted['mmd'].iloc[0] > 10 * same['mmd'].iloc[0]
+
+    latent = latent_drift(None, X_shuffled, test='psi', cache_path=cache_path,
+                          ci='analytic')
+    assert list(latent['feature']) == ['latent_{}'.format(i) for i in range(10)]
+    assert latent['psi_ci_low'].max() > 0.1
+
+
+def test_latent_drift_cache(tmp_path):
+    import joblib
+    from mlmonitoring.monitor.model_drift.feature import latent_drift
+    from mlmonitoring.monitor.utils import autoencoder
+    X_train, X_test, _ = generate_correlated_data()
+    cache_path = str(tmp_path / 'encoder.joblib')
+
+    latent_drift(X_train, X_test, cache_path=cache_path, max_iter=1)
+    with mock.patch.object(autoencoder.MLPRegressorAutoEncoder, 'fit') as fit:
+        latent_drift(X_train, X_test, cache_path=cache_path, max_iter=1)
+        latent_drift(None, X_test, cache_path=cache_path)
+        fit.assert_not_called()
+
+    # other reference data or parameters refit the encoder
+    fitted = autoencoder._load_reference(cache_path)['encoder']
+    for X, max_iter in [(X_train[::-1], 1), (X_train, 2), (X_train[:, :5], 1)]:
+        latent_drift(X, X_test[:, :X.shape[1]], cache_path=cache_path,
+                     max_iter=max_iter)
+        encoder = autoencoder._load_reference(cache_path)['encoder']
+        assert encoder is not fitted
+        fitted = encoder
+    assert fitted.n_features == 5
+
+    # a given encoder is used, and not replaced by another cached one
+    encoder = autoencoder.MLPRegressorAutoEncoder(max_iter=1).fit(X_train)
+    latent_drift(X_train, X_test, encoder=encoder, cache_path=cache_path)
+    cached = autoencoder._load_reference(cache_path)['encoder']
+    assert joblib.hash(cached) == joblib.hash(encoder)
+    other = autoencoder.MLPRegressorAutoEncoder(max_iter=1).fit(X_train)
+    with pytest.raises(ValueError):
+        latent_drift(None, X_test, encoder=other, cache_path=cache_path)
+
+    with pytest.raises(ValueError):
+        latent_drift(None, X_test, cache_path=str(tmp_path / 'missing'))
+
+
+def generate_shifted_data(rows=4000):
+    rng = np.random.RandomState(0)
+    X_train = rng.normal(size=(rows, 5))
+    X_test = rng.normal(size=(rows, 5))
+    X_test[:, 2] += 0.5
+    return X_train, X_test
+
+
+def test_classifier_drift():
+    from mlmonitoring.monitor.model_drift.feature import classifier_drift
+    X_train, X_test = generate_shifted_data()
+    result = classifier_drift(
+        X_train, X_test, list('abcde'), [1] * 5, random_state=0)
+    assert list(result.columns) == [
+        'feature', 'importance', 'attribution', 'auc', 'auc_ci_low',
+        'auc_ci_high', 'n_train', 'n_test', 'n_folds']
+    assert result['auc_ci_low'].iloc[0] > 0.55
+    assert result.loc[result['attribution'].idxmax(), 'feature'] == 'c'
+    assert result['attribution'].sum() == pytest.approx(1)
+
+    same = classifier_drift(
+        X_train, np.random.RandomState(1).normal(size=(4000, 5)),
+        list('abcde'), [1] * 5, random_state=0)
+    assert same['auc_ci_low'].iloc[0] < 0.5 < same['auc_ci_high'].iloc[0]
+
+
+def test_classifier_drift_folds():
+    from mlmonitoring.monitor.model_drift.feature import classifier_drift
+    X_train, X_test = generate_shifted_data()
+    kwargs = {'feature_names': list('abcde'), 'feature_importances': [1] * 5,
+              'random_state': 0}
+
+    every = classifier_drift(X_train, X_test, tolerance=0, **kwargs)
+    assert (every['n_folds'] == 5).all()
+    early = classifier_drift(X_train, X_test, tolerance=0.5, **kwargs)
+    assert (early['n_folds'] == 1).all()
+
+    parallel = classifier_drift(
+        X_train, X_test, tolerance=0, n_jobs=2, **kwargs)
+    pd.testing.assert_frame_equal(parallel, every)
+
+    sampled = classifier_drift(X_train, X_test, max_rows=500, **kwargs)
+    assert (sampled['n_train'] == 500).all()
+    assert (sampled['n_test'] == 500).all()
+
+
+def test_classifier_drift_dataframe():
+    from sklearn.linear_model import LogisticRegression
+    from mlmonitoring.monitor.model_drift.feature import classifier_drift
+    rng = np.random.RandomState(0)
+    X_train = pd.DataFrame({
+        'x': rng.normal(size=2000),
+        'store': pd.Categorical(rng.choice(['a', 'b'], 2000)),
+    })
+    X_test = pd.DataFrame({
+        'x': rng.normal(size=2000),
+        'store': pd.Categorical(rng.choice(['a', 'b', None], 2000,
+                                           p=[0.2, 0.6, 0.2])),
+    })
+    result = classifier_drift(
+        X_train, X_test, ['x', 'store'], [1, 1], random_state=0)
+    assert result.set_index('feature')['attribution'].idxmax() == 'store'
+
+    # the attribution of linear models is the size of their coefficients
+    X_test['store'] = X_train['store']
+    X_test['x'] += 1
+    result = classifier_drift(
+        X_train, X_test, ['x', 'store'], [1, 1],
+        classifier=LogisticRegression(), random_state=0)
+    assert result.set_index('feature')['attribution'].idxmax() == 'x'
+
+
+def generate_clustered_data():
+    rng = np.random.RandomState(0)
+    X_train = np.concatenate([
+        rng.normal(0, 1, (2000, 3)), rng.normal(8, 0.1, (2000, 3))])
+    # the last rows are close to the dense cluster, but outside of it
+    X_test = np.concatenate([
+        rng.normal(0, 1, (490, 3)), np.full((10, 3), 7.3)])
+    return X_train, X_test
+
+
+@pytest.mark.parametrize('algorithm', ['kd_tree', 'ball_tree', 'projection'])
+def test_knn_outlier_detection(algorithm):
+    from mlmonitoring.monitor.model_drift.feature import knn_outlier_detection
+    X_train, X_test = generate_clustered_data()
+    X_test = pd.DataFrame(X_test, index=np.arange(500) + 100)
+    result = knn_outlier_detection(
+        X_train, X_test, method='lof', algorithm=algorithm, n_components=2,
+        random_state=0)
+    assert result.name == 'outlier'
+    assert result.index.equals(X_test.index)
+    assert result.attrs == {'n_train': 4000, 'n_test': 500}
+    assert result.between(0, 1).all()
+    assert result.iloc[490:].min() > result.iloc[:490].quantile(0.99)
+
+
+def test_knn_outlier_detection_index(tmp_path):
+    from mlmonitoring.monitor.model_drift.feature import knn_outlier_detection
+    from mlmonitoring.monitor.utils import neighbors
+    X_train, X_test = generate_clustered_data()
+    index_path = str(tmp_path / 'index.joblib')
+
+    built = knn_outlier_detection(X_train, X_test, index_path=index_path)
+    built_index = neighbors._neighbor_index(None, index_path)
+    with mock.patch.object(neighbors.NeighborIndex, 'fit') as fit:
+        loaded = knn_outlier_detection(
+            None, X_test, index_path=index_path, chunk_size=64, n_jobs=2)
+        fit.assert_not_called()
+    pd.testing.assert_series_equal(loaded, built)
+
+    index = neighbors._neighbor_index(None, index_path)
+    assert isinstance(index.k_distance_, np.memmap)
+
+    # the same reference is not indexed again, other data or parameters are
+    with mock.patch.object(neighbors.NeighborIndex, 'fit') as fit:
+        knn_outlier_detection(X_train, X_test, index_path=index_path)
+        fit.assert_not_called()
+    for X, n_neighbors in [(X_train[::-1], 10), (X_train, 5)]:
+        knn_outlier_detection(
+            X, X_test, n_neighbors=n_neighbors, index_path=index_path)
+        index = neighbors._neighbor_index(None, index_path)
+        assert index.n_neighbors == n_neighbors
+        assert not np.array_equal(index.k_distance_, built_index.k_distance_)
+
+    with pytest.raises(ValueError):
+        knn_outlier_detection(None, X_test, index_path=str(tmp_path / 'x'))
+
+
+def test_neighbor_index_algorithm():
+    from mlmonitoring.monitor.utils.neighbors import NeighborIndex
+    rng = np.random.RandomState(0)
+    wide = NeighborIndex(n_components=5).fit(rng.normal(size=(200, 11)))
+    assert wide.projection_.shape == (11, 5)
+    narrow = NeighborIndex(n_components=5).fit(rng.normal(size=(200, 10)))
+    assert narrow.projection_ is None
+    with pytest.raises(ValueError):
+        NeighborIndex(algorithm='brute')
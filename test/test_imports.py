@@ -0,0 +1,39 @@
+import subprocess
+import sys
+import pytest
+
+
+def loaded_modules(module, names):
+    # a fresh interpreter, the test session already imported everything
+    code = 'import sys, {}; print(",".join(n for n in {!r} if n in sys.modules))'
+    output = subprocess.check_output(
+        [sys.executable, '-c', code.format(module, names)])
+    return [name for name in output.decode().strip().split(',') if name]
+
+
+@pytest.mark.parametrize('module', [
+    'mlmonitoring',
+    'mlmonitoring.monitor.model_drift.feature',
+])
+def test_import_skips_heavy_dependencies(module):
+    assert loaded_modules(
+        module, ('pyod', 'torch', 'tensorflow', 'sklearn')) == []
+
+
+def test_import_package_is_lazy():
+    assert loaded_modules('mlmonitoring', ('pandas', 'requests')) == []
+
+
+def test_lazy_attributes():
+    import mlmonitoring
+    from mlmonitoring.monitor.schemas import MLmonitoring
+    assert mlmonitoring.MLmonitoring is MLmonitoring
+    with pytest.raises(AttributeError):
+        mlmonitoring.missing
+
+
+def test_cli_import_does_not_build_engine():
+    code = ('import mlmonitoring.server.main, mlmonitoring.server.database as s;'
+            'print(s._engine)')
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.decode().strip() == 'None'
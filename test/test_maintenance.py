@@ -0,0 +1,90 @@
+from click.testing import CliRunner
+from unittest import mock
+import os
+import numpy as np
+import pandas as pd
+from mlmonitoring.server.backends import create_backend
+from mlmonitoring.server.maintenance import maintain
+
+
+def generate_frame(start, periods):
+    return pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=periods, freq='D'),
+        'psi': np.linspace(0, 1, periods),
+        'feature': ['age', 'income'] * (periods // 2),
+    }).set_index('timestamp')
+
+
+def test_maintain(backend):
+    for day in range(1, 29, 4):
+        backend.insert('psi', generate_frame('2021-01-{:02d}'.format(day), 4))
+        backend.insert('psi', generate_frame('2021-02-{:02d}'.format(day), 4))
+    assert backend.tables() == ['psi']
+
+    report = maintain(
+        backend,
+        ttls={'psi': pd.Timedelta('30d')},
+        downcast=True,
+        now=pd.Timestamp('2021-03-01'),
+        measure_scan=True,
+    )
+    assert len(report) == 1
+    assert report[0]['table'] == 'psi'
+    assert report[0]['rows_deleted'] == 28
+    assert report[0]['scan_speedup'] > 0
+
+    data = backend.read('psi')
+    assert len(data) == 28
+    assert pd.to_datetime(data['timestamp']).min() >= pd.Timestamp('2021-01-30')
+    assert list(data.columns) == ['timestamp', 'psi', 'feature']
+    assert set(data['feature']) == {'age', 'income'}
+    np.testing.assert_allclose(
+        np.sort(data['psi'].astype(float)),
+        np.sort(np.tile(np.linspace(0, 1, 4), 7)), rtol=1e-6)
+
+
+def test_maintain_sorts(backend):
+    for day in (21, 11, 1):
+        backend.insert('psi', generate_frame('2021-01-{:02d}'.format(day), 4))
+    maintain(backend)
+    data = backend.read('psi')
+    assert len(data) == 12
+    assert pd.to_datetime(data['timestamp']).is_monotonic_increasing
+
+
+def test_maintain_parquet_compaction(tmp_path):
+    backend = create_backend('parquet://{}'.format(tmp_path))
+    for day in range(1, 29):
+        backend.insert('psi', generate_frame('2021-01-{:02d}'.format(day), 2))
+    assert len(os.listdir(tmp_path / 'psi' / 'month=2021-01')) > 1
+
+    report = maintain(backend)
+    assert report[0]['scan_speedup'] is None
+    assert report[0]['rows_deleted'] == 0
+    assert report[0]['bytes_reclaimed'] > 0
+    assert len(os.listdir(tmp_path / 'psi' / 'month=2021-01')) == 1
+    assert len(backend.read('psi')) == 56
+
+
+def test_cli_maintenance(tmp_path):
+    uri = 'parquet://{}'.format(tmp_path)
+    with mock.patch.dict(os.environ, {"MLMONITOR_DATABASE_URI": uri}):
+        from mlmonitoring.server import backends
+        from mlmonitoring.server.main import cli
+        backends.dispose_backend()
+        backends.get_backend().insert('psi', generate_frame('2021-01-01', 4))
+
+        runner = CliRunner()
+        result = runner.invoke(cli, [
+            'maintenance', '--ttl', 'psi=1d', '--downcast', '--measure-scan'])
+        assert result.exit_code == 0, result.output
+        assert result.output.startswith('psi: 4 rows deleted')
+        assert 'scan' in result.output
+        assert len(backends.get_backend().read('psi')) == 0
+
+        result = runner.invoke(cli, ['maintenance', '--ttl', 'psi'])
+        assert result.exit_code != 0
+        result = runner.invoke(cli, ['maintenance', '--default-ttl', 'soon'])
+        assert result.exit_code == 2
+        assert 'Invalid value for \'--default-ttl\'' in result.output
+        backends.dispose_backend()
@@ -0,0 +1,112 @@
+from unittest.mock import MagicMock
+from mlmonitoring import MLmonitoring, Check
+import pandas as pd
+
+
+def score_monitoring(scores):
+    return pd.Series(scores, name='score')
+
+
+def test_run_records_timings(monkeypatch):
+    mock_session = MagicMock()
+    monkeypatch.setattr('requests.Session.post', mock_session)
+    records = []
+
+    monitor = MLmonitoring() \
+        .set_project('project') \
+        .set_batch_insert(False) \
+        .set_profiling(hooks=[records.append]) \
+        .append(
+            'score',
+            score_monitoring,
+            param_args=([0.1, 0.9, 0.5],),
+            low_risk=Check.gt(0.8),
+            high_risk=Check.gt(0.95))
+
+    results = monitor.run()
+
+    phases = [timing['phase'] for timing in results[0]['timings']]
+    assert phases == [
+        'method',
+        'check:low_risk:greater_than',
+        'check:high_risk:greater_than',
+        'serialization',
+        'upload',
+    ]
+    assert records == results[0]['timings']
+    for timing in results[0]['timings']:
+        assert timing['monitor'] == 'score'
+        assert timing['wall_time'] >= 0
+        assert timing['cpu_time'] >= 0
+    assert results[0]['timings'][0]['rows'] == 3
+    assert results[0]['timings'][1]['rows'] == 1
+    mock_session.assert_called_once()
+
+
+def test_run_inserts_timings(monkeypatch):
+    mock_session = MagicMock()
+    monkeypatch.setattr('requests.Session.post', mock_session)
+
+    monitor = MLmonitoring() \
+        .set_project('project') \
+        .set_profiling(trace_memory=True, insert=True) \
+        .append('score', score_monitoring, param_args=([0.1, 0.9],))
+
+    results = monitor.run()
+
+    assert results[0]['timings'][0]['peak_memory'] >= 0
+    assert mock_session.call_count == 2
+    data = mock_session.call_args[1]['json']
+    assert data['table_name'] == 'project_monitoring_runs'
+    assert len(data['dataframe']['data']) == 3
+
+
+def test_run_batch_insert(monkeypatch):
+    mock_session = MagicMock()
+    monkeypatch.setattr('requests.Session.post', mock_session)
+
+    monitor = MLmonitoring() \
+        .set_project('project') \
+        .append('score', score_monitoring, param_args=([0.1, 0.9],)) \
+        .append('other', score_monitoring, param_args=([0.5],))
+
+    results = monitor.run()
+
+    mock_session.assert_called_once()
+    route = mock_session.call_args[0][0]
+    assert route.endswith('/insert_many')
+    tables = mock_session.call_args[1]['json']['tables']
+    assert [data['table_name'] for data in tables] == [
+        'project_score', 'project_other']
+    for result in results:
+        phases = [timing['phase'] for timing in result['timings']]
+        assert phases == ['method', 'serialization', 'upload']
+        # the upload of the batch is recorded once for the run
+        assert result['timings'][-1]['monitor'] == 'run'
+        assert result['timings'][-1]['rows'] == 3
+
+
+def test_view_reads_records(monkeypatch):
+    response = MagicMock(text='[{"score":0.1},{"score":0.9}]')
+    monkeypatch.setattr('requests.Session.get', MagicMock(return_value=response))
+    monitor = MLmonitoring().set_project('project')
+    assert list(monitor.view('score')['score']) == [0.1, 0.9]
+
+    # servers before the pre-encoded responses
+    response.text = '"[{\\"score\\":0.5}]"'
+    assert list(monitor.view('score')['score']) == [0.5]
+
+
+def test_filter_conditions_on_argument_names(monkeypatch):
+    get = MagicMock(return_value=MagicMock(text='[{"columns":1}]'))
+    monkeypatch.setattr('requests.Session.get', get)
+    monitor = MLmonitoring().set_project('project')
+
+    monitor.filter(
+        'score', {'columns__eq': 1, 'consistent__lt': 2},
+        columns=['columns'], value__gt=0.5)
+
+    route = get.call_args[0][0]
+    assert route.startswith('http://127.0.0.1:8000/filter/project_score/'
+                            'columns__eq__1&consistent__lt__2&value__gt__0.5')
+    assert route.endswith('?columns=columns')
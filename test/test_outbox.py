@@ -0,0 +1,104 @@
+from unittest.mock import MagicMock
+import pandas as pd
+import pytest
+from mlmonitoring.client import Client, Outbox, OutboxFullError
+
+
+def payload(table_name='table', rows=10):
+    dataframe = pd.DataFrame({'value': range(rows)})
+    return Client().insert_payload(dataframe, 'project', table_name)
+
+
+def response(status_code):
+    return MagicMock(status_code=status_code, text='')
+
+
+def test_outbox_coalesces_per_table(tmp_path):
+    send = MagicMock(return_value=response(200))
+    outbox = Outbox(send, str(tmp_path / 'outbox.db'), flush_interval=0.01)
+    outbox.put(payload('a'))
+    outbox.put(payload('b'))
+    outbox.put(payload('a'))
+    assert outbox.flush(timeout=5)
+    outbox.close()
+
+    sent = [call.args[0] for call in send.call_args_list]
+    assert [data['table_name'] for data in sent] == ['project_a', 'project_b']
+    assert len(sent[0]['dataframe']['data']) == 20
+    assert sent[0]['dataframe']['schema'] == payload()['dataframe']['schema']
+
+
+def test_outbox_retries_until_accepted(tmp_path):
+    send = MagicMock(side_effect=[
+        ConnectionError('down'), response(503), response(200)])
+    outbox = Outbox(send, str(tmp_path / 'outbox.db'), flush_interval=0.01)
+    outbox.put(payload())
+    assert outbox.flush(timeout=5)
+    outbox.close()
+    assert send.call_count == 3
+
+
+def test_outbox_dead_letters(tmp_path):
+    send = MagicMock(side_effect=[
+        response(500), response(500), response(200),
+        response(422), response(200), response(200)])
+    outbox = Outbox(send, str(tmp_path / 'outbox.db'), flush_interval=0.01,
+                    max_backoff=0.01, max_attempts=2)
+    outbox.put(payload('a'))
+    outbox.put(payload('b'))
+    outbox.put(payload('c'))
+    # a failing batch is set aside instead of blocking the next ones
+    assert outbox.flush(timeout=5)
+    assert outbox.dead_letters == 2
+    assert [call.args[0]['table_name'] for call in send.call_args_list] == [
+        'project_a', 'project_a', 'project_b', 'project_c']
+
+    assert outbox.requeue_dead_letters() == 2
+    assert outbox.dead_letters == 0
+    assert outbox.flush(timeout=5)
+    outbox.close()
+    assert send.call_count == 6
+
+
+def test_outbox_survives_restart(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    outbox = Outbox(MagicMock(side_effect=ConnectionError('down')), path,
+                    flush_interval=0.01)
+    outbox.put(payload())
+    outbox.close(timeout=5)
+
+    send = MagicMock(return_value=response(200))
+    outbox = Outbox(send, path, flush_interval=0.01)
+    assert len(outbox) == 1
+    assert outbox.flush(timeout=5)
+    outbox.close()
+    send.assert_called_once()
+
+
+def test_outbox_bounded(tmp_path):
+    send = MagicMock(side_effect=ConnectionError('down'))
+    outbox = Outbox(send, str(tmp_path / 'outbox.db'), max_bytes=2000)
+    for _ in range(10):
+        outbox.put(payload())
+    assert 0 < outbox.size <= 2000
+    assert len(outbox) < 10
+    outbox.close(timeout=5)
+
+    outbox = Outbox(send, str(tmp_path / 'full.db'), max_bytes=2000,
+                    on_full='raise')
+    with pytest.raises(OutboxFullError):
+        for _ in range(10):
+            outbox.put(payload())
+    outbox.close(timeout=5)
+
+
+def test_client_outbox(tmp_path, monkeypatch):
+    mock_post = MagicMock(return_value=response(200))
+    monkeypatch.setattr('requests.Session.post', mock_post)
+
+    client = Client()
+    client.set_outbox(str(tmp_path / 'outbox.db'), flush_interval=0.01)
+    assert client.insert(pd.DataFrame({'value': [1]}), 'project', 'table') is None
+    assert client.flush(timeout=5)
+    client.set_outbox(None)
+    mock_post.assert_called_once()
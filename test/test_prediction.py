@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from scipy.stats import ks_2samp, wasserstein_distance
+from mlmonitoring.monitor.utils import _calculate_psi
+from mlmonitoring.monitor.model_drift.prediction import (
+    SortedDistribution,
+    QuantileSketch,
+    ks_drift,
+    wasserstein_drift,
+    psi_score_drift,
+)
+
+
+def generate_scores():
+    rng = np.random.RandomState(42)
+    return rng.normal(0, 1, 5000), rng.normal(0.3, 1.2, 3000)
+
+
+def test_ks_drift_matches_scipy():
+    y_train, y_test = generate_scores()
+    result = ks_drift(y_train, y_test)
+    assert result.name == 'ks'
+    assert result.iloc[0] == pytest.approx(ks_2samp(y_train, y_test).statistic)
+
+
+def test_wasserstein_drift_matches_scipy():
+    y_train, y_test = generate_scores()
+    result = wasserstein_drift(SortedDistribution(y_train), y_test)
+    assert result.iloc[0] == pytest.approx(wasserstein_distance(y_train, y_test))
+
+
+@pytest.mark.parametrize('buckettype', ['bins', 'quantiles'])
+def test_psi_score_drift_matches_calculate_psi(buckettype):
+    y_train, y_test = generate_scores()
+    result = psi_score_drift(y_train, y_test, buckettype=buckettype)
+    expected = _calculate_psi(y_train, y_test, buckettype=buckettype)
+    assert result.iloc[0] == pytest.approx(expected)
+
+
+def test_approximate_mode_from_stream():
+    y_train, y_test = generate_scores()
+    sketch = QuantileSketch(size=256)
+    for chunk in np.array_split(y_test, 10):
+        sketch.update(chunk)
+    sketch = QuantileSketch.from_dict(sketch.to_dict())
+
+    assert sketch.count == len(y_test)
+    exact = ks_drift(y_train, y_test).iloc[0]
+    approximate = ks_drift(y_train, sketch, approximate=True).iloc[0]
+    assert approximate == pytest.approx(exact, abs=0.02)
+
+
+def test_sketch_distribution_keeps_range():
+    _, y_test = generate_scores()
+    distribution = QuantileSketch(size=64).update(y_test).distribution()
+    assert distribution.values[0] == y_test.min()
+    assert distribution.values[-1] == y_test.max()
+    assert distribution.total == pytest.approx(len(y_test))
+    assert distribution.quantile([0, 1]) == pytest.approx(
+        [y_test.min(), y_test.max()])
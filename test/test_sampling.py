@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from mlmonitoring.monitor.utils.sampling import (
+    Reservoir,
+    _sample_detector_data,
+    _sample_indices,
+    _sample_rows,
+)
+
+
+def test_reservoir_is_uniform():
+    counts = np.zeros(100)
+    for seed in range(1000):
+        reservoir = Reservoir(10, seed)
+        for chunk in np.array_split(np.arange(100), 7):
+            reservoir.update(chunk)
+        assert len(np.unique(reservoir.sample)) == 10
+        counts[reservoir.sample] += 1
+    # every row is kept with probability 0.1
+    assert abs(counts / 1000 - 0.1).max() < 0.05
+
+
+def test_reservoir_of_dataframes():
+    dataframe = pd.DataFrame({'value': np.arange(50)})
+    reservoir = Reservoir(100)
+    reservoir.update(dataframe.iloc[:20]).update(dataframe.iloc[20:])
+    assert reservoir.seen == 50
+    assert sorted(reservoir.sample['value']) == list(range(50))
+
+
+def test_stratified_indices_keep_proportions():
+    strata = np.array(['a'] * 800 + ['b'] * 150 + [None] * 50, dtype=object)
+    indices = _sample_indices(
+        1000, 100, 'stratified', strata, np.random.default_rng(0))
+    assert len(indices) == 100
+    counts = pd.Series(strata[indices]).value_counts(dropna=False)
+    assert counts['a'] == 80 and counts['b'] == 15 and counts[None] == 5
+
+
+def test_sample_rows():
+    X = np.arange(1000)
+    assert len(_sample_rows(X, 0.25, random_state=0)) == 250
+    assert _sample_rows(X, 2000) is X
+    np.testing.assert_array_equal(
+        _sample_rows(X, 10, random_state=1), _sample_rows(X, 10, random_state=1))
+    with pytest.raises(ValueError):
+        _sample_rows(X, 1.5)
+    with pytest.raises(ValueError):
+        _sample_rows(X, 10, sampling='stratified')
+
+
+def test_sample_detector_data():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({
+        'value': np.arange(1000), 'region': rng.choice(['a', 'b'], 1000)})
+
+    X_train, X_test = _sample_detector_data(
+        X, X, 100, 50, 'stratified', 'region', random_state=0)
+    assert list(X_train.columns) == list(X_test.columns) == ['value']
+    assert (len(X_train), len(X_test)) == (100, 50)
+    # independent samples, the production one without the reference
+    assert not X_test.index.isin(X_train.index).all()
+    _, skipped = _sample_detector_data(
+        None, X, 100, 50, 'stratified', 'region', random_state=0)
+    pd.testing.assert_frame_equal(skipped, X_test)
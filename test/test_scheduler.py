@@ -0,0 +1,135 @@
+from unittest.mock import MagicMock
+import datetime
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from mlmonitoring import MLmonitoring
+from mlmonitoring.monitor.scheduler import (
+    Scheduler,
+    _decode_watermark,
+    _encode_watermark,
+)
+from mlmonitoring.monitor.utils.distribution import QuantileSketch
+
+
+def generate_events(start, periods):
+    return pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=periods, freq='min'),
+        'score': np.random.default_rng(0).random(periods),
+    })
+
+
+def mean_score(scores):
+    return pd.Series([scores.mean()], name='score')
+
+
+@pytest.fixture
+def events():
+    return {'data': generate_events('2021-01-01', 100)}
+
+
+def source_of(events, batches):
+    def source(since):
+        data = events['data']
+        batch = data if since is None else data[data['timestamp'] >= since]
+        batches.append(len(batch))
+        return batch
+    return source
+
+
+def build(batch, state):
+    # a drift accumulator kept between runs
+    sketch = QuantileSketch.from_dict(state['sketch']) \
+        if 'sketch' in state else QuantileSketch()
+    sketch.update(batch['score'].to_numpy())
+    state['sketch'] = sketch.to_dict()
+    state['rows'] = state.get('rows', 0) + len(batch)
+    return MLmonitoring().set_project('project').append(
+        'score', mean_score, param_args=(batch['score'],))
+
+
+def test_scheduler_runs_new_data_only(events, tmp_path, monkeypatch):
+    mock_session = MagicMock()
+    monkeypatch.setattr('requests.Session.post', mock_session)
+    batches = []
+
+    scheduler = Scheduler(str(tmp_path))
+    scheduler.add('scores', source_of(events, batches), build, interval=0)
+    assert scheduler.run_suite('scores') is not None
+
+    events['data'] = pd.concat([
+        events['data'], generate_events('2021-01-02', 10)])
+    # a new scheduler restores the watermark and state from disk
+    scheduler = Scheduler(str(tmp_path))
+    scheduler.add('scores', source_of(events, batches), build, interval=0)
+    results = scheduler.run_pending()
+
+    assert batches == [100, 11]
+    assert len(results['scores']) == 1
+    state = scheduler.load_state('scores')
+    assert state['watermark'] == pd.Timestamp('2021-01-02 00:09')
+    assert state['state']['rows'] == 110
+    assert QuantileSketch.from_dict(state['state']['sketch']).count == 110
+
+    # no new data, nothing to run
+    assert scheduler.run_suite('scores') is None
+    assert mock_session.call_count == 2
+
+
+def test_scheduler_failed_run_keeps_watermark(events, tmp_path, monkeypatch):
+    monkeypatch.setattr('requests.Session.post', MagicMock())
+
+    def failing(batch, state):
+        raise RuntimeError('failed')
+
+    scheduler = Scheduler(str(tmp_path))
+    scheduler.add('scores', source_of(events, []), failing, interval=0)
+    assert scheduler.run_pending() == {}
+    assert scheduler.load_state('scores')['watermark'] is None
+
+
+def test_scheduler_interval(events, tmp_path, monkeypatch):
+    monkeypatch.setattr('requests.Session.post', MagicMock())
+    scheduler = Scheduler(str(tmp_path))
+    scheduler.add('scores', source_of(events, []), build, interval=3600)
+
+    assert scheduler.due('scores')
+    scheduler.run_pending()
+    assert not scheduler.due('scores')
+    assert scheduler.due('scores', now=scheduler.load_state(
+        'scores')['last_run'] + 3600)
+
+
+def test_scheduler_late_rows_at_watermark(events, tmp_path, monkeypatch):
+    monkeypatch.setattr('requests.Session.post', MagicMock())
+    batches = []
+    rows = []
+
+    def count(batch, state):
+        rows.append(len(batch))
+
+    scheduler = Scheduler(str(tmp_path))
+    scheduler.add('scores', source_of(events, batches), count, interval=0)
+    scheduler.run_suite('scores')
+
+    # a row arrives late with the timestamp of the watermark
+    late = events['data'].tail(1).assign(score=2.0)
+    events['data'] = pd.concat([events['data'], late], ignore_index=True)
+    scheduler.run_suite('scores')
+    scheduler.run_suite('scores')
+
+    assert batches == [100, 2, 2]
+    assert rows == [100, 1]
+    assert sum(scheduler.load_state('scores')['seen'].values()) == 2
+
+
+@pytest.mark.parametrize('watermark', [
+    pd.Timestamp('2021-01-01 10:00'),
+    datetime.datetime(2021, 1, 1, 10),
+    datetime.date(2021, 1, 1),
+    np.int64(3),
+])
+def test_watermark_round_trip(watermark):
+    encoded = json.loads(json.dumps(_encode_watermark(watermark)))
+    assert _decode_watermark(encoded) == watermark
@@ -1,6 +1,9 @@
 from fastapi.testclient import TestClient
 from unittest import mock
+import json
 import os
+import pytest
+from mlmonitoring.compression import available_encodings, compress
 
 
 @mock.patch.dict(os.environ, {
@@ -11,3 +14,367 @@ def test_view_inexistent_dataframe_in_database():
     client = TestClient(app)
     response = client.get("/view/inexistent_table")
     assert response.status_code == 500
+
+
+@mock.patch.dict(os.environ, {
+    "MLMONITOR_DATABASE_URI": "sqlite:///:memory:"
+})
+def test_metrics():
+    from mlmonitoring.server.main import app
+    client = TestClient(app)
+    client.get("/view/inexistent_table")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert (
+        'mlmonitoring_request_duration_seconds_count{'
+        'method="GET",route="/view/{table_name}",status="500"}'
+    ) in response.text
+    assert 'mlmonitoring_requests_in_flight' in response.text
+
+
+@mock.patch.dict(os.environ, {
+    "MLMONITOR_DATABASE_URI": "sqlite:///:memory:"
+})
+def test_insert_invalid_body():
+    from mlmonitoring.server.main import app
+    client = TestClient(app)
+    response = client.post("/insert", content="not json")
+    assert response.status_code == 422
+
+
+@mock.patch.dict(os.environ, {
+    "MLMONITOR_DATABASE_URI": "sqlite:///:memory:",
+    "MLMONITOR_POOL_SIZE": "3",
+    "MLMONITOR_POOL_RECYCLE": "60",
+    "MLMONITOR_POOL_PRE_PING": "false",
+})
+def test_engine_options():
+    from mlmonitoring.server import database
+    assert database.engine_options() == {
+        'pool_pre_ping': False,
+        'pool_recycle': 60,
+        'pool_size': 3,
+    }
+
+
+@mock.patch.dict(os.environ, {
+    "MLMONITOR_DATABASE_URI": "sqlite:///:memory:"
+})
+def test_engine_lifecycle():
+    from mlmonitoring.server import database
+    from mlmonitoring.server.main import app
+    with TestClient(app):
+        engine = database.get_engine()
+        assert database.get_engine() is engine
+    assert database._engine is None
+
+    # a process inherits no engine of its parent
+    engine = database.get_engine()
+    with mock.patch('os.getpid', return_value=-1):
+        assert database.get_engine() is not engine
+    database.dispose_engine()
+
+
+def test_read_replicas(tmp_path):
+    import pandas as pd
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    for path, value in ((primary, 'primary'), (replica, 'replica')):
+        pd.DataFrame({'source': [value]}).to_sql(
+            'scores', 'sqlite:///{}'.format(path), index=False)
+
+    with mock.patch.dict(os.environ, {
+        "MLMONITOR_DATABASE_URI": "sqlite:///{}".format(primary),
+        "MLMONITOR_DATABASE_READ_URIS": "sqlite:///{},{}".format(
+            replica, "sqlite:///{}".format(tmp_path / 'missing' / 'down.db')),
+        "MLMONITOR_CACHE_BYTES": "0",
+    }), mock.patch('mlmonitoring.server.cache._cache', None):
+        from mlmonitoring.server import database
+        from mlmonitoring.server.main import app
+        database.dispose_engine()
+        client = TestClient(app)
+        try:
+            sources = {client.get("/view/scores").text for _ in range(4)}
+            assert sources == {'[{"source":"replica"}]'}
+            # the unreachable replica is skipped during its cooldown
+            down = database.get_replicas()[1]
+            assert database._unhealthy[down] > 0
+            response = client.get("/view/scores?consistent=true")
+            assert response.headers['content-type'] == 'application/json'
+            assert response.json() == [{'source': 'primary'}]
+        finally:
+            database.dispose_engine()
+
+
+def test_read_replica_query_fails(tmp_path):
+    import pandas as pd
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    pd.DataFrame({'source': ['primary']}).to_sql(
+        'scores', 'sqlite:///{}'.format(primary), index=False)
+    # the replica lags behind, it does not have the table yet
+    pd.DataFrame({'other': [1]}).to_sql(
+        'other', 'sqlite:///{}'.format(replica), index=False)
+
+    with mock.patch.dict(os.environ, {
+        "MLMONITOR_DATABASE_URI": "sqlite:///{}".format(primary),
+        "MLMONITOR_DATABASE_READ_URIS": "sqlite:///{}".format(replica),
+    }):
+        from mlmonitoring.server import database
+        from mlmonitoring.server.backends import SQLBackend
+        database.dispose_engine()
+        try:
+            backend = SQLBackend()
+            assert backend.read('scores').to_dict('records') == [
+                {'source': 'primary'}]
+            assert database._unhealthy[database.get_replicas()[0]] > 0
+
+            database._unhealthy.clear()
+            chunks = list(backend.read_chunks('scores', chunksize=1))
+            assert pd.concat(chunks).to_dict('records') == [
+                {'source': 'primary'}]
+            assert database._unhealthy[database.get_replicas()[0]] > 0
+        finally:
+            database._unhealthy.clear()
+            database.dispose_engine()
+
+
+@mock.patch.dict(os.environ, {
+    "MLMONITOR_DATABASE_URI": "sqlite:///:memory:",
+    "MLMONITOR_DATABASE_READ_URIS": "sqlite:///a.db,sqlite:///b.db",
+})
+def test_read_engines_round_robin():
+    from mlmonitoring.server import database
+    database.dispose_engine()
+    try:
+        primary = database.get_engine()
+        a, b = database.get_replicas()
+        first = list(database.read_engines())
+        second = list(database.read_engines())
+        assert first[-1] is primary and second[-1] is primary
+        assert {first[0], second[0]} == {a, b}
+        assert list(database.read_engines(consistent=True)) == [primary]
+
+        database.mark_unhealthy(a)
+        assert list(database.read_engines()) == [b, primary]
+    finally:
+        database.dispose_engine()
+
+
+@pytest.mark.parametrize('encoding', available_encodings())
+def test_compressed_insert_and_view(encoding, tmp_path):
+    import pandas as pd
+    payload = {
+        'table_name': 'compressed',
+        'dataframe': json.loads(
+            pd.DataFrame({'value': range(500)}).to_json(orient='table')),
+    }
+    with mock.patch.dict(os.environ, {
+        "MLMONITOR_DATABASE_URI": "sqlite:///{}".format(tmp_path / 'db.db')
+    }):
+        from mlmonitoring.server import database
+        from mlmonitoring.server.main import app
+        database.dispose_engine()
+        client = TestClient(app)
+        try:
+            response = client.post(
+                "/insert",
+                content=compress(json.dumps(payload).encode(), encoding),
+                headers={'Content-Encoding': encoding},
+            )
+            assert response.status_code == 200
+
+            response = client.get(
+                "/view/compressed", headers={'Accept-Encoding': encoding})
+            assert response.headers['content-encoding'] == encoding
+            assert len(response.json()) == 500
+        finally:
+            database.dispose_engine()
+
+
+@mock.patch.dict(os.environ, {
+    "MLMONITOR_DATABASE_URI": "sqlite:///:memory:"
+})
+def test_compressed_insert_errors():
+    from mlmonitoring.server.main import app
+    client = TestClient(app)
+    response = client.post(
+        "/insert", content=b'{}', headers={'Content-Encoding': 'br'})
+    assert response.status_code == 415
+    response = client.post(
+        "/insert", content=b'not gzip', headers={'Content-Encoding': 'gzip'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('encoding', available_encodings())
+def test_compressed_insert_too_large(encoding):
+    from mlmonitoring.server.main import app
+    bomb = compress(b' ' * (2 ** 20), encoding)
+    with mock.patch.dict(os.environ, {"MLMONITOR_MAX_BODY_SIZE": "1000"}):
+        client = TestClient(app)
+        response = client.post(
+            "/insert", content=bomb, headers={'Content-Encoding': encoding})
+        assert response.status_code == 413
+        response = client.post(
+            "/insert", content=b'x' * 2000, headers={'Content-Encoding': encoding})
+        assert response.status_code == 413
+
+
+@pytest.mark.parametrize('encoding', available_encodings())
+def test_decompress_frames(encoding):
+    from mlmonitoring.compression import BodyTooLarge, decompress
+    body = compress(b'a' * 5000, encoding) + compress(b'b' * 5000, encoding)
+    assert decompress(body, encoding) == b'a' * 5000 + b'b' * 5000
+    assert decompress(body, encoding, max_size=10000) == b'a' * 5000 + b'b' * 5000
+    with pytest.raises(BodyTooLarge):
+        decompress(body, encoding, max_size=9999)
+
+
+def insert_payload(table_name, values):
+    import pandas as pd
+    return {
+        'table_name': table_name,
+        'dataframe': json.loads(pd.DataFrame(
+            {'value': values, 'other': values}).to_json(orient='table')),
+    }
+
+
+def test_view_cache_and_etags(tmp_path):
+    with mock.patch.dict(os.environ, {
+        "MLMONITOR_DATABASE_URI": "sqlite:///{}".format(tmp_path / 'db.db')
+    }), mock.patch('mlmonitoring.server.cache._cache', None):
+        from mlmonitoring.server import database
+        from mlmonitoring.server.main import app
+        database.dispose_engine()
+        client = TestClient(app)
+        try:
+            client.post("/insert", json=insert_payload('cached', [1, 2]))
+            first = client.get("/view/cached")
+            etag = first.headers['etag']
+            assert first.headers['last-modified']
+
+            with mock.patch(
+                    'mlmonitoring.server.backends.SQLBackend._read_sql') as read:
+                # cached body, then 304 without reading the database
+                assert client.get("/view/cached").content == first.content
+                response = client.get(
+                    "/view/cached", headers={'If-None-Match': etag})
+                assert response.status_code == 304
+                response = client.get("/view/cached", headers={
+                    'If-Modified-Since': first.headers['last-modified']})
+                assert response.status_code == 304
+                read.assert_not_called()
+
+            client.post("/insert", json=insert_payload('cached', [3]))
+            response = client.get(
+                "/view/cached", headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.headers['etag'] != etag
+            assert len(response.json()) == 3
+
+            response = client.get("/view/cached?columns=value")
+            assert response.json()[0] == {'value': 1}
+            response = client.get("/filter/cached/value__gt__1?columns=other")
+            assert response.json() == [{'other': 2}, {'other': 3}]
+            response = client.get("/view/cached?columns=value;drop")
+            assert response.status_code == 422
+        finally:
+            database.dispose_engine()
+
+
+def test_response_cache_memory_cap():
+    from mlmonitoring.server.cache import ResponseCache
+    cache = ResponseCache(max_bytes=10)
+    version, _ = cache.version('a')
+    cache.put(('a', 1), b'12345', version)
+    cache.put(('a', 2), b'12345', version)
+    assert cache.get(('a', 1), version) == b'12345'
+    # the least recently used entry is evicted
+    cache.put(('a', 3), b'12345', version)
+    assert cache.get(('a', 2), version) is None
+    assert cache.size == 10
+
+    cache.invalidate('a')
+    assert cache.size == 0
+    assert cache.version('a')[0] != version
+    # a read started before a write is not cached
+    cache.put(('a', 1), b'1', version)
+    assert cache.get(('a', 1), cache.version('a')[0]) is None
+
+
+def test_response_cache_ttl():
+    from mlmonitoring.server.cache import get_cache
+    # versions expire by default, so other workers' writes are seen
+    with mock.patch.dict(os.environ), \
+            mock.patch('mlmonitoring.server.cache._cache', None):
+        os.environ.pop('MLMONITOR_CACHE_TTL', None)
+        assert get_cache().ttl == 60
+    with mock.patch.dict(os.environ, {'MLMONITOR_CACHE_TTL': '0'}), \
+            mock.patch('mlmonitoring.server.cache._cache', None):
+        cache = get_cache()
+        version, _ = cache.version('a')
+        assert cache.version('a')[0] != version
+
+
+def test_insert_many(tmp_path):
+    with mock.patch.dict(os.environ, {
+        "MLMONITOR_DATABASE_URI": "sqlite:///{}".format(tmp_path / 'db.db')
+    }), mock.patch('mlmonitoring.server.cache._cache', None):
+        from mlmonitoring.server import database
+        from mlmonitoring.server.main import app
+        from mlmonitoring.server.metrics import TABLE_BYTES
+        database.dispose_engine()
+        client = TestClient(app)
+        try:
+            response = client.post("/insert_many", json={'tables': [
+                insert_payload('first', [1, 2]),
+                insert_payload('second', [3]),
+            ]})
+            assert response.status_code == 200
+            assert len(client.get("/view/first").json()) == 2
+            assert len(client.get("/view/second").json()) == 1
+            # the bytes of the body are counted for each table
+            inserted = TABLE_BYTES._values
+            assert inserted[('first', 'insert')] > \
+                inserted[('second', 'insert')] > 0
+
+            invalid = insert_payload('second', [4])
+            invalid['dataframe']['data'][0]['value'] = {'not': 'a number'}
+            response = client.post("/insert_many", json={'tables': [
+                insert_payload('first', [5]), invalid]})
+            assert response.status_code == 422
+            assert len(client.get("/view/first").json()) == 2
+
+            response = client.post("/insert_many", content="[1, 2]")
+            assert response.status_code == 422
+        finally:
+            database.dispose_engine()
+
+
+def test_insert_rejected_rows(tmp_path):
+    import sqlalchemy
+    from mlmonitoring.server.backends import is_data_error
+    uri = "sqlite:///{}".format(tmp_path / 'db.db')
+    with sqlalchemy.create_engine(uri).begin() as connection:
+        connection.execute(sqlalchemy.text(
+            'CREATE TABLE unique_values '
+            '("index" INTEGER, value INTEGER UNIQUE, other INTEGER)'))
+
+    with mock.patch.dict(os.environ, {
+        "MLMONITOR_DATABASE_URI": uri
+    }), mock.patch('mlmonitoring.server.cache._cache', None):
+        from mlmonitoring.server import database
+        from mlmonitoring.server.main import app
+        database.dispose_engine()
+        client = TestClient(app)
+        try:
+            response = client.post(
+                "/insert", json=insert_payload('unique_values', [1]))
+            assert response.status_code == 200
+            # the clients do not retry rows the database rejects
+            response = client.post(
+                "/insert", json=insert_payload('unique_values', [1]))
+            assert response.status_code == 422
+        finally:
+            database.dispose_engine()
+
+    assert not is_data_error(sqlalchemy.exc.OperationalError(
+        'INSERT', {}, Exception('database is locked')))